@@ -1,80 +1,397 @@
 import networkx as nx
 import json
 import re
+import copy
+import os
+import time
+import pickle
+import hashlib
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+
+import metta_query
+import token_aliases
+from metta_query import FactStore, Var
+from token_aliases import TokenAliasIndex
+
+
+# Bump whenever the layout of the persisted knowledge base changes
+KB_FORMAT_VERSION = 2
+
+
+def snapshot_hash(path: str) -> str:
+    """SHA-256 of a graph snapshot file, used to validate a persisted knowledge base."""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _code_hash() -> str:
+    # The fact, alias and rule code the knowledge base is compiled by: a persisted copy
+    # built by other code (e.g. before a deploy) is rebuilt even if the snapshot is unchanged
+    digest = hashlib.sha256()
+    for path in (__file__, metta_query.__file__, token_aliases.__file__):
+        with open(path, 'rb') as f:
+            digest.update(f.read())
+    return digest.hexdigest()
+
+
+KB_CODE_HASH = _code_hash()
+# Everything save() writes; a loaded state missing any of them is rejected
+_KB_STATE_KEYS = ("format", "code_hash", "source_hash", "bridge_asset_name", "knowledge_base", "facts", "token_index")
+
+
+# Fact store handed to each worker process by reason_many()
+_worker_facts = None
+
+
+def _init_leg_worker(facts: FactStore):
+    global _worker_facts
+    _worker_facts = facts
+
+
+def _resolve_leg(facts: FactStore, leg: tuple):
+    """
+    Resolves one sub-leg of a swap path against the fact store:
+    ("pair", chain, token_a, token_b) -> pool id or None,
+    ("bridge", from_chain, to_chain) -> bool.
+    """
+    if leg[0] == "pair":
+        match = facts.first(("pair", leg[1], leg[2], leg[3], Var("id")))
+        return match["id"] if match else None
+    return facts.ask(("bridge", leg[1], leg[2]))
+
+
+def _resolve_leg_shard(legs: list) -> dict:
+    return {leg: _resolve_leg(_worker_facts, leg) for leg in legs}
+
+
+class LRUCache:
+    """A bounded least-recently-used cache with hit/miss counters."""
+    def __init__(self, maxsize: int = 1024):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._data = OrderedDict()
+
+    def get(self, key):
+        if key in self._data:
+            self._data.move_to_end(key)
+            self.hits += 1
+            return self._data[key]
+        self.misses += 1
+        return None
+
+    def put(self, key, value):
+        self._data[key] = value
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    def clear(self):
+        self._data.clear()
+        self.hits = self.misses = 0
+
+    def info(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits, "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+            "size": len(self._data), "maxsize": self.maxsize
+        }
+
 
 class MeTTaGraphAnalyzer:
     """
     Analyzes a cross-chain liquidity graph using MeTTa-style symbolic reasoning.
     Enforces that all cross-chain bridges must be routed through USDC.
     """
-    def __init__(self, graph: nx.Graph):
-        self.graph = graph
-        # The specific asset required for bridging
-        self.bridge_asset_name = "usd coin"
+    def __init__(self, graph: nx.Graph, cache_size: int = 1024):
+        self._init_runtime(graph, cache_size)
+        start = time.perf_counter()
+        self.facts = FactStore()
         self.knowledge_base = self._build_knowledge_base()
+        self._install_rules()
+        self.startup_stats = {"source": "built", "seconds": time.perf_counter() - start}
         print(f"🧠 Knowledge base built with {len(self.knowledge_base)} facts.")
         print(f"🌉 Bridge asset enforced: {self.bridge_asset_name.upper()}")
 
+    def _init_runtime(self, graph: nx.Graph, cache_size: int):
+        self.graph = graph
+        # The specific asset required for bridging
+        self.bridge_asset_name = "usd coin"
+        # Resolved intents, keyed by (parsed intent, KB version)
+        self.intent_cache = LRUCache(cache_size)
+        # Set to False to silence the per-step console output
+        self.verbose = True
+
+    @classmethod
+    def from_snapshot(cls, graph: nx.Graph, source_path: str = 'cross_chain_graph.json', kb_path: str = None, cache_size: int = 1024):
+        """
+        Loads the compiled knowledge base persisted for `source_path` if its hash still
+        matches, otherwise builds it from `graph` and persists it for the next start.
+        """
+        kb_path = kb_path or f"{source_path}.kb.pickle"
+        source_hash = snapshot_hash(source_path)
+        analyzer = cls.load(kb_path, graph, source_hash, cache_size)
+        if analyzer is None:
+            analyzer = cls(graph, cache_size)
+            analyzer.save(kb_path, source_hash)
+        return analyzer
+
+    def save(self, path: str, source_hash: str):
+        """Persists the compiled facts and indexes. Written atomically via a temp file."""
+        state = {
+            "format": KB_FORMAT_VERSION,
+            "code_hash": KB_CODE_HASH,
+            "source_hash": source_hash,
+            "bridge_asset_name": self.bridge_asset_name,
+            "knowledge_base": self.knowledge_base,
+            "facts": self.facts,
+            "token_index": self.token_index,
+        }
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'wb') as f:
+            pickle.dump(state, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path: str, graph: nx.Graph, source_hash: str, cache_size: int = 1024):
+        """
+        Restores a knowledge base written by save(). Returns None if the file is missing,
+        unreadable, not a saved state, from another format version, compiled by different
+        code, or compiled from a different snapshot.
+        Only load files this process (or a trusted one) wrote: the format is pickle.
+        """
+        start = time.perf_counter()
+        try:
+            with open(path, 'rb') as f:
+                state = pickle.load(f)
+        except (OSError, pickle.UnpicklingError, EOFError, AttributeError, ImportError, ValueError, TypeError, IndexError):
+            return None
+        if not isinstance(state, dict) or any(key not in state for key in _KB_STATE_KEYS):
+            print(f"♻️ {path} is not a persisted knowledge base; rebuilding.")
+            return None
+        if (state["format"] != KB_FORMAT_VERSION or state["code_hash"] != KB_CODE_HASH
+                or state["source_hash"] != source_hash):
+            print(f"♻️ Persisted knowledge base at {path} is stale; rebuilding.")
+            return None
+
+        analyzer = cls.__new__(cls)
+        analyzer._init_runtime(graph, cache_size)
+        analyzer.bridge_asset_name = state["bridge_asset_name"]
+        analyzer.knowledge_base = state["knowledge_base"]
+        analyzer.facts = state["facts"]
+        analyzer.token_index = state["token_index"]
+        analyzer.startup_stats = {"source": "loaded", "seconds": time.perf_counter() - start}
+        print(f"🧠 Knowledge base loaded with {len(analyzer.knowledge_base)} facts from {path}.")
+        print(f"🌉 Bridge asset enforced: {analyzer.bridge_asset_name.upper()}")
+        return analyzer
+
 
     def _build_knowledge_base(self) -> set:
         kb = set()
         for node, data in self.graph.nodes(data=True):
             if data.get('type') == 'token':
                 kb.add(f'(token "{data["name"]}" {data["chain"]})')
+                self.facts.add(("token", data["name"], data["chain"]))
             elif data.get('type') == 'pool':
                 tvl = float(data.get('totalValueLockedUSD', 0))
                 volume = float(data.get('volumeUSD', 0))
                 kb.add(f'(pool {node} {data["chain"]} "{data["token0Name"]}" "{data["token1Name"]}" {tvl:.2f} {volume:.2f})')
+                self.facts.add(("pool", node, data["chain"], data["token0Name"], data["token1Name"], round(tvl, 2), round(volume, 2)))
         
         kb.add("(bridge eth base)")
         kb.add("(bridge base eth)")
+        self.facts.add(("bridge", "eth", "base"))
+        self.facts.add(("bridge", "base", "eth"))
+
+        # Symbols, addresses and near-misses -> canonical token names
+        self.token_index = TokenAliasIndex.from_graph(self.graph)
         return kb
+
+    def _install_rules(self):
+        """Routing rules, expressed declaratively over the fact store."""
+        # A pool trades its two tokens in either direction
+        self.facts.add_rule("(pair $chain $a $b $id)", "(pool $id $chain $a $b $tvl $vol)")
+        self.facts.add_rule("(pair $chain $a $b $id)", "(pool $id $chain $b $a $tvl $vol)")
+
+    def query(self, pattern) -> list:
+        """
+        Runs a MeTTa-style pattern query against the knowledge base, e.g.
+        '(pool $id base "USD Coin" $t $tvl $vol) (> $tvl 1000000)'.
+        Returns a list of variable bindings.
+        """
+        return list(self.facts.query(pattern))
     
     def _parse_fact(self, fact_string: str) -> list:
         return re.findall(r'"[^"]*"|\S+', fact_string.strip("()"))
 
+    @property
+    def kb_version(self) -> int:
+        return self.facts.version
+
+    def add_fact(self, fact) -> bool:
+        """Adds a fact to the knowledge base. Cached intents are invalidated via the KB version."""
+        if not self.facts.add(fact):
+            return False
+        if isinstance(fact, str):
+            self.knowledge_base.add(fact)
+        return True
+
+    def cache_info(self) -> dict:
+        """Hit/miss counters of the resolved-intent cache."""
+        return {**self.intent_cache.info(), "kb_version": self.kb_version}
+
+    def _log(self, message: str, verbose: bool = True):
+        if verbose and self.verbose:
+            print(message)
+
     def reason(self, query: str) -> dict:
-        print(f"\n🔎 Reasoning for query: '{query}'")
-        if "swap" in query.lower():
-            return self._resolve_swap_intent(query)
-        elif "find best pool" in query.lower():
-            return self._resolve_best_pool_intent(query)
+        self._log(f"\n🔎 Reasoning for query: '{query}'")
+        try:
+            intent = self._parse_intent(query)
+        except ValueError as e:
+            return {"error": str(e)}
+
+        key = (intent, self.kb_version)
+        result = self.intent_cache.get(key)
+        if result is None:
+            result = self._resolve_intent(intent)
+            self.intent_cache.put(key, result)
         else:
-            return {"error": "Could not understand the intent."}
+            self._log("   - Served from intent cache")
+        # Callers may mutate the result, so never hand out the cached object
+        return copy.deepcopy(result)
 
-    def _resolve_swap_intent(self, query: str) -> dict:
-        try:
-            parts = query.lower().replace("swap ", "").split(" to ")
-            from_part = parts[0].split(" on ")
-            to_part = parts[1].split(" on ")
-            
-            from_token_name = from_part[0].strip()
-            from_chain = from_part[1].strip()
-            
-            to_token_name = to_part[0].strip()
-            to_chain = to_part[1].strip()
-            
-            print(f"   - Intent: SWAP")
-            print(f"   - From: {from_token_name.upper()} on {from_chain.upper()}")
-            print(f"   - To: {to_token_name.upper()} on {to_chain.upper()}")
+    def _parse_intent(self, query: str) -> tuple:
+        """
+        Normalizes a natural-language query into an intent tuple, e.g.
+        ("swap", "wrapped ether", "eth", "usd coin", "eth").
+        Raises ValueError if the query cannot be parsed.
+        """
+        q = query.lower()
+        if "swap" in q:
+            try:
+                parts = q.replace("swap ", "").split(" to ")
+                from_part = parts[0].split(" on ")
+                to_part = parts[1].split(" on ")
+                from_chain, to_chain = from_part[1].strip(), to_part[1].strip()
+                from_token = self.token_index.canonical_name(from_part[0].strip(), from_chain)
+                to_token = self.token_index.canonical_name(to_part[0].strip(), to_chain)
+                return ("swap", from_token, from_chain, to_token, to_chain)
+            except IndexError:
+                raise ValueError("Invalid swap query format. Use 'swap [TOKEN] on [CHAIN] to [TOKEN] on [CHAIN]'.")
+        elif "find best pool" in q:
+            try:
+                parts = q.split(" on ")
+                chain = parts[1].split(" by ")[0].strip()
+                metric = parts[1].split(" by ")[1].strip()
+                return ("find_best_pool", chain, metric)
+            except IndexError:
+                raise ValueError("Invalid query format. Use 'find best pool on [CHAIN] by [METRIC]'.")
+        raise ValueError("Could not understand the intent.")
 
-            path = self._find_swap_path(from_token_name, from_chain, to_token_name, to_chain)
+    def reason_many(self, queries: list, processes: int = None, chunk_size: int = 256) -> list:
+        """
+        Resolves a batch of queries without console output.
 
-            if not path:
-                return {"error": "No valid swap path found. Either a direct pool is missing or a required bridge path via USDC is unavailable."}
+        All queries are parsed up front; the swap sub-legs they share (e.g. token -> USDC
+        on a chain) are deduplicated and resolved once, optionally sharded across
+        `processes` worker processes. Returns one dict per query, in order:
+        {"query", "result", "cached", "elapsed_ms"}.
+        """
+        version = self.kb_version
+        entries = []
+        legs = set()
+        for query in queries:
+            start = time.perf_counter()
+            try:
+                intent = self._parse_intent(query)
+            except ValueError as e:
+                intent, result = None, {"error": str(e)}
+            else:
+                result = self.intent_cache.get((intent, version))
+                if result is None and intent[0] == "swap":
+                    legs.update(self._swap_legs(*intent[1:]))
+            entries.append([query, intent, result, time.perf_counter() - start])
 
-            return {
-                "intent": "execute_swap",
-                "parameters": {
-                    "from_token": from_token_name, "from_chain": from_chain,
-                    "to_token": to_token_name, "to_chain": to_chain,
-                    "path": path
-                }
+        resolved_legs = self._resolve_legs(sorted(legs), processes, chunk_size)
+
+        results = []
+        batch = {}
+        for query, intent, result, elapsed in entries:
+            start = time.perf_counter()
+            cached = result is not None and intent is not None
+            if result is None:
+                # Duplicates within the batch reuse their first occurrence
+                cached = intent in batch
+                if not cached:
+                    batch[intent] = self._resolve_intent(intent, resolved_legs, verbose=False)
+                    self.intent_cache.put((intent, version), batch[intent])
+                result = batch[intent]
+            elapsed += time.perf_counter() - start
+            results.append({
+                "query": query, "result": copy.deepcopy(result),
+                "cached": cached, "elapsed_ms": elapsed * 1e3
+            })
+        return results
+
+    def _swap_legs(self, from_token: str, from_chain: str, to_token: str, to_chain: str) -> list:
+        """The fact lookups a swap path depends on, in the shape _resolve_leg expects."""
+        if from_chain == to_chain:
+            return [("pair", from_chain, from_token, to_token)] if from_token != to_token else []
+        legs = [("bridge", from_chain, to_chain)]
+        if from_token != self.bridge_asset_name:
+            legs.append(("pair", from_chain, from_token, self.bridge_asset_name))
+        if to_token != self.bridge_asset_name:
+            legs.append(("pair", to_chain, self.bridge_asset_name, to_token))
+        return legs
+
+    def _resolve_legs(self, legs: list, processes: int = None, chunk_size: int = 256) -> dict:
+        if not processes or processes <= 1 or len(legs) <= chunk_size:
+            return {leg: _resolve_leg(self.facts, leg) for leg in legs}
+        shards = [legs[i:i + chunk_size] for i in range(0, len(legs), chunk_size)]
+        resolved = {}
+        with ProcessPoolExecutor(max_workers=processes, initializer=_init_leg_worker, initargs=(self.facts,)) as pool:
+            for shard_result in pool.map(_resolve_leg_shard, shards):
+                resolved.update(shard_result)
+        return resolved
+
+    def _lookup_leg(self, leg: tuple, legs: dict = None):
+        if legs is not None and leg in legs:
+            return legs[leg]
+        return _resolve_leg(self.facts, leg)
+
+    def _resolve_intent(self, intent: tuple, legs: dict = None, verbose: bool = True) -> dict:
+        # `verbose` is per call, so a quiet batch never silences a concurrent reason()
+        if intent[0] == "swap":
+            return self._resolve_swap_intent(*intent[1:], legs=legs, verbose=verbose)
+        return self._resolve_best_pool_intent(*intent[1:], verbose=verbose)
+
+    def _resolve_swap_intent(self, from_token_name: str, from_chain: str, to_token_name: str, to_chain: str, legs: dict = None,
+                             verbose: bool = True) -> dict:
+        self._log(f"   - Intent: SWAP", verbose)
+        self._log(f"   - From: {from_token_name.upper()} on {from_chain.upper()}", verbose)
+        self._log(f"   - To: {to_token_name.upper()} on {to_chain.upper()}", verbose)
+
+        path = self._find_swap_path(from_token_name, from_chain, to_token_name, to_chain, legs, verbose)
+
+        if not path:
+            return {"error": "No valid swap path found. Either a direct pool is missing or a required bridge path via USDC is unavailable."}
+
+        return {
+            "intent": "execute_swap",
+            "parameters": {
+                "from_token": from_token_name, "from_chain": from_chain,
+                "to_token": to_token_name, "to_chain": to_chain,
+                "path": path
             }
-        except IndexError:
-            return {"error": "Invalid swap query format. Use 'swap [TOKEN] on [CHAIN] to [TOKEN] on [CHAIN]'."}
+        }
 
-    def _find_intra_chain_path(self, from_token: str, to_token: str, chain: str) -> list:
+    def _find_intra_chain_path(self, from_token: str, to_token: str, chain: str, legs: dict = None) -> list:
         """
         Finds a direct, single-step swap path between two tokens on the same chain.
         Returns a list with the swap step if found, otherwise an empty list.
@@ -83,43 +400,38 @@ class MeTTaGraphAnalyzer:
         if from_token == to_token:
             return [{"action": "none", "chain": chain, "details": "Tokens are the same, no swap needed."}]
 
-        for fact in self.knowledge_base:
-            if fact.startswith(f"(pool") and f" {chain} " in fact:
-                parts = self._parse_fact(fact)
-                token0_in_fact = parts[3].strip('"').lower()
-                token1_in_fact = parts[4].strip('"').lower()
-
-                if (from_token == token0_in_fact and to_token == token1_in_fact) or \
-                   (from_token == token1_in_fact and to_token == token0_in_fact):
-                    return [{"action": "swap", "chain": chain, "pool_id": parts[1], "details": f"Swap {from_token} for {to_token}"}]
+        pool_id = self._lookup_leg(("pair", chain, from_token, to_token), legs)
+        if pool_id:
+            return [{"action": "swap", "chain": chain, "pool_id": pool_id, "details": f"Swap {from_token} for {to_token}"}]
         return []
 
-    def _find_swap_path(self, from_token: str, from_chain: str, to_token: str, to_chain: str) -> list:
+    def _find_swap_path(self, from_token: str, from_chain: str, to_token: str, to_chain: str, legs: dict = None,
+                        verbose: bool = True) -> list:
         """
         Finds a valid swap path. If cross-chain, enforces bridging via USDC.
         """
         if from_chain == to_chain:
             # Simple case: find a path on the same chain
-            return self._find_intra_chain_path(from_token, to_token, from_chain)
+            return self._find_intra_chain_path(from_token, to_token, from_chain, legs)
         else:
             # Cross-chain case: must go through the designated bridge asset
             path = []
 
             # 1. Find path from source token to USDC on the source chain
-            path_to_bridge_asset = self._find_intra_chain_path(from_token, self.bridge_asset_name, from_chain)
+            path_to_bridge_asset = self._find_intra_chain_path(from_token, self.bridge_asset_name, from_chain, legs)
             if not path_to_bridge_asset:
-                print(f"   - Path failed: No swap path from {from_token.upper()} to {self.bridge_asset_name.upper()} on {from_chain}.")
+                self._log(f"   - Path failed: No swap path from {from_token.upper()} to {self.bridge_asset_name.upper()} on {from_chain}.", verbose)
                 return []
             
             # 2. Check if a bridge exists between the chains
-            if f"(bridge {from_chain} {to_chain})" not in self.knowledge_base:
-                print(f"   - Path failed: No bridge from {from_chain.upper()} to {to_chain.upper()}.")
+            if not self._lookup_leg(("bridge", from_chain, to_chain), legs):
+                self._log(f"   - Path failed: No bridge from {from_chain.upper()} to {to_chain.upper()}.", verbose)
                 return []
             
             # 3. Find path from USDC to destination token on the destination chain
-            path_from_bridge_asset = self._find_intra_chain_path(self.bridge_asset_name, to_token, to_chain)
+            path_from_bridge_asset = self._find_intra_chain_path(self.bridge_asset_name, to_token, to_chain, legs)
             if not path_from_bridge_asset:
-                print(f"   - Path failed: No swap path from {self.bridge_asset_name.upper()} to {to_token.upper()} on {to_chain}.")
+                self._log(f"   - Path failed: No swap path from {self.bridge_asset_name.upper()} to {to_token.upper()} on {to_chain}.", verbose)
                 return []
 
             # If all steps are successful, construct the full path
@@ -130,41 +442,49 @@ class MeTTaGraphAnalyzer:
             # Filter out any "no-op" steps
             return [step for step in path if step.get("action") != "none"]
 
-    def _resolve_best_pool_intent(self, query: str) -> dict:
-        # This method remains unchanged
-        try:
-            parts = query.lower().split(" on ")
-            chain = parts[1].split(" by ")[0].strip()
-            metric = parts[1].split(" by ")[1].strip()
+    def _resolve_best_pool_intent(self, chain: str, metric: str, verbose: bool = True) -> dict:
+        self._log(f"   - Intent: FIND_BEST_POOL", verbose)
+        self._log(f"   - On Chain: {chain.upper()}", verbose)
+        self._log(f"   - By Metric: {metric.upper()}", verbose)
 
-            print(f"   - Intent: FIND_BEST_POOL")
-            print(f"   - On Chain: {chain.upper()}")
-            print(f"   - By Metric: {metric.upper()}")
+        if metric not in ["volume", "liquidity"]: return {"error": "Metric must be 'volume' or 'liquidity'."}
 
-            if metric not in ["volume", "liquidity"]: return {"error": "Metric must be 'volume' or 'liquidity'."}
-            
-            best_pool = None
-            max_metric = -1
-
-            for fact in self.knowledge_base:
-                if fact.startswith(f"(pool") and f" {chain} " in fact:
-                    p = self._parse_fact(fact)
-                    tvl, vol = float(p[5]), float(p[6])
-                    current_metric_val = vol if metric == "volume" else tvl
-                    
-                    if current_metric_val > max_metric:
-                        max_metric = current_metric_val
-                        best_pool = {
-                            "pool_id": p[1], "chain": chain,
-                            "tokens": [p[3].strip('"'), p[4].strip('"')],
-                            "liquidity_usd": tvl, "volume_usd_24h": vol
-                        }
-            
-            if not best_pool: return {"error": f"No pools found on chain {chain}."}
+        best_pool = None
+        max_metric = -1
+
+        pattern = ("pool", Var("id"), chain, Var("a"), Var("b"), Var("tvl"), Var("vol"))
+        for p in self.facts.query(pattern):
+            tvl, vol = p["tvl"], p["vol"]
+            current_metric_val = vol if metric == "volume" else tvl
+
+            if current_metric_val > max_metric:
+                max_metric = current_metric_val
+                best_pool = {
+                    "pool_id": p["id"], "chain": chain,
+                    "tokens": [p["a"], p["b"]],
+                    "liquidity_usd": tvl, "volume_usd_24h": vol
+                }
+
+        if not best_pool: return {"error": f"No pools found on chain {chain}."}
 
-            return { "intent": "find_best_pool", "parameters": best_pool }
-        except IndexError:
-            return {"error": "Invalid query format. Use 'find best pool on [CHAIN] by [METRIC]'."}
+        return { "intent": "find_best_pool", "parameters": best_pool }
+
+
+def benchmark_startup(graph: nx.Graph, source_path: str = 'cross_chain_graph.json', repeat: int = 3) -> dict:
+    """Times building the knowledge base from the graph vs loading its persisted copy."""
+    kb_path = f"{source_path}.kb.pickle"
+    source_hash = snapshot_hash(source_path)
+    build_times, load_times = [], []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        analyzer = MeTTaGraphAnalyzer(graph)
+        build_times.append(time.perf_counter() - start)
+        analyzer.save(kb_path, source_hash)
+
+        start = time.perf_counter()
+        MeTTaGraphAnalyzer.load(kb_path, graph, source_hash)
+        load_times.append(time.perf_counter() - start)
+    return {"build_s": min(build_times), "load_s": min(load_times)}
 
 
 # --- Example Usage ---
@@ -200,4 +520,15 @@ if __name__ == "__main__":
     query3 = "swap some token on eth to wrapped ether on base"
     intent3 = analyzer.reason(query3)
     print("\n✅ Resolved Intent 3 (Invalid Cross-Chain):")
-    print(json.dumps(intent3, indent=2))
\ No newline at end of file
+    print(json.dumps(intent3, indent=2))
+    # 4. Repeated query is served from the intent cache
+    analyzer.reason("Swap Wrapped Ether on ETH to USD Coin on ETH")
+    print(f"\n📊 Intent cache: {analyzer.cache_info()}")
+
+    # 5. Batch resolution: shared sub-legs are resolved once, with no console output
+    for item in analyzer.reason_many([query1, query2, query3]):
+        print(f"   {item['query']!r}: {'error' not in item['result']} ({item['elapsed_ms']:.3f} ms)")
+
+    # 6. Startup cost: compiling the knowledge base vs loading the persisted copy
+    stats = benchmark_startup(G)
+    print(f"\n⏱️ Build: {stats['build_s'] * 1e3:.1f} ms | Load: {stats['load_s'] * 1e3:.1f} ms")
@@ -33,9 +33,10 @@ from uagents_core.contrib.protocols.chat import (
 
 # Local project modules
 from cctp import GeneralizedCCTP
-from uniswap import UniswapV3Helper
+from bridge_jobs import BridgeJobQueue
+from uniswap import UniswapV3Helper, ADDRESS_THIS, SWAP_GAS, SWAP_HOP_GAS, MINT_POSITION_GAS, UNISWAP_ROUTER, NONFUNGIBLE_POSITION_MANAGER, WETH9
 from wallet_analyzer import get_wallet_balances
-from graph_tool import find_pools, find_path, load_graph
+from graph_tool import find_pools, find_path, find_swap_route, load_graph
 from MeTTaGraphAnalyzer import MeTTaGraphAnalyzer
 
 # --- 2. Configuration & Initialization ---
@@ -66,24 +67,24 @@ CCTP_DOMAINS = {"ETH": 0, "BASE": 6}
 # Initialize helpers
 cctp = GeneralizedCCTP(WALLET_PRIVATE_KEY, RPC_URLS)
 uni = UniswapV3Helper(WALLET_PRIVATE_KEY, RPC_URLS)
+# Bridges run as persistent jobs; unfinished ones resume on startup
+bridge_queue = BridgeJobQueue(cctp, os.getenv("BRIDGE_JOBS_PATH", "bridge_jobs.sqlite")).start()
 G = load_graph()
-analyzer = MeTTaGraphAnalyzer(G)
+analyzer = MeTTaGraphAnalyzer.from_snapshot(G)
 
 
 # --- 3. Helper Functions ---
 
-def approve_token(chain: str, token: str, amount: int):
+def approve_token(chain: str, token: str, amount: int, spender: str):
     """
-    Helper function to approve a token for spending by the Uniswap router.
-    Note: This is a placeholder implementation. The actual approval logic
-    should exist within your `UniswapV3Helper` class.
+    Helper function to make sure `spender` (the Uniswap router or position
+    manager) may move `amount` of `token`. Returns the approval tx hash, or
+    None when the existing allowance already covers it.
     """
-    print(f"Approving {amount} of {token} on {chain}...")
-    # This assumes your UniswapV3Helper has an 'approve' method.
-    # If it doesn't, you'll need to implement the Web3.py logic here.
+    print(f"Checking allowance of {amount} {token} for {spender} on {chain}...")
     try:
-        tx_hash = uni.approve(chain, token, amount)
-        print(f"Approval successful. Tx: {tx_hash}")
+        tx_hash = uni.ensure_allowance(chain, token, amount, spender)
+        print(f"Approval sent. Tx: {tx_hash}" if tx_hash else "Allowance already sufficient.")
         return tx_hash
     except Exception as e:
         print(f"Error approving token {token} on {chain}: {e}")
@@ -113,39 +114,115 @@ def perform_cctp_bridge(source_chain: str, dest_chain: str, token: str, amount:
     # Convert amount to the correct decimal format (USDC has 6 decimals)
     amount_in_units = int(amount * 10**6)
     
-    # 1. Approve USDC for burning
-    tx1 = cctp.approve_usdc(source_chain, amount_in_units)
-    
-    # 2. Burn USDC on the source chain
+    # Approve, burn, attest and mint run as a persistent background job,
+    # since attestation alone takes minutes
     dest_domain = CCTP_DOMAINS[dest_chain.upper()]
     recipient_address = CCTP_RECIPIENTS[dest_chain.upper()]
-    tx2 = cctp.burn_usdc(source_chain, amount_in_units, dest_domain=dest_domain, recipient=recipient_address)
-    
-    # 3. Get attestation for the burn transaction
-    att = cctp.get_attestation(tx2)
-    
-    # 4. Mint USDC on the destination chain
-    tx3 = cctp.mint_usdc(dest_chain, tx2, att)
+    job_id = bridge_queue.submit(source_chain.upper(), dest_chain.upper(), amount_in_units, dest_domain, recipient_address)
     
-    return {"approve_tx": tx1, "burn_tx": tx2, "mint_tx": tx3}
+    return {"job_id": job_id, "status": "queued", "note": "Use get_bridge_status with this job_id to follow the bridge."}
+
+@tool
+def get_bridge_status(job_id: int) -> dict:
+    """
+    Returns the state of a CCTP bridge job started by perform_cctp_bridge:
+    queued, approved, burned, attested, minted or failed, with its transaction hashes.
+    """
+    job = bridge_queue.get(job_id)
+    if job is None:
+        return {"error": f"No bridge job {job_id}."}
+    return {key: job[key] for key in ("id", "source_chain", "dest_chain", "amount", "state",
+                                      "approve_tx", "burn_tx", "mint_tx", "error")}
+
+@tool
+def quote_uniswap_swap(chain: str, token_in: str, token_out: str, fee: int, amounts_in: List[int]) -> dict:
+    """
+    Quotes Uniswap V3 swaps through one pool for one or more input amounts, from
+    locally simulated pool state. Use this to compare trade sizes before swapping.
+    """
+    return {"amounts_in": amounts_in, "amounts_out": uni.quote_exact_input_single(chain, token_in, token_out, fee, amounts_in)}
+
+@tool
+def perform_uniswap_swap(chain: str, token_in: str, token_out: str, fee: int, amount_in: int, amount_out_min: int = None,
+                         slippage_bps: int = 50):
+    """
+    Executes a token swap on Uniswap V3. Without amount_out_min, the minimum is
+    the local quote less slippage_bps basis points.
+    """
+    if amount_out_min is None:
+        (quote,) = uni.quote_exact_input_single(chain, token_in, token_out, fee, [amount_in])
+        if quote is None:
+            return {"error": "Pool liquidity near the current price cannot fill this swap; pass amount_out_min to force it."}
+        amount_out_min = quote * (10_000 - slippage_bps) // 10_000
+    approve_tx = approve_token(chain, token_in, amount_in, UNISWAP_ROUTER[chain])
+    # Behind a pending approval the swap cannot be estimated; otherwise the estimate catches a swap that would revert
+    swap_tx = uni.swap_exact_input_single(chain, token_in, token_out, fee, amount_in, amount_out_min,
+                                          gas=SWAP_GAS if approve_tx else None)
+    return {"approve_tx": approve_tx, "swap_tx": swap_tx, "amount_out_min": amount_out_min}
+
+@tool
+def perform_uniswap_route_swap(token_in: str, token_out: str, amount_in: int, amount_out_min: int = None,
+                               slippage_bps: int = 50, chain: str = None):
+    """
+    Swaps along the best pool route between two tokens (e.g. A -> WETH -> USDC),
+    found in the liquidity graph, in a single multi-hop transaction. Tokens are
+    names or addresses; chain is 'eth' or 'base'. Without amount_out_min, the
+    minimum is the local quote less slippage_bps basis points.
+    """
+    route = find_swap_route(G, token_in, token_out, chain)
+    if route is None:
+        return {"error": f"No pool route between {token_in} and {token_out}."}
+    chain = route["chain"].upper()
+    fees = uni.route_fees(chain, route["tokens"], route["pools"])
+    if amount_out_min is None:
+        (quote,) = uni.quote_exact_input_path(chain, route["tokens"], fees, [amount_in])
+        if quote is None:
+            return {"error": "Pool liquidity along the route cannot fill this swap; pass amount_out_min to force it."}
+        amount_out_min = quote * (10_000 - slippage_bps) // 10_000
+    approve_tx = approve_token(chain, route["tokens"][0], amount_in, UNISWAP_ROUTER[chain])
+    # As for single-pool swaps: a fixed limit only behind a pending approval, else the estimate catches reverts
+    swap_tx = uni.swap_exact_input(chain, route["tokens"], fees, amount_in, amount_out_min,
+                                   gas=SWAP_GAS + SWAP_HOP_GAS * (len(fees) - 1) if approve_tx else None)
+    return {"route": route["path"], "fees": fees, "approve_tx": approve_tx, "swap_tx": swap_tx, "amount_out_min": amount_out_min}
 
 @tool
-def perform_uniswap_swap(chain: str, token_in: str, token_out: str, fee: int, amount_in: int, amount_out_min: int):
+def perform_uniswap_rebalance(chain: str, swaps: List[dict], slippage_bps: int = 50):
     """
-    Executes a token swap on Uniswap V3.
+    Executes several Uniswap V3 swaps (e.g. a portfolio rebalance) as one
+    transaction. Each swap is {"token_in", "token_out", "fee", "amount_in"},
+    optionally with "amount_out_min" (else the local quote less slippage_bps
+    basis points) and "to_eth": true to receive ETH instead of WETH.
     """
-    approve_tx = approve_token(chain, token_in, amount_in)
-    swap_tx = uni.swap_exact_input_single(chain, token_in, token_out, fee, amount_in, amount_out_min)
-    return {"approve_tx": approve_tx, "swap_tx": swap_tx}
+    uni.pool_states(chain, [(swap["token_in"], swap["token_out"], swap["fee"]) for swap in swaps])
+    bundle = uni.bundle(chain)
+    unwrap_min = 0
+    for swap in swaps:
+        amount_out_min = swap.get("amount_out_min")
+        if amount_out_min is None:
+            (quote,) = uni.quote_exact_input_single(chain, swap["token_in"], swap["token_out"], swap["fee"], [swap["amount_in"]])
+            if quote is None:
+                return {"error": f"Pool liquidity cannot fill the {swap['token_in']} -> {swap['token_out']} swap."}
+            amount_out_min = quote * (10_000 - slippage_bps) // 10_000
+        if swap.get("to_eth") and swap["token_out"].lower() != WETH9[chain].lower():
+            return {"error": "Only swaps into WETH can be paid out as ETH."}
+        recipient = ADDRESS_THIS if swap.get("to_eth") else None
+        bundle.swap_exact_input_single(swap["token_in"], swap["token_out"], swap["fee"], swap["amount_in"], amount_out_min, recipient)
+        if swap.get("to_eth"):
+            unwrap_min += amount_out_min
+    if unwrap_min:
+        bundle.unwrap_weth(unwrap_min)
+    return bundle.send()
 
 @tool
 def add_liquidity_uniswap(chain: str, token0: str, token1: str, fee: int, tick_lower: int, tick_upper: int, amount0: int, amount1: int):
     """
     Adds liquidity to a Uniswap V3 pool.
     """
-    approve_tx0 = approve_token(chain, token0, amount0)
-    approve_tx1 = approve_token(chain, token1, amount1)
-    add_liquidity_tx = uni.add_liquidity(chain, token0, token1, fee, tick_lower, tick_upper, amount0, amount1)
+    approve_tx0, approve_tx1 = uni.ensure_allowances(chain, [
+        (token0, amount0, NONFUNGIBLE_POSITION_MANAGER[chain]), (token1, amount1, NONFUNGIBLE_POSITION_MANAGER[chain])
+    ])
+    add_liquidity_tx = uni.add_liquidity(chain, token0, token1, fee, tick_lower, tick_upper, amount0, amount1,
+                                         gas=MINT_POSITION_GAS if approve_tx0 or approve_tx1 else None)
     return {"approve_txs": [approve_tx0, approve_tx1], "add_liquidity_tx": add_liquidity_tx}
 
 @tool
@@ -194,8 +271,12 @@ tools = [
     web_search,
     add_liquidity_uniswap,
     remove_liquidity_uniswap,
+    quote_uniswap_swap,
     perform_uniswap_swap,
+    perform_uniswap_route_swap,
+    perform_uniswap_rebalance,
     perform_cctp_bridge,
+    get_bridge_status,
     MeTTaGraphAnalyzerTool,
 ]
 tool_node = ToolNode(tools)
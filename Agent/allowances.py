@@ -0,0 +1,203 @@
+import time
+import threading
+
+from web3 import Web3
+
+from multicall import multicall, read_call
+from rpc import contract
+
+# ERC-20 allowance reads plus the EIP-2612 permit surface (USDC and most newer tokens)
+ERC20_ALLOWANCE_ABI = [
+    {"constant": True, "inputs": [{"name": "owner", "type": "address"}, {"name": "spender", "type": "address"}],
+     "name": "allowance", "outputs": [{"name": "", "type": "uint256"}], "type": "function"},
+    {"constant": False, "inputs": [{"name": "spender", "type": "address"}, {"name": "value", "type": "uint256"}],
+     "name": "approve", "outputs": [{"name": "", "type": "bool"}], "type": "function"},
+    {"constant": True, "inputs": [], "name": "name", "outputs": [{"name": "", "type": "string"}], "type": "function"},
+    {"constant": True, "inputs": [], "name": "version", "outputs": [{"name": "", "type": "string"}], "type": "function"},
+    {"constant": True, "inputs": [{"name": "owner", "type": "address"}], "name": "nonces",
+     "outputs": [{"name": "", "type": "uint256"}], "type": "function"},
+]
+
+_ALLOWANCE_FUNCTIONS = {entry["name"]: entry for entry in ERC20_ALLOWANCE_ABI}
+
+PERMIT_TYPES = {
+    "Permit": [
+        {"name": "owner", "type": "address"},
+        {"name": "spender", "type": "address"},
+        {"name": "value", "type": "uint256"},
+        {"name": "nonce", "type": "uint256"},
+        {"name": "deadline", "type": "uint256"},
+    ]
+}
+
+
+class AllowanceCache:
+    """
+    ERC-20 allowances per (chain, owner, token, spender), as they will stand
+    once every transaction we have sent is mined.
+
+    Allowances are read in bulk (one multicall round trip for any number of pairs)
+    and trusted for `ttl` seconds; approvals and spends we send update them
+    directly. A spend reserves its amount with ensure() before it is sent and
+    settles it with settle() afterwards, so concurrent flows (e.g. several
+    bridges) never count on the same allowance. When the allowance left is
+    short, ensure() approves enough for every reserved spend at once: ERC-20
+    approve() sets rather than adds, and the spends are nonce-ordered after it.
+    An approval we sent is trusted until the allowance is reread, or until
+    transaction_failed() (subscribed to the NonceManager) reports it reverted
+    or dropped.
+    """
+    def __init__(self, ttl: float = 300.0):
+        self.ttl = ttl
+        self.stats = {"hits": 0, "reads": 0, "batches": 0, "approvals": 0, "skipped": 0}
+        self._entries = {}          # (chain, owner, token, spender) -> {"allowance", "reserved", "read_at", "approval", "lock"}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _key(chain: str, owner: str, token: str, spender: str) -> tuple:
+        return chain, owner.lower(), token.lower(), spender.lower()
+
+    def _entry(self, key: tuple) -> dict:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                entry = self._entries[key] = {"allowance": None, "reserved": 0, "read_at": 0.0, "approval": None,
+                                              "lock": threading.Lock()}
+            return entry
+
+    def _fresh(self, entry: dict) -> bool:
+        # Reserved entries reflect transactions the node may not have mined yet; never reread those
+        return entry["allowance"] is not None and (entry["reserved"] or time.monotonic() - entry["read_at"] < self.ttl)
+
+    def get(self, chain: str, owner: str, token: str, spender: str):
+        """The cached allowance, or None if it is unknown or expired."""
+        entry = self._entry(self._key(chain, owner, token, spender))
+        return entry["allowance"] if self._fresh(entry) else None
+
+    def load(self, chain: str, w3, owner: str, pairs) -> dict:
+        """{(token, spender): allowance} for every pair, reading the ones not cached in one multicall round trip."""
+        pairs = list(dict.fromkeys(pairs))
+        result, missing = {}, []
+        for token, spender in pairs:
+            entry = self._entry(self._key(chain, owner, token, spender))
+            if self._fresh(entry):
+                self.stats["hits"] += 1
+                result[(token, spender)] = entry["allowance"]
+            else:
+                missing.append((token, spender))
+        if missing:
+            self.stats["reads"] += len(missing)
+            self.stats["batches"] += 1
+            allowance = _ALLOWANCE_FUNCTIONS["allowance"]
+            values = multicall(w3, [
+                read_call(token, allowance, owner, Web3.to_checksum_address(spender)) for token, spender in missing
+            ], allow_failure=False)
+            for (token, spender), value in zip(missing, values):
+                result[(token, spender)] = self.seed(chain, owner, token, spender, value)
+        return result
+
+    def seed(self, chain: str, owner: str, token: str, spender: str, allowance: int) -> int:
+        """Takes an allowance read elsewhere (e.g. in a multicall) as fresh, unless spends are reserved against it."""
+        entry = self._entry(self._key(chain, owner, token, spender))
+        with self._lock:
+            if not entry["reserved"] or entry["allowance"] is None:
+                entry["allowance"], entry["read_at"], entry["approval"] = allowance, time.monotonic(), None
+            return entry["allowance"]
+
+    def ensure(self, chain: str, w3, owner: str, token: str, spender: str, amount: int, approve):
+        """
+        Reserves `amount` for a spend about to be sent. If the unreserved
+        allowance is short, first calls approve(total) with the total every
+        reserved spend needs and returns its tx hash; otherwise returns None.
+        """
+        entry = self._entry(self._key(chain, owner, token, spender))
+        with entry["lock"]:
+            if not self._fresh(entry):
+                self.load(chain, w3, owner, [(token, spender)])
+            with self._lock:
+                if entry["allowance"] - entry["reserved"] >= amount:
+                    entry["reserved"] += amount
+                    self.stats["skipped"] += 1
+                    return None
+                total = entry["reserved"] + amount
+            tx_hash = approve(total)
+            self.stats["approvals"] += 1
+            with self._lock:
+                entry["allowance"], entry["reserved"], entry["read_at"] = total, total, time.monotonic()
+                entry["approval"] = tx_hash
+            return tx_hash
+
+    def pending_approval(self, chain: str, owner: str, token: str, spender: str):
+        """
+        The approval ensure() or record_approval() last sent for the pair, until
+        the allowance is next read from the chain or the approval is reported
+        failed; spends covered by it may be nonce-ordered behind it even though
+        ensure() returned None for them. It may already be mined.
+        """
+        return self._entry(self._key(chain, owner, token, spender))["approval"]
+
+    def settle(self, chain: str, owner: str, token: str, spender: str, amount: int, sent: bool = True):
+        """Releases a reservation from ensure(); a sent spend also uses up that much allowance."""
+        entry = self._entry(self._key(chain, owner, token, spender))
+        with self._lock:
+            entry["reserved"] = max(0, entry["reserved"] - amount)
+            if sent and entry["allowance"] is not None:
+                entry["allowance"] = max(0, entry["allowance"] - amount)
+
+    def forget(self, chain: str, owner: str, token: str, spender: str):
+        """Drops a cached allowance that may be wrong (e.g. a permit whose transaction was never sent); the next use rereads it."""
+        entry = self._entry(self._key(chain, owner, token, spender))
+        with self._lock:
+            entry["allowance"], entry["read_at"], entry["approval"] = None, 0.0, None
+
+    def record_approval(self, chain: str, owner: str, token: str, spender: str, amount: int, tx_hash: str = None):
+        """An approval sent outside ensure() (or a permit) sets the allowance outright."""
+        entry = self._entry(self._key(chain, owner, token, spender))
+        with self._lock:
+            entry["allowance"], entry["read_at"], entry["approval"] = amount, time.monotonic(), tx_hash
+
+    def transaction_failed(self, chain: str, owner: str, tx_hash=None):
+        """
+        NonceManager.subscribe() callback: forgets the approval sent as `tx_hash`
+        (it reverted), or without a hash every approval the owner has pending on
+        the chain (dropped transactions; we cannot tell which). Those allowances
+        are reread on next use.
+        """
+        failed = _tx_id(tx_hash) if tx_hash is not None else None
+        with self._lock:
+            for key, entry in self._entries.items():
+                if key[:2] != (chain, owner.lower()) or entry["approval"] is None:
+                    continue
+                if failed is None or _tx_id(entry["approval"]) == failed:
+                    entry["allowance"], entry["read_at"], entry["approval"] = None, 0.0, None
+
+
+def _tx_id(tx_hash) -> str:
+    # Hashes arrive as hex strings (with or without 0x) or bytes
+    return (tx_hash.hex() if isinstance(tx_hash, (bytes, bytearray)) else str(tx_hash)).lower().removeprefix("0x")
+
+
+def sign_permit(w3, account, token: str, spender: str, value: int, deadline: int, chain_id: int) -> tuple:
+    """
+    An EIP-2612 permit letting `spender` move `value` of `token` from `account`
+    until `deadline`, signed offline: (value, deadline, v, r, s), as taken by
+    the token's permit() and the router's selfPermit(). Reads the token's name,
+    version and the account's permit nonce in one batch.
+    """
+    token_contract = contract(w3, token, ERC20_ALLOWANCE_ABI)
+    with w3.batch_requests() as batch:
+        batch.add(token_contract.functions.name())
+        batch.add(token_contract.functions.version())
+        batch.add(token_contract.functions.nonces(account.address))
+        name, version, nonce = batch.execute()
+    signed = account.sign_typed_data(
+        domain_data={"name": name, "version": version, "chainId": chain_id, "verifyingContract": token_contract.address},
+        message_types=PERMIT_TYPES,
+        message_data={"owner": account.address, "spender": Web3.to_checksum_address(spender),
+                      "value": value, "nonce": nonce, "deadline": deadline},
+    )
+    return value, deadline, signed.v, signed.r.to_bytes(32, "big"), signed.s.to_bytes(32, "big")
+
+
+# Shared by every helper in the process
+allowance_cache = AllowanceCache()
@@ -0,0 +1,208 @@
+import time
+import heapq
+import random
+import asyncio
+import threading
+from datetime import timezone
+from email.utils import parsedate_to_datetime
+
+import aiohttp
+
+CIRCLE_ATTESTATION_API = "https://iris-api.circle.com/v1/attestations"
+
+
+def _retry_after(value: str):
+    """Seconds to wait from a Retry-After header (delay-seconds or HTTP-date), or None if absent or unparsable."""
+    if not value:
+        return None
+    try:
+        return max(float(value), 0.0)
+    except ValueError:
+        pass
+    try:
+        when = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if when.tzinfo is None:
+        when = when.replace(tzinfo=timezone.utc)     # "-0000": UTC with no source zone
+    return max(when.timestamp() - time.time(), 0.0)
+
+
+class AttestationTimeout(Exception):
+    pass
+
+
+class AttestationPoller:
+    """
+    Tracks many CCTP burns at once and resolves one future per burn with its
+    attestation.
+
+    All burns share one pooled HTTP session and one scheduler task. Each burn
+    is polled on its own schedule: first after `initial_interval`, then with the
+    interval growing by `backoff` up to `max_interval` (with jitter, so burns
+    sent together do not poll in lockstep). A 429 or 5xx doubles the interval
+    instead (still capped), and a Retry-After header overrides the next delay.
+    A burn that is not attested within `max_wait` fails
+    with AttestationTimeout. At most `max_concurrency` requests are in flight.
+
+    Async callers await wait(); threads use watch_threadsafe(), which runs the
+    poller on a private background loop.
+    """
+    def __init__(self, base_url: str = CIRCLE_ATTESTATION_API, initial_interval: float = 2.0,
+                 max_interval: float = 30.0, backoff: float = 1.5, max_wait: float = 1800.0,
+                 max_concurrency: int = 8, timeout: float = 10.0):
+        self.base_url = base_url
+        self.initial_interval = initial_interval
+        self.max_interval = max_interval
+        self.backoff = backoff
+        self.max_wait = max_wait
+        self.max_concurrency = max_concurrency
+        self.timeout = aiohttp.ClientTimeout(total=timeout)
+        self.stats = {"requests": 0, "completed": 0, "timed_out": 0, "throttled": 0}
+        self._burns = {}            # burn hash -> {"future", "deadline", "interval"}
+        self._schedule = []         # heap of (due, burn hash)
+        self._loop = None
+        self._session = None
+        self._semaphore = None
+        self._wakeup = None
+        self._scheduler = None
+        self._sync_loop = None
+        self._sync_lock = threading.Lock()
+
+    def _bind(self):
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            if self._loop is not None and not self._loop.is_closed():
+                raise RuntimeError("AttestationPoller is bound to another running event loop")
+            self._loop = loop
+            connector = aiohttp.TCPConnector(limit=self.max_concurrency, keepalive_timeout=30)
+            self._session = aiohttp.ClientSession(connector=connector, headers={"Accept": "application/json"})
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+            self._wakeup = asyncio.Event()
+            self._burns.clear()
+            self._schedule.clear()
+            self._scheduler = None
+        if self._scheduler is None or self._scheduler.done():
+            self._scheduler = loop.create_task(self._run())
+
+    def watch(self, burn_tx_hash: str, max_wait: float = None) -> asyncio.Future:
+        """The future for `burn_tx_hash`'s attestation; watching the same burn twice shares it."""
+        self._bind()
+        burn = self._burns.get(burn_tx_hash)
+        if burn is None:
+            now = time.monotonic()
+            burn = self._burns[burn_tx_hash] = {
+                "future": self._loop.create_future(),
+                "deadline": now + (self.max_wait if max_wait is None else max_wait),
+                "interval": self.initial_interval,
+            }
+            heapq.heappush(self._schedule, (now, burn_tx_hash))
+            self._wakeup.set()
+        return burn["future"]
+
+    async def wait(self, burn_tx_hash: str, max_wait: float = None) -> str:
+        return await asyncio.shield(self.watch(burn_tx_hash, max_wait))
+
+    def watch_threadsafe(self, burn_tx_hash: str, max_wait: float = None):
+        """A concurrent.futures.Future for the attestation, usable from any thread."""
+        async def waiter():
+            return await self.wait(burn_tx_hash, max_wait)
+        return asyncio.run_coroutine_threadsafe(waiter(), self._background_loop())
+
+    def pending(self) -> int:
+        return len(self._burns)
+
+    async def aclose(self):
+        if self._scheduler:
+            self._scheduler.cancel()
+        for burn in self._burns.values():
+            burn["future"].cancel()
+        self._burns.clear()
+        if self._session:
+            await self._session.close()
+        self._loop = self._session = self._scheduler = None
+
+    def close(self):
+        """Stops the background loop used by watch_threadsafe()."""
+        with self._sync_lock:
+            loop, self._sync_loop = self._sync_loop, None
+        if loop:
+            asyncio.run_coroutine_threadsafe(self.aclose(), loop).result()
+            loop.call_soon_threadsafe(loop.stop)
+
+    def _background_loop(self):
+        with self._sync_lock:
+            if self._sync_loop is None:
+                self._sync_loop = asyncio.new_event_loop()
+                threading.Thread(target=self._sync_loop.run_forever, daemon=True, name="attestations").start()
+            return self._sync_loop
+
+    async def _run(self):
+        tasks = set()
+        while True:
+            now = time.monotonic()
+            while self._schedule and self._schedule[0][0] <= now:
+                _, burn_tx_hash = heapq.heappop(self._schedule)
+                if burn_tx_hash in self._burns:
+                    task = asyncio.ensure_future(self._poll(burn_tx_hash))
+                    tasks.add(task)
+                    task.add_done_callback(tasks.discard)
+            timeout = self._schedule[0][0] - now if self._schedule else None
+            self._wakeup.clear()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+
+    async def _poll(self, burn_tx_hash: str):
+        burn = self._burns[burn_tx_hash]
+        throttled, retry_after = False, None
+        try:
+            async with self._semaphore:
+                self.stats["requests"] += 1
+                async with self._session.get(f"{self.base_url}/{burn_tx_hash}", timeout=self.timeout) as response:
+                    if response.status == 429 or response.status >= 500:
+                        self.stats["throttled"] += 1
+                        throttled = True
+                        retry_after = _retry_after(response.headers.get("Retry-After"))
+                        data = {}
+                    elif response.status == 404:
+                        data = {}  # not indexed by Circle yet
+                    else:
+                        response.raise_for_status()
+                        data = await response.json(content_type=None)
+        except (aiohttp.ClientError, asyncio.TimeoutError):
+            data = {}
+        except Exception as e:
+            self._finish(burn_tx_hash, error=e)
+            return
+
+        if not isinstance(data, dict):
+            data = {}  # not a JSON object: treat as not ready
+        if data.get("status") == "complete" and data.get("attestation"):
+            self.stats["completed"] += 1
+            self._finish(burn_tx_hash, result=data["attestation"])
+            return
+
+        now = time.monotonic()
+        if now >= burn["deadline"]:
+            self.stats["timed_out"] += 1
+            self._finish(burn_tx_hash, error=AttestationTimeout(f"No attestation for {burn_tx_hash} yet"))
+            return
+        if throttled:
+            burn["interval"] = min(self.max_interval, burn["interval"] * 2)
+            delay = retry_after or burn["interval"]
+        else:
+            delay = burn["interval"] * random.uniform(0.8, 1.2)
+            burn["interval"] = min(self.max_interval, burn["interval"] * self.backoff)
+        heapq.heappush(self._schedule, (min(now + delay, burn["deadline"]), burn_tx_hash))
+        self._wakeup.set()
+
+    def _finish(self, burn_tx_hash: str, result=None, error=None):
+        burn = self._burns.pop(burn_tx_hash)
+        if burn["future"].done():
+            return
+        if error is not None:
+            burn["future"].set_exception(error)
+        else:
+            burn["future"].set_result(result)
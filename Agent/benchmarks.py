@@ -0,0 +1,1053 @@
+"""
+Benchmarks against the local stand-ins in standins.py.
+
+Usage: python benchmarks.py [name ...]   (no names runs everything)
+"""
+import sys
+import time
+import asyncio
+import tempfile
+
+import requests
+import pandas as pd
+
+import wallet_analyzer
+from price_client import DexScreenerClient, GeckoTerminalClient, HedgedPriceClient, LatencyHistogram
+from history import DAY, HistoryStore
+from portfolio import Portfolio
+from risk import RiskReport, daily_returns, pool_depth
+from graph_tool import find_swap_route, load_graph
+from price_cache import PriceCache, SQLitePriceStore
+from token_registry import TokenRegistry
+from attestation import AttestationPoller, AttestationTimeout
+from bridge_jobs import BridgeJobQueue
+from nonces import NonceManager
+from fees import FeeOracle
+from allowances import AllowanceCache
+from uniswap import ERC20_ABI, NONFUNGIBLE_POSITION_MANAGER, SWAP_GAS, SWAP_HOP_GAS, UNISWAP_ROUTER, UniswapV3Helper
+from allowances import ERC20_ALLOWANCE_ABI
+from quoter import (MAX_SQRT_RATIO, MAX_TICK, MIN_SQRT_RATIO, MIN_TICK, POOL_ABI, PoolStateCache, compute_swap_step,
+                    get_sqrt_ratio_at_tick, get_tick_at_sqrt_ratio, pool_address, quote_exact_input, quote_exact_output)
+from cctp import CCTP, DEPOSIT_FOR_BURN_GAS, USDC_ABI, TOKEN_MESSENGER_ABI, GeneralizedCCTP
+from standins import StandInCctp, StandInCdpClient, StandInEth, jsonrpc_standin, synthetic_pool, attestation_standin, dexscreener_standin, geckoterminal_standin, fake_address
+
+WALLET = "0xf71657318e9b5a5b5173d16327e34e4675ec5d56"
+
+
+def _use_standin_prices(url: str, ttl: float = 0.0, batch_window: float = None):
+    # ttl=0 disables caching, so each load measures the upstream path
+    wallet_analyzer.price_client.close()
+    wallet_analyzer.price_client = DexScreenerClient(f"{url}/latest/dex/tokens")
+    wallet_analyzer.price_cache = PriceCache(wallet_analyzer.price_client, ttl=ttl, stale_ttl=0, batch_window=batch_window)
+
+
+async def _load_wallet(cdp, address):
+    try:
+        return await wallet_analyzer.get_wallet_balances(address, cdp=cdp)
+    finally:
+        await wallet_analyzer.price_client.aclose()
+
+
+async def _sequential_wallet_load(cdp, address, price_url):
+    # The original behaviour: one chain after the other, one blocking batch of 10 at a time
+    for chain in wallet_analyzer.CHAINS:
+        balances = await cdp.evm.list_token_balances(address, chain, page_size=100)
+        addresses = [b.token.contract_address for b in balances.balances]
+        for i in range(0, len(addresses), 10):
+            requests.get(f"{price_url}/latest/dex/tokens/{','.join(addresses[i : i + 10])}").json()
+
+
+def bench_wallet_load(tokens_per_chain: int = 60, cdp_delay: float = 0.15, price_delay: float = 0.1):
+    """End-to-end latency of one wallet load: sequential vs concurrent chains and price batches."""
+    with dexscreener_standin(delay=price_delay) as dex:
+        _use_standin_prices(dex.url)
+        cdp = StandInCdpClient(tokens_per_chain, delay=cdp_delay)
+
+        start = time.perf_counter()
+        asyncio.run(_sequential_wallet_load(cdp, WALLET, dex.url))
+        sequential = time.perf_counter() - start
+
+        start = time.perf_counter()
+        asyncio.run(_load_wallet(cdp, WALLET))
+        concurrent = time.perf_counter() - start
+
+    print(f"wallet_load: {len(wallet_analyzer.CHAINS)} chains x {tokens_per_chain} tokens")
+    print(f"   sequential: {sequential * 1e3:.0f} ms | concurrent: {concurrent * 1e3:.0f} ms"
+          f" | {sequential / concurrent:.1f}x")
+
+
+def bench_price_client(tokens: int = 120, price_delay: float = 0.05, calls: int = 5):
+    """Sync price lookups: a new blocking connection per batch of 10 vs the pooled async client."""
+    with dexscreener_standin(delay=price_delay) as dex:
+        addresses = [f"0x{i:040x}" for i in range(tokens)]
+        start = time.perf_counter()
+        for _ in range(calls):
+            for i in range(0, tokens, 10):
+                requests.get(f"{dex.url}/latest/dex/tokens/{','.join(addresses[i : i + 10])}").json()
+        blocking = (time.perf_counter() - start) / calls
+        blocking_requests = dex.request_count
+
+        client = DexScreenerClient(f"{dex.url}/latest/dex/tokens")
+        start = time.perf_counter()
+        for _ in range(calls):
+            client.get_prices_sync(addresses, "base")
+        pooled = (time.perf_counter() - start) / calls
+        client.close()
+
+    print(f"price_client: {tokens} tokens")
+    print(f"   blocking: {blocking * 1e3:.0f} ms ({blocking_requests // calls} requests)"
+          f" | pooled: {pooled * 1e3:.0f} ms ({(dex.request_count - blocking_requests) // calls} requests)")
+
+
+def bench_price_cache(refreshes: int = 20, tokens_per_chain: int = 60, price_delay: float = 0.05):
+    """Repeated wallet refreshes with and without the shared TTL price cache."""
+    with dexscreener_standin(delay=price_delay) as dex:
+        cdp = StandInCdpClient(tokens_per_chain, delay=0)
+        results = {}
+        for label, ttl in (("uncached", 0.0), ("cached", 60.0)):
+            _use_standin_prices(dex.url, ttl)
+            before = dex.request_count
+
+            async def refresh_many():
+                try:
+                    for _ in range(refreshes):
+                        await wallet_analyzer.get_wallet_balances(WALLET, cdp=cdp)
+                finally:
+                    await wallet_analyzer.price_client.aclose()
+
+            start = time.perf_counter()
+            asyncio.run(refresh_many())
+            results[label] = ((time.perf_counter() - start) / refreshes, dex.request_count - before)
+
+        # Two processes sharing one SQLite store: once both memory entries expire, only one goes upstream
+        addresses = [fake_address("shared", i) for i in range(tokens_per_chain)]
+        ttl = 0.5
+        with tempfile.TemporaryDirectory() as root:
+            store = f"{root}/prices.sqlite"
+            client = DexScreenerClient(f"{dex.url}/latest/dex/tokens")
+            first, second = (PriceCache(client, ttl=ttl, stale_ttl=0, backend=SQLitePriceStore(store)) for _ in range(2))
+
+            async def share():
+                try:
+                    await first.get_prices(addresses, "base")
+                    await second.get_prices(addresses, "base")
+                    await asyncio.sleep(ttl)
+                    await first.get_prices(addresses, "base")
+                    await second.get_prices(addresses, "base")
+                finally:
+                    await client.aclose()
+
+            asyncio.run(share())
+        assert second.stats["upstream_requests"] == 0, "a fresher row in the shared store was not used"
+
+        # One asyncio.run() per Streamlit rerun: every run reuses the client's one session
+        client = DexScreenerClient(f"{dex.url}/latest/dex/tokens")
+        cache = PriceCache(client, ttl=0, stale_ttl=0, batch_window=0.01)
+        sessions = set()
+
+        async def rerun():
+            await cache.get_prices(addresses, "base")
+            sessions.add(client._loop_state.session)
+
+        for _ in range(5):
+            asyncio.run(rerun())
+        assert len(sessions) == 1, f"{len(sessions)} sessions opened across 5 event loops"
+        assert not cache._inflight and not cache._queued, "per-call fetch state outlived its event loop"
+        client.close()
+        assert all(session.closed for session in sessions), "a price session was left open"
+
+    print(f"price_cache: {refreshes} refreshes of {len(wallet_analyzer.CHAINS)} x {tokens_per_chain} tokens")
+    for label, (per_refresh, requests_made) in results.items():
+        print(f"   {label}: {per_refresh * 1e3:.1f} ms/refresh, {requests_made} upstream requests")
+    print(f"   shared store, 2 processes, 2 expiries: {first.stats['upstream_requests']} + {second.stats['upstream_requests']}"
+          f" upstream fetches")
+
+
+async def _load_pages_then_price(cdp, address, chain):
+    # Baseline: every page fetched first, then one page of prices at a time
+    pages = [page async for page in wallet_analyzer.iter_balance_pages(cdp, address, chain)]
+    for page in pages:
+        await wallet_analyzer.price_cache.get_prices([b.token.contract_address for b in page], chain)
+    return sum(len(page) for page in pages)
+
+
+def bench_pagination(tokens: int = 1000, cdp_delay: float = 0.08, price_delay: float = 0.08):
+    """A large wallet: truncated first page vs all pages serially vs pipelined pages and prices."""
+    with dexscreener_standin(delay=price_delay) as dex:
+        cdp = StandInCdpClient(tokens, delay=cdp_delay)
+        chain = "base"
+
+        async def run(coro_fn):
+            try:
+                start = time.perf_counter()
+                count = await coro_fn()
+                return count, time.perf_counter() - start
+            finally:
+                await wallet_analyzer.price_client.aclose()
+
+        _use_standin_prices(dex.url)
+        first_page = asyncio.run(run(lambda: cdp.evm.list_token_balances(WALLET, chain, page_size=100)))
+        _use_standin_prices(dex.url)
+        serial = asyncio.run(run(lambda: _load_pages_then_price(cdp, WALLET, chain)))
+        _use_standin_prices(dex.url)
+
+        async def pipelined():
+            return len(await wallet_analyzer.fetch_balances(cdp, WALLET, chain))
+        streamed = asyncio.run(run(pipelined))
+
+    print(f"pagination: wallet with {tokens} tokens")
+    print(f"   first page only: {len(first_page[0].balances)} tokens")
+    print(f"   serial: {serial[0]} tokens in {serial[1] * 1e3:.0f} ms"
+          f" | pipelined: {streamed[0]} tokens in {streamed[1] * 1e3:.0f} ms")
+
+
+def bench_multi_wallet(wallets: int = 200, tokens_per_chain: int = 20, cdp_delay: float = 0.05, price_delay: float = 0.05):
+    """
+    Wallets per second: one get_wallet_balances at a time vs the streaming batch
+    API, whose price lookups are grouped across wallets before reaching the client.
+    """
+    addresses = [f"0x{i:040x}" for i in range(wallets)]
+    with dexscreener_standin(delay=price_delay) as dex:
+        cdp = StandInCdpClient(tokens_per_chain, delay=cdp_delay, shared_fraction=0.5)
+        results = {}
+        for label in ("one_by_one", "batch"):
+            _use_standin_prices(dex.url, ttl=60.0, batch_window=wallet_analyzer.PRICE_BATCH_WINDOW if label == "batch" else None)
+            before = dex.request_count
+
+            async def run():
+                try:
+                    if label == "one_by_one":
+                        for address in addresses:
+                            await wallet_analyzer.get_wallet_balances(address, cdp=cdp)
+                    else:
+                        async for _ in wallet_analyzer.stream_wallets_balances(addresses, cdp=cdp):
+                            pass
+                finally:
+                    await wallet_analyzer.price_client.aclose()
+
+            start = time.perf_counter()
+            asyncio.run(run())
+            results[label] = (time.perf_counter() - start, dex.request_count - before)
+
+    # Distinct tokens per chain: the shared ones plus every wallet's own
+    shared = int(tokens_per_chain * 0.5)
+    distinct = len(wallet_analyzer.CHAINS) * (shared + wallets * (tokens_per_chain - shared))
+    fewest = -(-distinct // DexScreenerClient.max_batch)
+    assert results["batch"][1] <= results["one_by_one"][1] / 2, "price lookups were not grouped across wallets"
+
+    print(f"multi_wallet: {wallets} wallets x {len(wallet_analyzer.CHAINS)} chains x {tokens_per_chain} tokens")
+    for label, (elapsed, requests_made) in results.items():
+        print(f"   {label}: {wallets / elapsed:.1f} wallets/s, {requests_made} price requests")
+    print(f"   ({distinct} distinct tokens: at least {fewest} requests of {DexScreenerClient.max_batch})")
+
+
+def _substring_categorize(tokens):
+    # The original categorize_tokens: eight substring checks per token on every refresh
+    wallet_tokens, defi_tokens, miscellaneous_tokens = [], [], []
+    for data in tokens.values():
+        name = symbol = data["symbol"].lower()
+        if ("moo" in name or "farm" in name or "stake" in name or "lp" in symbol or "stk" in symbol
+                or "moo" in symbol or "cake" in symbol or "mw" in symbol):
+            data["protocol"] = "DeFi"
+            defi_tokens.append(data)
+        elif "airdrop" in name or "reward" in name:
+            miscellaneous_tokens.append(data)
+        else:
+            wallet_tokens.append(data)
+    return wallet_tokens, defi_tokens, miscellaneous_tokens
+
+
+def bench_token_registry(tokens: int = 20_000, refreshes: int = 10):
+    """Classifying a large portfolio on every refresh: the original substring checks vs the cached registry."""
+    symbols = ["WETH", "USDC", "mooCurveLP", "stkAAVE", "CAKE-LP", "Visit claim-reward.com", "AERO", "cbBTC",
+               "AirdropToken", "RewardPoints"]
+    balances = {
+        ("base", fake_address(i)): {
+            "chain": "base", "address": fake_address(i), "symbol": f"{symbols[i % len(symbols)]}{i}", "decimals": 18
+        }
+        for i in range(tokens)
+    }
+
+    expected = _substring_categorize(balances)
+    start = time.perf_counter()
+    for _ in range(refreshes):
+        _substring_categorize(balances)
+    substring = (time.perf_counter() - start) / refreshes
+
+    wallet_analyzer.token_registry = TokenRegistry()
+    start = time.perf_counter()
+    wallet_tokens, defi_tokens, miscellaneous_tokens = wallet_analyzer.categorize_tokens(balances)
+    first = time.perf_counter() - start
+    start = time.perf_counter()
+    for _ in range(refreshes):
+        wallet_analyzer.categorize_tokens(balances)
+    cached = (time.perf_counter() - start) / refreshes
+
+    # Same categories as the substring checks, and airdrop/reward tokens without a link or "claim" are not spam
+    spam = [t for t in miscellaneous_tokens if t["spam"]]
+    assert (wallet_tokens, defi_tokens, miscellaneous_tokens) == expected
+    assert all("claim" in t["symbol"].lower() for t in spam) and len(spam) < len(miscellaneous_tokens)
+
+    print(f"token_registry: {tokens} tokens")
+    print(f"   substring checks: {substring * 1e3:.1f} ms/refresh"
+          f" | registry: {first * 1e3:.1f} ms first, {cached * 1e3:.1f} ms/refresh after"
+          f" ({wallet_analyzer.token_registry.stats['classified']} classified, {len(spam)} spam,"
+          f" {len(miscellaneous_tokens) - len(spam)} misc not spam)")
+
+
+def _dict_dashboard(wallets):
+    # The original per-rerun work: Python sums, per-token lists and a formatted table
+    tokens = [t for classified in wallets.values() for t in classified["wallet_tokens"]]
+    defi = [t for classified in wallets.values() for t in classified["defi_tokens"]]
+    total_crypto = sum(token["value_usd"] for token in tokens)
+    total_defi = sum(pos.get("value_usd", 0) for pos in defi)
+    values = [token["value_usd"] for token in tokens]
+    labels = [token["symbol"] for token in tokens]
+    table = pd.DataFrame([
+        {
+            "Asset": token["symbol"],
+            "Balance": f"{token['balance']:.4f}",
+            "Price": f"${token['price']:,.2f}",
+            "Value": f"${token['value_usd']:,.2f}",
+            "Weight": f"{(token['value_usd'] / total_crypto) * 100:.1f}%",
+        }
+        for token in tokens
+    ])
+    by_chain = {}
+    for token in tokens + defi:
+        by_chain[token["chain"]] = by_chain.get(token["chain"], 0) + token["value_usd"]
+    return total_crypto + total_defi, values, labels, table, by_chain
+
+
+def bench_portfolio(wallets: int = 200, tokens_per_wallet: int = 250, reruns: int = 5):
+    """Dashboard aggregates for a large multi-wallet portfolio: dict loops per rerun vs one columnar build."""
+    data = {}
+    for w in range(wallets):
+        tokens = [
+            {"chain": wallet_analyzer.CHAINS[i % 2], "address": fake_address(w, i), "symbol": f"TKN{i}",
+             "balance": float(i + 1), "price": float(w % 7 + 1), "value_usd": float((i + 1) * (w % 7 + 1))}
+            for i in range(tokens_per_wallet)
+        ]
+        split = tokens_per_wallet * 4 // 5
+        data[f"0x{w:040x}"] = {"wallet_tokens": tokens[:split], "defi_tokens": tokens[split:], "miscellaneous_tokens": []}
+
+    start = time.perf_counter()
+    for _ in range(reruns):
+        _dict_dashboard(data)
+    loops = (time.perf_counter() - start) / reruns
+
+    start = time.perf_counter()
+    portfolio = Portfolio.from_wallets(data)
+    build = time.perf_counter() - start
+    start = time.perf_counter()
+    for _ in range(reruns):
+        portfolio.total, portfolio.by_chain, portfolio.top_holdings(10), portfolio.holdings("wallet")
+    reads = (time.perf_counter() - start) / reruns
+
+    print(f"portfolio: {len(portfolio)} positions across {wallets} wallets")
+    print(f"   dict loops: {loops * 1e3:.0f} ms/rerun | columnar: {build * 1e3:.0f} ms once per refresh,"
+          f" {reads * 1e3:.1f} ms/rerun")
+
+
+def bench_history(days: int = 365, refreshes_per_day: int = 96, positions: int = 50):
+    """A year of 15-minute refreshes: append cost, 30-day chart, and 24h/7d/30d deltas."""
+    wallet = WALLET
+    tokens = [
+        {"chain": "base", "address": fake_address(i), "symbol": f"TKN{i}", "balance": float(i + 1), "price": 1.0}
+        for i in range(positions)
+    ]
+    portfolio = Portfolio.from_balances({"wallet_tokens": tokens, "defi_tokens": [], "miscellaneous_tokens": []}, wallet)
+    now = time.time()
+    snapshots = days * refreshes_per_day
+
+    with tempfile.TemporaryDirectory() as root:
+        store = HistoryStore(root)
+        start = time.perf_counter()
+        for i in range(snapshots):
+            store.record(wallet, portfolio, ts=now - (snapshots - i) * DAY / refreshes_per_day)
+        append = (time.perf_counter() - start) / snapshots
+
+        start = time.perf_counter()
+        chart = store.downsample(wallet, now - 30 * DAY, now, interval=DAY / 8)
+        changes = store.changes(wallet, now=now)
+        read = time.perf_counter() - start
+
+        start = time.perf_counter()
+        month = store.positions(wallet, now - 30 * DAY, now)
+        positions_read = time.perf_counter() - start
+
+        # Symbols are untrusted token data: separators in them must round-trip through tokens.txt
+        spam = [{**tokens[0], "address": fake_address("spam"), "symbol": "Claim\tat x.com\nnow \"free\""}]
+        store.record(wallet, Portfolio.from_balances({"wallet_tokens": tokens[1:] + spam, "defi_tokens": [],
+                                                      "miscellaneous_tokens": []}, wallet), ts=now)
+        reopened = HistoryStore(root)
+        assert set(reopened.positions(wallet, now, now)["symbol"]) == {t["symbol"] for t in tokens[1:] + spam}
+        reopened.record(wallet, portfolio, ts=now + 1)
+
+    print(f"history: {snapshots} snapshots x {positions} positions")
+    print(f"   append: {append * 1e3:.2f} ms/snapshot | 30d chart ({len(chart)} points) + deltas: {read * 1e3:.1f} ms"
+          f" | 30d of positions ({len(month)} rows): {positions_read * 1e3:.1f} ms")
+
+
+def bench_hedging(calls: int = 200, tokens: int = 30, slow_rate: float = 0.1, error_rate: float = 0.03):
+    """Tail latency with a flaky primary source: DexScreener alone vs hedged to GeckoTerminal."""
+    addresses = [fake_address("hedge", i) for i in range(tokens)]
+    faults = {"slow_rate": slow_rate, "slow_delay": 1.0, "error_rate": error_rate}
+    with dexscreener_standin(delay=0.05, **faults) as dex, geckoterminal_standin(delay=0.06) as gecko:
+        clients = {
+            "dexscreener only": lambda: DexScreenerClient(f"{dex.url}/latest/dex/tokens", backoff=0.1),
+            "hedged": lambda: HedgedPriceClient([
+                DexScreenerClient(f"{dex.url}/latest/dex/tokens", backoff=0.1),
+                GeckoTerminalClient(f"{gecko.url}/networks", backoff=0.1),
+            ]),
+        }
+        results = {}
+        for label, make_client in clients.items():
+            client = make_client()
+
+            async def run():
+                latency, priced = LatencyHistogram(), 0
+                try:
+                    for _ in range(calls):
+                        start = time.perf_counter()
+                        try:
+                            priced += len(await client.get_prices(addresses, "base"))
+                        except Exception:
+                            pass
+                        latency.record(time.perf_counter() - start)
+                finally:
+                    await client.aclose()
+                return latency, priced
+
+            results[label] = (*asyncio.run(run()), client)
+
+    print(f"hedging: {calls} lookups of {tokens} tokens, primary {slow_rate:.0%} slow (1 s) and {error_rate:.0%} failing")
+    for label, (latency, priced, client) in results.items():
+        summary = latency.summary()
+        print(f"   {label}: p50 {summary['p50_ms']:.0f} ms | p90 {summary['p90_ms']:.0f} ms"
+              f" | p99 {summary['p99_ms']:.0f} ms | {priced / (calls * tokens):.1%} priced")
+        if isinstance(client, HedgedPriceClient):
+            for name, stats in client.summary().items():
+                print(f"      {name}: {stats['requests']} requests, {stats['cancelled']} cancelled,"
+                      f" {stats['failures']} failed, p50 {stats.get('p50_ms', 0):.0f} ms")
+
+
+def bench_risk(tokens: int = 500, days: int = 90, refreshes_per_day: int = 4):
+    """Risk report for a wallet with `tokens` positions and `days` of recorded history."""
+    graph = load_graph()
+    depth = pool_depth(graph)
+    listed = [address for chain, address in depth.index if chain == "eth"][:tokens]
+    rng = __import__("numpy").random.default_rng(0)
+    prices = rng.uniform(0.1, 100, tokens)
+    balances = rng.uniform(1, 1000, tokens)
+    now = time.time()
+    snapshots = days * refreshes_per_day
+
+    with tempfile.TemporaryDirectory() as root:
+        store = HistoryStore(root)
+        for i in range(snapshots):
+            prices = prices * (1 + rng.normal(0, 0.02, tokens))
+            positions = [
+                {"chain": "ethereum", "address": listed[k], "symbol": f"TKN{k}", "balance": balances[k], "price": prices[k]}
+                for k in range(tokens)
+            ]
+            portfolio = Portfolio.from_balances({"wallet_tokens": positions, "defi_tokens": [], "miscellaneous_tokens": []})
+            store.record(WALLET, portfolio, ts=now - (snapshots - i) * DAY / refreshes_per_day)
+
+        start = time.perf_counter()
+        report = RiskReport.for_wallet(portfolio, WALLET, history=store, depth=depth, now=now)
+        elapsed = time.perf_counter() - start
+
+    # A day with no recorded prices: the move across the gap is not a 1-day return
+    gapped = pd.DataFrame({"t": [1.0, 2.0, 8.0, 4.0]}, index=pd.to_datetime([0, DAY, 3 * DAY, 4 * DAY], unit="s", utc=True))
+    assert daily_returns(gapped)["t"].tolist() == [1.0, -0.5], "a multi-day gap was counted as a 1-day return"
+
+    print(f"risk: {tokens} positions, {days} days of history ({snapshots * tokens} position rows)")
+    print(f"   report in {elapsed * 1e3:.1f} ms, context {len(report.to_context())} chars")
+
+
+def bench_attestations(burns: int = 100, min_ready: float = 0.5, max_ready: float = 2.0, poll: float = 0.25):
+    """Waiting on many burns: the old blocking loop one burn at a time vs the shared async poller."""
+    import random
+    rng = random.Random(0)
+    ready = {fake_address("burn", i): rng.uniform(min_ready, max_ready) for i in range(burns)}
+    hashes = list(ready)
+
+    with attestation_standin(ready_after=ready.get) as server:
+        base_url = f"{server.url}/v1/attestations"
+        # The original get_attestation: poll on a fixed interval, blocking, one burn after another
+        start = time.perf_counter()
+        for burn_tx_hash in hashes[:10]:
+            while requests.get(f"{base_url}/{burn_tx_hash}").json().get("status") != "complete":
+                time.sleep(poll)
+        blocking = (time.perf_counter() - start) * burns / 10
+        blocking_requests = server.request_count * burns / 10
+
+        poller = AttestationPoller(base_url, initial_interval=poll, max_interval=1.0, max_wait=30)
+
+        async def run():
+            try:
+                return await asyncio.gather(*(poller.wait(h) for h in hashes[10:] + hashes[:10]))
+            finally:
+                await poller.aclose()
+
+        start = time.perf_counter()
+        attestations = asyncio.run(run())
+        concurrent = time.perf_counter() - start
+
+    # A pending answer that is not a JSON object means "not ready", not a failure
+    with attestation_standin(ready_after=0.3, pending_body=[]) as server:
+        odd = AttestationPoller(f"{server.url}/v1/attestations", initial_interval=0.05, max_wait=5)
+
+        async def run_odd():
+            try:
+                return await asyncio.wait_for(odd.wait(hashes[0]), 5)
+            finally:
+                await odd.aclose()
+
+        assert asyncio.run(run_odd()), "a non-object JSON body failed the burn"
+
+    # Every poll throttled: the interval doubles each time (0.05, 0.1, 0.2, 0.4 s, ...) instead of staying put
+    with attestation_standin(error_rate=1.0) as server:
+        throttled = AttestationPoller(f"{server.url}/v1/attestations", initial_interval=0.05, backoff=1.0, max_wait=1.0)
+
+        async def run_throttled():
+            try:
+                await throttled.wait(hashes[0])
+            except AttestationTimeout:
+                pass
+            finally:
+                await throttled.aclose()
+
+        asyncio.run(run_throttled())
+        assert throttled.stats["requests"] <= 6, f"{throttled.stats['requests']} polls while throttled for 1 s"
+
+    print(f"attestations: {burns} burns attested after {min_ready}-{max_ready} s")
+    print(f"   blocking (extrapolated from 10): {blocking:.1f} s, ~{blocking_requests:.0f} requests"
+          f" | poller: {concurrent:.2f} s, {poller.stats['requests']} requests,"
+          f" {sum(1 for a in attestations if a)} attested")
+
+
+def bench_bridge_jobs(bridges: int = 50, workers: int = 4, tx_delay: float = 0.05,
+                      min_ready: float = 0.5, max_ready: float = 1.5, mint_failures: int = 5):
+    """
+    Bridges driven by the persistent job queue, with a restart half-way through
+    submission, two running queues sharing the database (as two app processes
+    do) and a few mints failing once.
+    """
+    import random
+    from collections import Counter
+    rng = random.Random(0)
+    ready = {}
+
+    def ready_after(burn_tx_hash):
+        return ready.setdefault(burn_tx_hash, rng.uniform(min_ready, max_ready))
+
+    with attestation_standin(ready_after=ready_after) as server, tempfile.TemporaryDirectory() as root:
+        path = f"{root}/bridge_jobs.sqlite"
+        poller = AttestationPoller(f"{server.url}/v1/attestations", initial_interval=0.1, max_interval=0.5)
+        cctp = StandInCctp(poller, tx_delay=tx_delay, mint_failures=mint_failures)
+
+        # Half the jobs are submitted to a queue that is never started, as if the process died
+        stopped = BridgeJobQueue(cctp, path, workers)
+        for i in range(bridges // 2):
+            stopped.submit("BASE", "ETH", 1_000_000 + i, 0, WALLET)
+
+        start = time.perf_counter()
+        queue = BridgeJobQueue(cctp, path, workers, retry_base=0.2).start()
+        other = BridgeJobQueue(cctp, path, workers, retry_base=0.2).start()
+        for i in range(bridges - bridges // 2):
+            (queue, other)[i % 2].submit("BASE", "ETH", 2_000_000 + i, 0, WALLET)
+        for job in queue.jobs():
+            queue.wait(job["id"], timeout=60)
+        elapsed = time.perf_counter() - start
+        minted = len(queue.jobs(states=["minted"]))
+        timings = queue.stage_timings()
+        queue.close()
+        other.close()
+        poller.close()
+
+    burns = Counter(parts[2] for parts in cctp.sent if parts[0] == "burn")         # amounts are unique per job
+    mints = Counter(parts[2] for parts in cctp.sent if parts[0] == "mint")
+    assert minted == bridges, f"{minted}/{bridges} minted"
+    assert all(count == 1 for count in burns.values()) and len(burns) == bridges, "a job was burned twice"
+    assert all(count == 1 for count in mints.values()) and len(mints) == bridges, "a job was minted twice"
+
+    sequential = bridges * (3 * tx_delay + (min_ready + max_ready) / 2)
+    print(f"bridge_jobs: {bridges} bridges ({bridges // 2} resumed after a restart), 2 queues x {workers} workers")
+    print(f"   {minted} minted in {elapsed:.2f} s (one at a time would take ~{sequential:.0f} s);"
+          f" each burned and minted once, {mint_failures} failed mints retried")
+    for state, stats in timings.items():
+        print(f"      -> {state}: mean {stats['mean_s'] * 1e3:.0f} ms, p95 {stats['p95_s'] * 1e3:.0f} ms")
+
+
+def bench_nonces(flows: int = 10, rpc_delay: float = 0.05, block_time: float = 1.0):
+    """
+    Dependent approve -> swap pairs from one account: a nonce read per send vs
+    the local nonce manager; then recovery from a transaction the node drops.
+    """
+    from eth_account import Account
+    from web3.exceptions import TimeExhausted
+    account = Account.from_key("0x" + "11" * 32)
+
+    def transaction(i):
+        return {"to": account.address, "value": i, "gas": 21000, "chainId": 1,
+                "maxFeePerGas": 2 * 10**9, "maxPriorityFeePerGas": 10**9, "data": b""}
+
+    def wait_mined(w3, tx_hash):
+        while w3.eth.get_transaction_receipt(tx_hash) is None:
+            time.sleep(block_time / 10)
+
+    # Before: each send reads the mined nonce, so the swap has to wait for its approval to be mined
+    w3 = StandInEth(rpc_delay, block_time)
+    start = time.perf_counter()
+    for i in range(2 * flows):
+        tx = {**transaction(i), "nonce": w3.eth.get_transaction_count(account.address)}
+        wait_mined(w3, w3.eth.send_raw_transaction(account.sign_transaction(tx).raw_transaction))
+    before, before_calls = time.perf_counter() - start, dict(w3.calls)
+
+    w3 = StandInEth(rpc_delay, block_time)
+    nonces = NonceManager()
+    start = time.perf_counter()
+    sent = [nonces.send("ETH", w3, account, transaction(i)) for i in range(2 * flows)]
+    queued = time.perf_counter() - start
+    wait_mined(w3, sent[-1])
+    after = time.perf_counter() - start
+
+    # A transaction the node drops stalls every later nonce until the gap is filled
+    chain, manager = StandInEth(rpc_delay, block_time), NonceManager()
+    pending = [manager.send("ETH", chain, account, transaction(i)) for i in range(flows)]
+    chain.drop(pending[flows // 2])
+    start = time.perf_counter()
+    try:
+        manager.wait_for_receipt("ETH", chain, account.address, pending[-1], timeout=2 * block_time, poll_latency=block_time / 10)
+    except TimeExhausted:
+        pass
+    refill = manager.send("ETH", chain, account, transaction(flows))
+    later = manager.send("ETH", chain, account, transaction(flows + 1))
+    manager.wait_for_receipt("ETH", chain, account.address, later, timeout=10 * block_time, poll_latency=block_time / 10)
+    recovered = time.perf_counter() - start
+    assert manager.stats["gaps"] == 1 and chain.get_transaction_receipt(pending[-1]) and chain.get_transaction_receipt(refill)
+
+    # An approval that is dropped, or mined but reverted, no longer counts as allowance
+    cache = AllowanceCache()
+    manager.subscribe(cache.transaction_failed)
+    token, spender = fake_address("token"), fake_address("spender")
+    approval = manager.send("ETH", chain, account, transaction(flows + 2))
+    cache.record_approval("ETH", account.address, token, spender, 10**18, approval)
+    chain.drop(approval)
+    manager.reconcile("ETH", chain, account.address)
+    assert cache.get("ETH", account.address, token, spender) is None, "a dropped approval is still trusted"
+    approval = manager.send("ETH", chain, account, transaction(flows + 3))
+    cache.record_approval("ETH", account.address, token, spender, 10**18, approval)
+    chain.revert(approval)
+    manager.wait_for_receipt("ETH", chain, account.address, approval, timeout=10 * block_time, poll_latency=block_time / 10)
+    assert cache.pending_approval("ETH", account.address, token, spender) is None, "a reverted approval is still trusted"
+
+    print(f"nonces: {flows} approve -> swap flows, {rpc_delay * 1e3:.0f} ms RPC, {block_time:.1f} s blocks")
+    print(f"   nonce per send, wait for mining: {before:6.2f} s, {sum(before_calls.values())} RPC calls")
+    print(f"   local nonces, back to back:      {after:6.2f} s, {sum(w3.calls.values())} RPC calls"
+          f" (all sent in {queued:.2f} s, {nonces.stats['syncs']} nonce read)")
+    print(f"   dropped transaction: gap refilled after a {2 * block_time:.0f} s receipt timeout, all mined {recovered:.2f} s after the drop")
+
+
+def bench_fees(chains: int = 2, sends: int = 20, rpc_delay: float = 0.05, block_time: float = 2.0):
+    """Pricing a burst of transactions: fee_history per transaction vs the per-block fee oracle."""
+    w3 = StandInEth(rpc_delay, block_time)
+    start = time.perf_counter()
+    for i in range(sends):
+        for chain in range(chains):
+            w3.eth.fee_history(1, "latest", reward_percentiles=[50])
+    before, before_calls = time.perf_counter() - start, w3.calls.get("eth_feeHistory", 0)
+
+    w3 = StandInEth(rpc_delay, block_time)
+    oracle = FeeOracle()
+    start = time.perf_counter()
+    for i in range(sends):
+        for chain in ("ETH", "BASE")[:chains]:
+            oracle.suggest(chain, w3)
+    after = time.perf_counter() - start
+
+    print(f"fees: {sends} transactions on each of {chains} chains, {rpc_delay * 1e3:.0f} ms RPC")
+    print(f"   fee_history per transaction: {before * 1e3:7.1f} ms, {before_calls} RPC calls")
+    print(f"   per-block fee oracle:        {after * 1e3:7.1f} ms, {w3.calls.get('eth_feeHistory', 0)} RPC calls"
+          f" ({oracle.stats['hits']} cache hits)")
+
+
+def _unbatched_send(w3, account, fn):
+    """How a helper sent a transaction before batching: one round trip per value."""
+    gas = fn.estimate_gas({"from": account.address})
+    history = w3.eth.fee_history(1, "latest", reward_percentiles=[50])
+    max_fee = history["baseFeePerGas"][-1] + w3.to_wei(2, "gwei")
+    tx = fn.build_transaction({
+        "from": account.address, "nonce": w3.eth.get_transaction_count(account.address, "pending"),
+        "gas": gas, "maxFeePerGas": max_fee, "maxPriorityFeePerGas": w3.to_wei(2, "gwei"),
+    })
+    if w3.eth.get_balance(account.address) < gas * max_fee:
+        raise Exception("Insufficient ETH for gas")
+    return w3.eth.send_raw_transaction(account.sign_transaction(tx).raw_transaction).hex()
+
+
+def bench_rpc_batching(flows: int = 10, rpc_delay: float = 0.05):
+    """Approve -> burn flows against a JSON-RPC node stand-in: a round trip per value vs one batch per send."""
+    from web3 import Web3
+    key = "0x" + "22" * 32
+    amount, recipient = 1_000_000, WALLET
+    with jsonrpc_standin(delay=rpc_delay) as server:
+        w3 = Web3(Web3.HTTPProvider(server.url))
+        from eth_account import Account
+        account = Account.from_key(key)
+        start = time.perf_counter()
+        for i in range(flows):
+            usdc = w3.eth.contract(address=CCTP["ETH"]["USDC"], abi=USDC_ABI)
+            messenger = w3.eth.contract(address=CCTP["ETH"]["TokenMessenger"], abi=TOKEN_MESSENGER_ABI)
+            _unbatched_send(w3, account, usdc.functions.approve(CCTP["ETH"]["TokenMessenger"], amount + i))
+            _unbatched_send(w3, account, messenger.functions.depositForBurn(
+                amount + i, 6, bytes.fromhex(recipient[2:].zfill(64)), CCTP["ETH"]["USDC"]))
+        before, before_requests = time.perf_counter() - start, server.request_count
+
+    with jsonrpc_standin(delay=rpc_delay) as server:
+        cctp = GeneralizedCCTP(key, {"ETH": server.url}, nonces=NonceManager(), fees=FeeOracle())
+        start = time.perf_counter()
+        for i in range(flows):
+            cctp.approve_usdc("ETH", amount + i)
+            cctp.burn_usdc("ETH", amount + i, 6, recipient)
+        after, after_requests = time.perf_counter() - start, server.request_count
+        batch_sizes = server.httpd.batch_sizes
+
+    print(f"rpc_batching: {flows} approve -> burn flows, {rpc_delay * 1e3:.0f} ms per HTTP request")
+    print(f"   one request per value: {before:5.2f} s, {before_requests / flows:4.1f} HTTP requests per flow")
+    print(f"   batched reads:         {after:5.2f} s, {after_requests / flows:4.1f} HTTP requests per flow"
+          f" (largest batch {max(batch_sizes)} calls)")
+
+
+def bench_allowances(tokens: int = 20, approved_share: float = 0.75, rpc_delay: float = 0.05):
+    """A rebalance swapping out of `tokens` tokens: approve before every swap vs the allowance cache."""
+    from web3 import Web3
+    from eth_account import Account
+    key = "0x" + "33" * 32
+    owner, router = Account.from_key(key).address.lower(), UNISWAP_ROUTER["ETH"].lower()
+    token_list = [Web3.to_checksum_address(fake_address("token", i)) for i in range(tokens)]
+    # Most tokens were already approved for the router by earlier trades
+    existing = {(t.lower(), owner, router): 2**255 for t in token_list[:int(tokens * approved_share)]}
+    amount_in = 10**18
+
+    def run(use_cache):
+        with jsonrpc_standin(delay=rpc_delay, allowances=existing) as server:
+            uni = UniswapV3Helper(key, {"ETH": server.url}, nonces=NonceManager(), fees=FeeOracle(),
+                                  allowances=AllowanceCache())
+            start = time.perf_counter()
+            if use_cache:
+                approvals = uni.ensure_allowances("ETH", [(t, amount_in, UNISWAP_ROUTER["ETH"]) for t in token_list])
+            else:
+                approvals = [uni.approve_token("ETH", t, amount_in, UNISWAP_ROUTER["ETH"]) for t in token_list]
+            for token in token_list:
+                uni.swap_exact_input_single("ETH", token, token_list[0], 3000, amount_in, 0, gas=SWAP_GAS)
+            elapsed = time.perf_counter() - start
+            return elapsed, server.request_count, sum(1 for a in approvals if a) + len(token_list)
+
+    print(f"allowances: swaps out of {tokens} tokens, {approved_share:.0%} already approved, {rpc_delay * 1e3:.0f} ms RPC")
+    for label, use_cache in (("approve before every swap", False), ("allowance cache", True)):
+        elapsed, requests, transactions = run(use_cache)
+        print(f"   {label:26s}: {elapsed:5.2f} s, {transactions} transactions, {requests} HTTP requests")
+
+
+QUOTER_V2_ABI = [
+    {"inputs": [{"components": [
+        {"name": "tokenIn", "type": "address"}, {"name": "tokenOut", "type": "address"},
+        {"name": "amountIn", "type": "uint256"}, {"name": "fee", "type": "uint24"},
+        {"name": "sqrtPriceLimitX96", "type": "uint160"}], "name": "params", "type": "tuple"}],
+     "name": "quoteExactInputSingle", "stateMutability": "nonpayable", "type": "function", "outputs": [
+        {"name": "amountOut", "type": "uint256"}, {"name": "sqrtPriceX96After", "type": "uint160"},
+        {"name": "initializedTicksCrossed", "type": "uint32"}, {"name": "gasEstimate", "type": "uint256"}]},
+]
+
+
+# Fixed vectors from v3-core's TickMath and SwapMath tests, independent of the QuoterV2 stand-in
+# (which itself simulates with quoter.PoolState)
+TICK_MATH_VECTORS = {
+    MIN_TICK: MIN_SQRT_RATIO,
+    MIN_TICK + 1: 4295343490,
+    -50: 79030349367926598376800521322,
+    0: 79228162514264337593543950336,
+    50: 79426470787362580746886972461,
+    MAX_TICK - 1: 1461373636630004318706518188784493106690254656249,
+    MAX_TICK: MAX_SQRT_RATIO,
+}
+_P1, _P2 = 79228162514264337593543950336, 20282409603651670423947251286016
+# (sqrt price, sqrt price target, liquidity, amount remaining, fee) -> (sqrt price next, amount in, amount out, fee amount)
+SWAP_STEP_VECTORS = [
+    ((_P1, 79623317895830914510639640423, 2 * 10**18, 10**18, 600),
+     (79623317895830914510639640423, 9975124224178055, 9925619580021728, 5988667735148)),
+    ((_P1, 79623317895830914510639640423, 2 * 10**18, -10**18, 600),
+     (79623317895830914510639640423, 9975124224178055, 9925619580021728, 5988667735148)),
+    ((_P1, 250541448375047931186413801569, 2 * 10**18, 10**18, 600),
+     (118818475322642227089037862318, 999400000000000000, 666399946655997866, 600000000000000)),
+    ((417332158212080721273783715441582, 1452870262520218020823638996, 159344665391607089467575320103, -1, 1),
+     (417332158212080721273783715441581, 1, 1, 1)),
+    ((2, 1, 1, 3915081100057732413702495386755767, 1),
+     (1, 39614081257132168796771975168, 0, 39614120871253040049813)),
+    ((2413, 79887613182836312, 1985041575832132834610021537970, 10, 1872), (2413, 0, 0, 10)),
+    ((_P2, _P2 * 11 // 10, 1024, -4, 3000), (_P2 * 11 // 10, 26215, 0, 79)),
+    ((_P2, _P2 * 9 // 10, 1024, -263000, 3000), (_P2 * 9 // 10, 1, 26214, 1)),
+]
+# float64 segment tables vs exact integer simulation
+QUOTE_TOLERANCE = 1e-8
+
+
+def _check_v3_math():
+    for tick, sqrt_ratio in TICK_MATH_VECTORS.items():
+        assert get_sqrt_ratio_at_tick(tick) == sqrt_ratio, f"getSqrtRatioAtTick({tick})"
+        if tick < MAX_TICK:
+            assert get_tick_at_sqrt_ratio(sqrt_ratio) == tick, f"getTickAtSqrtRatio at tick {tick}"
+    assert get_tick_at_sqrt_ratio(MAX_SQRT_RATIO - 1) == MAX_TICK - 1
+    for args, expected in SWAP_STEP_VECTORS:
+        assert compute_swap_step(*args) == expected, f"computeSwapStep{args}"
+
+
+def bench_quoter(pools: int = 8, amounts: int = 50, rpc_delay: float = 0.02):
+    """Quoting `amounts` trade sizes on each of `pools` pools: one QuoterV2 eth_call per quote vs local simulation."""
+    import numpy as np
+    _check_v3_math()
+    from web3 import Web3
+    weth = Web3.to_checksum_address(fake_address("weth"))
+    tokens = [Web3.to_checksum_address(fake_address("token", i)) for i in range(pools)]
+    specs = [(token, weth, (500, 3000, 10000)[i % 3]) for i, token in enumerate(tokens)]
+    states = {
+        pool_address("ETH", *spec).lower(): synthetic_pool(i, *spec, tick_spacing={500: 10, 3000: 60, 10000: 200}[spec[2]])
+        for i, spec in enumerate(specs)
+    }
+    # Trade sizes from dust to more than the liquidity near the price can fill
+    sizes = [int(x) for x in np.geomspace(1e9, 1e19, amounts)]
+    print(f"quoter: {pools} pools x {amounts} amounts, {rpc_delay * 1e3:.0f} ms RPC")
+
+    with jsonrpc_standin(delay=rpc_delay, pools=states) as server:
+        # Provider-side caching keeps eth_chainId out of the per-quote round trips
+        quoter = Web3(Web3.HTTPProvider(server.url, cache_allowed_requests=True)).eth.contract(
+            address=Web3.to_checksum_address(fake_address("quoter")), abi=QUOTER_V2_ABI)
+        start = time.perf_counter()
+        remote = [[quoter.functions.quoteExactInputSingle((token_in, token_out, size, fee, 0)).call()[0] for size in sizes]
+                  for token_in, token_out, fee in specs]
+        elapsed = time.perf_counter() - start
+        print(f"   {'QuoterV2 eth_call per quote':30s}: {elapsed:6.2f} s, {server.request_count} HTTP requests")
+
+        cache = PoolStateCache()
+        uni = UniswapV3Helper("0x" + "44" * 32, {"ETH": server.url}, pools=cache)
+        before = server.request_count
+        start = time.perf_counter()
+        loaded = uni.pool_states("ETH", specs)
+        load_time = time.perf_counter() - start
+        start = time.perf_counter()
+        local = quote_exact_input(loaded, tokens, sizes)
+        first = time.perf_counter() - start
+        start = time.perf_counter()
+        for _ in range(20):
+            quote_exact_input(uni.pool_states("ETH", specs), tokens, sizes)
+        warm = (time.perf_counter() - start) / 20
+        print(f"   {'load pool states':30s}: {load_time:6.2f} s, {server.request_count - before} HTTP requests")
+        print(f"   {'local quotes (first)':30s}: {first * 1e3:6.1f} ms incl. segment tables")
+        print(f"   {'local quotes (same block)':30s}: {warm * 1e3:6.2f} ms, {pools * amounts / warm:,.0f} quotes/s, no RPC")
+
+    start = time.perf_counter()
+    exact = [[state.simulate(token, size) for size in sizes] for state, token in zip(loaded, tokens)]
+    exact_time = time.perf_counter() - start
+    exact_out = np.array([[r["amount_out"] if r["complete"] else np.nan for r in row] for row in exact], dtype=np.float64)
+    matches = sum(a == b["amount_out"] for row_a, row_b in zip(remote, exact) for a, b in zip(row_a, row_b) if b["complete"])
+    filled = int(np.isfinite(exact_out).sum())
+    error = np.nanmax(np.abs(local - exact_out) / np.maximum(exact_out, 1))
+    assert error <= QUOTE_TOLERANCE, f"vectorized quotes off by {error:.1e} relative to exact simulation"
+    assert (np.isnan(local) == np.isnan(exact_out)).all(), "vectorized and exact quotes disagree on fillable sizes"
+    print(f"   {'exact integer simulation':30s}: {exact_time * 1e3:6.1f} ms, agrees with the QuoterV2 stand-in on {matches}/{filled} fillable quotes")
+    print(f"   {'vectorized vs exact':30s}: max relative error {error:.1e}, "
+          f"{int(np.isnan(local).sum())} quotes beyond loaded ticks (exact: {pools * amounts - filled})")
+    # Exact-output quotes invert exact-input ones
+    back = quote_exact_output(loaded, tokens, np.nan_to_num(local))
+    inverse = np.nanmax(np.where(np.isfinite(local), np.abs(back - np.array(sizes)) / np.array(sizes), np.nan))
+    print(f"   {'exact-output round trip':30s}: max relative error {inverse:.1e}")
+
+
+def bench_multicall(tokens: int = 100, pools: int = 20, rpc_delay: float = 0.02):
+    """Token and pool reads: one eth_call per read, a JSON-RPC batch of eth_calls, and Multicall3."""
+    from web3 import Web3
+    key = "0x" + "55" * 32
+    weth = Web3.to_checksum_address(fake_address("weth"))
+    token_list = [Web3.to_checksum_address(fake_address("token", i)) for i in range(tokens)]
+    specs = [(token_list[i], weth, 3000) for i in range(pools)]
+    states = {pool_address("ETH", *spec).lower(): synthetic_pool(i, *spec) for i, spec in enumerate(specs)}
+    print(f"multicall: balances, decimals and 2 allowances of {tokens} tokens; state of {pools} pools; {rpc_delay * 1e3:.0f} ms RPC")
+
+    with jsonrpc_standin(delay=rpc_delay, pools=states) as server:
+        uni = UniswapV3Helper(key, {"ETH": server.url}, allowances=AllowanceCache(), pools=PoolStateCache())
+        w3 = Web3(Web3.HTTPProvider(server.url, cache_allowed_requests=True))
+        spenders = (UNISWAP_ROUTER["ETH"], NONFUNGIBLE_POSITION_MANAGER["ETH"])
+
+        def token_reads():
+            reads = []
+            for token in token_list:
+                erc20 = w3.eth.contract(address=token, abi=ERC20_ABI)
+                allowance = w3.eth.contract(address=token, abi=ERC20_ALLOWANCE_ABI).functions.allowance
+                reads += [erc20.functions.balanceOf(uni.address), erc20.functions.decimals()]
+                reads += [allowance(uni.address, spender) for spender in spenders]
+            return reads
+
+        def batched(reads):
+            with w3.batch_requests() as batch:
+                for read in reads:
+                    batch.add(read)
+                return batch.execute()
+
+        runs = [
+            ("eth_call per read", lambda: [read.call() for read in token_reads()]),
+            ("JSON-RPC batch of eth_calls", lambda: batched(token_reads())),
+            ("Multicall3 (token_info)", lambda: uni.token_info("ETH", token_list)),
+        ]
+        eth_calls = lambda: server.settings.methods.get("eth_call", 0)
+        for label, run in runs:
+            before, calls = server.request_count, eth_calls()
+            start = time.perf_counter()
+            run()
+            print(f"   tokens, {label:28s}: {time.perf_counter() - start:6.2f} s, {server.request_count - before} HTTP requests, "
+                  f"{eth_calls() - calls} eth_calls")
+
+        # The pool refresh PoolStateCache did before multicall: the same three rounds as batches of eth_calls
+        start, before, calls = time.perf_counter(), server.request_count, eth_calls()
+        contracts = [w3.eth.contract(address=address, abi=POOL_ABI) for address in map(Web3.to_checksum_address, states)]
+        batched([fn() for pool in contracts for fn in (pool.functions.slot0, pool.functions.liquidity, pool.functions.token0,
+                                                      pool.functions.token1, pool.functions.fee, pool.functions.tickSpacing)])
+        words = [pool.functions.tickBitmap(word) for pool, state in zip(contracts, states.values())
+                 for word in range((state["tick"] // 60 >> 8) - 4, (state["tick"] // 60 >> 8) + 5)]
+        batched(words)
+        batched([pool.functions.ticks(tick) for pool, state in zip(contracts, states.values()) for tick in state["ticks"]
+                 if abs((tick // 60 >> 8) - (state["tick"] // 60 >> 8)) <= 4])
+        print(f"   pools,  {'JSON-RPC batch of eth_calls':28s}: {time.perf_counter() - start:6.2f} s, {server.request_count - before} HTTP requests, "
+              f"{eth_calls() - calls} eth_calls")
+        start, before, calls = time.perf_counter(), server.request_count, eth_calls()
+        uni.pool_states("ETH", specs)
+        print(f"   pools,  {'Multicall3 (PoolStateCache)':28s}: {time.perf_counter() - start:6.2f} s, {server.request_count - before} HTTP requests, "
+              f"{eth_calls() - calls} eth_calls")
+
+
+def bench_multihop(token_in: str = "Safe Token", token_out: str = "USD Coin", block_time: float = 1.0, rpc_delay: float = 0.02):
+    """A graph route executed as one swap per hop (waiting on each) vs one exactInput transaction."""
+    from web3 import Web3
+    graph = load_graph()
+    start = time.perf_counter()
+    route = find_swap_route(graph, token_in, token_out)
+    route_time = time.perf_counter() - start
+    chain = route["chain"].upper()
+    tokens = [Web3.to_checksum_address(token) for token in route["tokens"]]
+    amount_in = 10**20
+    print(f"multihop: {route['path']} on {chain} (route found in {route_time * 1e3:.0f} ms), "
+          f"{block_time:.0f} s blocks, {rpc_delay * 1e3:.0f} ms RPC")
+
+    def run(multi_hop):
+        helper = UniswapV3Helper("0x" + "77" * 32, {chain: "http://unused"})
+        fees = helper.route_fees(chain, tokens, route["pools"])
+        # The route's real pool addresses, served with synthetic liquidity
+        pools = {pool: synthetic_pool(i, a, b, fee, tick_spacing={100: 1, 500: 10, 3000: 60, 10000: 200}[fee])
+                 for i, (a, b, fee, pool) in enumerate(zip(tokens, tokens[1:], fees, route["pools"]))}
+        with jsonrpc_standin(delay=rpc_delay, block_time=block_time, pools=pools) as server:
+            uni = UniswapV3Helper("0x" + "77" * 32, {chain: server.url}, nonces=NonceManager(), fees=FeeOracle(),
+                                  allowances=AllowanceCache(), pools=PoolStateCache())
+            w3, router = uni.w3[chain], UNISWAP_ROUTER[chain]
+            start = time.perf_counter()
+            sent = []
+            if multi_hop:
+                quote = uni.quote_exact_input_path(chain, tokens, fees, [amount_in])[0]
+                sent.append(uni.ensure_allowance(chain, tokens[0], amount_in, router))
+                sent.append(uni.swap_exact_input(chain, tokens, fees, amount_in, quote * 995 // 1000,
+                                                 gas=SWAP_GAS + SWAP_HOP_GAS * (len(fees) - 1) if sent[-1] else None))
+            else:
+                amount = amount_in
+                for hop, fee in enumerate(fees):
+                    # Each hop spends what the previous one delivered, so it waits for that to be mined
+                    (quote,) = uni.quote_exact_input_single(chain, tokens[hop], tokens[hop + 1], fee, [amount])
+                    sent.append(uni.ensure_allowance(chain, tokens[hop], amount, router))
+                    sent.append(uni.swap_exact_input_single(chain, tokens[hop], tokens[hop + 1], fee, amount,
+                                                            quote * 995 // 1000, gas=SWAP_GAS if sent[-1] else None))
+                    w3.eth.wait_for_transaction_receipt(sent[-1], poll_latency=0.05)
+                    amount = quote
+            w3.eth.wait_for_transaction_receipt(sent[-1], poll_latency=0.05)
+            elapsed = time.perf_counter() - start
+            return elapsed, sum(1 for tx in sent if tx), server.request_count
+
+    for label, multi_hop in (("one swap per hop", False), ("exactInput over the path", True)):
+        elapsed, transactions, requests = run(multi_hop)
+        print(f"   {label:25s}: {elapsed:5.2f} s to last receipt, {transactions} transactions, {requests} HTTP requests")
+
+
+def bench_bundle(swaps: int = 6, block_time: float = 1.0, rpc_delay: float = 0.02):
+    """A rebalance of `swaps` swaps into WETH (the last paid out as ETH): one transaction each vs one router multicall."""
+    from web3 import Web3
+    from eth_account import Account
+    from rpc import call_tx
+    from uniswap import ADDRESS_THIS, WETH9
+    weth = WETH9["ETH"]
+    token_list = [Web3.to_checksum_address(fake_address("token", i)) for i in range(swaps)]
+    pools = {pool_address("ETH", token, weth, 3000).lower(): synthetic_pool(i, token, weth) for i, token in enumerate(token_list)}
+    key = "0x" + "88" * 32
+    owner, router = Account.from_key(key).address.lower(), UNISWAP_ROUTER["ETH"].lower()
+    # Already approved by earlier trades, so only the swaps themselves differ
+    existing = {(token.lower(), owner, router): 2**255 for token in token_list}
+    amount_in = 10**15
+    print(f"bundle: {swaps} swaps, {block_time:.0f} s blocks, {rpc_delay * 1e3:.0f} ms RPC")
+
+    def run(bundled):
+        with jsonrpc_standin(delay=rpc_delay, block_time=block_time, pools=pools, allowances=existing) as server:
+            uni = UniswapV3Helper(key, {"ETH": server.url}, nonces=NonceManager(), fees=FeeOracle(),
+                                  allowances=AllowanceCache(), pools=PoolStateCache())
+            w3 = uni.w3["ETH"]
+            start = time.perf_counter()
+            uni.pool_states("ETH", [(token, weth, 3000) for token in token_list])
+            quotes = [uni.quote_exact_input_single("ETH", token, weth, 3000, [amount_in])[0] * 995 // 1000 for token in token_list]
+            if bundled:
+                bundle = uni.bundle("ETH")
+                for i, (token, quote) in enumerate(zip(token_list, quotes)):
+                    bundle.swap_exact_input_single(token, weth, 3000, amount_in, quote, ADDRESS_THIS if i == swaps - 1 else None)
+                bundle.unwrap_weth(quotes[-1])
+                gas = bundle.estimate_gas()
+                sent = [bundle.send(gas)["tx"]]
+            else:
+                gas = None
+                sent = [uni.swap_exact_input_single("ETH", token, weth, 3000, amount_in, quote)
+                        for token, quote in zip(token_list, quotes)]
+                # Paying out ETH takes a WETH withdraw of its own
+                weth_contract = w3.eth.contract(address=weth, abi=[{"inputs": [{"name": "wad", "type": "uint256"}], "name": "withdraw",
+                                                                      "outputs": [], "stateMutability": "nonpayable", "type": "function"}])
+                sent.append(uni._build_and_send_tx("ETH", call_tx(weth_contract, "withdraw", quotes[-1])))
+            for tx_hash in sent:
+                w3.eth.wait_for_transaction_receipt(tx_hash, poll_latency=0.05)
+            return time.perf_counter() - start, len(sent), server.request_count, server.settings.methods.get("eth_estimateGas", 0), gas
+
+    for label, bundled in (("one transaction per step", False), ("router multicall bundle", True)):
+        elapsed, transactions, requests, estimates, gas = run(bundled)
+        print(f"   {label:25s}: {elapsed:5.2f} s to last receipt, {transactions} transactions, {requests} HTTP requests, "
+              f"{estimates} gas estimates" + (f" (bundle: {gas})" if gas else ""))
+
+
+BENCHMARKS = {
+    "wallet_load": bench_wallet_load,
+    "price_client": bench_price_client,
+    "hedging": bench_hedging,
+    "price_cache": bench_price_cache,
+    "pagination": bench_pagination,
+    "multi_wallet": bench_multi_wallet,
+    "token_registry": bench_token_registry,
+    "portfolio": bench_portfolio,
+    "history": bench_history,
+    "risk": bench_risk,
+    "attestations": bench_attestations,
+    "bridge_jobs": bench_bridge_jobs,
+    "nonces": bench_nonces,
+    "fees": bench_fees,
+    "rpc_batching": bench_rpc_batching,
+    "allowances": bench_allowances,
+    "quoter": bench_quoter,
+    "multicall": bench_multicall,
+    "multihop": bench_multihop,
+    "bundle": bench_bundle,
+}
+
+if __name__ == "__main__":
+    for name in sys.argv[1:] or BENCHMARKS:
+        BENCHMARKS[name]()
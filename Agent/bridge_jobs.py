@@ -0,0 +1,311 @@
+import time
+import uuid
+import sqlite3
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from cctp import DEPOSIT_FOR_BURN_GAS
+
+# Bridge lifecycle; each state is recorded once the step that leads to it has succeeded
+STATES = ("queued", "approved", "burned", "attested", "minted")
+FINAL_STATES = ("minted", "failed")
+
+# The step that moves a job out of each state
+STEPS = {"queued": "approve", "approved": "burn", "burned": "attest", "attested": "mint"}
+# Steps after the burn: the USDC is gone from the source chain, so these are retried rather than failed
+RETRIED_STEPS = ("attest", "mint")
+
+
+class LeaseLost(Exception):
+    """Another queue took over a job whose lease this one let expire."""
+
+
+class BridgeJobQueue:
+    """
+    Persistent CCTP bridge jobs, each a state machine
+    queued -> approved -> burned -> attested -> minted (or failed).
+
+    Jobs and every state transition are stored in SQLite, so after a restart
+    unfinished jobs resume from their last recorded state. A step that was
+    started but not recorded is retried, except a burn: it may already be on
+    chain, so that job is failed for manual review rather than burning twice.
+
+    Several queues (processes) may share one database: a queue drives a job
+    only while it holds the job's lease (owner, lease_until), claimed
+    atomically and renewed while the job runs. Jobs whose owner died are
+    picked up by any running queue once the lease expires.
+
+    Once the USDC is burned a job never fails: attestation and mint errors
+    are recorded and retried with exponential backoff (`retry_base` doubling
+    up to `retry_max` seconds). retry() restarts a job right away, including
+    a failed one from its last good state.
+
+    Transaction steps (approve, burn, mint) run on a pool of `workers` threads;
+    attestation waits hold no worker, so many bridges can wait on Circle at
+    once. The queue runs on the CCTP attestation poller's background loop.
+    """
+    def __init__(self, cctp, path: str = "bridge_jobs.sqlite", workers: int = 4, lease: float = 60.0,
+                 retry_base: float = 5.0, retry_max: float = 600.0):
+        self.cctp = cctp
+        self.path = path
+        self.workers = workers
+        self.lease = lease
+        self.retry_base = retry_base
+        self.retry_max = retry_max
+        self.owner = uuid.uuid4().hex
+        self._local = threading.local()
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="bridge")
+        self._loop = None
+        self._tasks = {}
+        self._done = {}             # job id -> threading.Event
+        self._lock = threading.Lock()
+        with self._conn() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS jobs ("
+                " id INTEGER PRIMARY KEY AUTOINCREMENT, source_chain TEXT NOT NULL, dest_chain TEXT NOT NULL,"
+                " amount INTEGER NOT NULL, dest_domain INTEGER NOT NULL, recipient TEXT NOT NULL,"
+                " state TEXT NOT NULL, in_flight TEXT, approve_tx TEXT, burn_tx TEXT, attestation TEXT,"
+                " mint_tx TEXT, error TEXT, created_at REAL NOT NULL, updated_at REAL NOT NULL)"
+            )
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS job_events ("
+                " job_id INTEGER NOT NULL, state TEXT NOT NULL, at REAL NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS job_events_job ON job_events (job_id)")
+            # Databases created before jobs had leases and retries
+            columns = {row[1] for row in conn.execute("PRAGMA table_info(jobs)")}
+            for column, kind in (("owner", "TEXT"), ("lease_until", "REAL"), ("retry_at", "REAL"), ("attempts", "INTEGER")):
+                if column not in columns:
+                    conn.execute(f"ALTER TABLE jobs ADD COLUMN {column} {kind}")
+
+    def _conn(self) -> sqlite3.Connection:
+        # sqlite3 connections cannot be shared across threads
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = self._local.conn = sqlite3.connect(self.path, timeout=5)
+            conn.row_factory = sqlite3.Row
+        return conn
+
+    def submit(self, source_chain: str, dest_chain: str, amount: int, dest_domain: int, recipient: str) -> int:
+        """Stores a new bridge of `amount` USDC units and starts it if the queue is running; returns the job id."""
+        now = time.time()
+        with self._conn() as conn:
+            job_id = conn.execute(
+                "INSERT INTO jobs (source_chain, dest_chain, amount, dest_domain, recipient, state, created_at, updated_at)"
+                " VALUES (?, ?, ?, ?, ?, 'queued', ?, ?)",
+                (source_chain, dest_chain, amount, dest_domain, recipient, now, now)
+            ).lastrowid
+            conn.execute("INSERT INTO job_events (job_id, state, at) VALUES (?, 'queued', ?)", (job_id, now))
+        if self._loop:
+            self._loop.call_soon_threadsafe(self._schedule, job_id)
+        return job_id
+
+    def get(self, job_id: int) -> dict:
+        row = self._conn().execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return dict(row) if row else None
+
+    def jobs(self, states=None) -> list:
+        if states is None:
+            rows = self._conn().execute("SELECT * FROM jobs ORDER BY id")
+        else:
+            marks = ",".join("?" * len(states))
+            rows = self._conn().execute(f"SELECT * FROM jobs WHERE state IN ({marks}) ORDER BY id", tuple(states))
+        return [dict(row) for row in rows]
+
+    def start(self):
+        """Resumes unfinished jobs nobody holds and runs new ones as they are submitted."""
+        if self._loop:
+            return self
+        self._loop = self.cctp.attestations._background_loop()
+        self._sweeper = asyncio.run_coroutine_threadsafe(self._sweep(), self._loop)
+        return self
+
+    def close(self):
+        """Stops picking up and driving jobs and releases them to other queues (an interrupted burn is failed for review)."""
+        if self._loop:
+            self._sweeper.cancel()
+            for task in list(self._tasks.values()):
+                self._loop.call_soon_threadsafe(task.cancel)
+
+    def retry(self, job_id: int):
+        """
+        Runs a job again now: skips its retry backoff, and puts a failed job
+        back in the last state it reached. A job that failed while burning
+        resumes before the burn, so check the source chain first.
+        """
+        now = time.time()
+        with self._conn() as conn:
+            last = conn.execute(
+                "SELECT state FROM job_events WHERE job_id = ? AND state != 'failed' ORDER BY at DESC, rowid DESC LIMIT 1",
+                (job_id,)
+            ).fetchone()
+            conn.execute(
+                "UPDATE jobs SET state = CASE WHEN state = 'failed' THEN ? ELSE state END, in_flight = NULL,"
+                " retry_at = NULL, attempts = 0, error = NULL, updated_at = ? WHERE id = ? AND state != 'minted'",
+                (last[0] if last else "queued", now, job_id)
+            )
+        if self._loop:
+            self._loop.call_soon_threadsafe(self._schedule, job_id)
+
+    def wait(self, job_id: int, timeout: float = None, poll: float = 1.0) -> dict:
+        """Blocks until the job is minted or failed (or `timeout` passes) and returns it; another queue may drive it."""
+        with self._lock:
+            done = self._done.setdefault(job_id, threading.Event())
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while self.get(job_id)["state"] not in FINAL_STATES:
+            remaining = poll if deadline is None else min(poll, deadline - time.monotonic())
+            if remaining <= 0:
+                break
+            done.wait(remaining)
+        return self.get(job_id)
+
+    def stage_timings(self) -> dict:
+        """Seconds spent reaching each state from the previous one, across all jobs: count, mean, p50, p95."""
+        rows = self._conn().execute("SELECT job_id, state, at FROM job_events ORDER BY job_id, at").fetchall()
+        if not rows:
+            return {}
+        job_ids = np.array([r[0] for r in rows])
+        states = np.array([r[1] for r in rows])
+        at = np.array([r[2] for r in rows])
+        same_job = job_ids[1:] == job_ids[:-1]
+        durations, reached = np.diff(at)[same_job], states[1:][same_job]
+        timings = {}
+        for state in STATES[1:] + ("failed",):
+            values = durations[reached == state]
+            if len(values):
+                timings[state] = {
+                    "count": int(len(values)), "mean_s": float(values.mean()),
+                    "p50_s": float(np.percentile(values, 50)), "p95_s": float(np.percentile(values, 95)),
+                }
+        return timings
+
+    def _schedule(self, job_id: int):
+        task = self._tasks.get(job_id)
+        if task is None or task.done():
+            self._tasks[job_id] = self._loop.create_task(self._drive(job_id))
+
+    async def _sweep(self):
+        # Picks up unfinished jobs with no live lease (new, resumed, orphaned or due for a retry)
+        while True:
+            now = time.time()
+            marks = ",".join("?" * len(FINAL_STATES))
+            rows = self._conn().execute(
+                f"SELECT id FROM jobs WHERE state NOT IN ({marks}) AND (owner IS NULL OR lease_until < ?)"
+                " AND (retry_at IS NULL OR retry_at <= ?) ORDER BY id",
+                (*FINAL_STATES, now, now)
+            ).fetchall()
+            for (job_id,) in rows:
+                self._schedule(job_id)
+            await asyncio.sleep(min(self.lease / 3, self.retry_base))
+
+    def _claim(self, job_id: int) -> bool:
+        # Atomic: of several queues racing for a job, exactly one updates the row
+        now = time.time()
+        marks = ",".join("?" * len(FINAL_STATES))
+        with self._conn() as conn:
+            claimed = conn.execute(
+                f"UPDATE jobs SET owner = ?, lease_until = ? WHERE id = ? AND state NOT IN ({marks})"
+                " AND (owner IS NULL OR owner = ? OR lease_until < ?) AND (retry_at IS NULL OR retry_at <= ?)",
+                (self.owner, now + self.lease, job_id, *FINAL_STATES, self.owner, now, now)
+            ).rowcount
+        return claimed == 1
+
+    async def _keep_lease(self, job_id: int):
+        while True:
+            await asyncio.sleep(self.lease / 3)
+            with self._conn() as conn:
+                conn.execute("UPDATE jobs SET lease_until = ? WHERE id = ? AND owner = ?",
+                             (time.time() + self.lease, job_id, self.owner))
+
+    def _release(self, job_id: int, **fields):
+        assignments = "".join(f", {name} = ?" for name in fields)
+        with self._conn() as conn:
+            conn.execute(f"UPDATE jobs SET owner = NULL, lease_until = NULL{assignments} WHERE id = ? AND owner = ?",
+                         (*fields.values(), job_id, self.owner))
+
+    def _record(self, job_id: int, state: str = None, in_flight: str = None, **fields):
+        now = time.time()
+        fields["in_flight"] = in_flight
+        if state:
+            fields["state"] = state
+        assignments = ", ".join(f"{name} = ?" for name in fields)
+        with self._conn() as conn:
+            updated = conn.execute(
+                f"UPDATE jobs SET {assignments}, updated_at = ? WHERE id = ? AND owner = ?",
+                (*fields.values(), now, job_id, self.owner)
+            ).rowcount
+            if not updated:
+                raise LeaseLost(f"Job {job_id} is no longer held by this queue")
+            if state:
+                conn.execute("INSERT INTO job_events (job_id, state, at) VALUES (?, ?, ?)", (job_id, state, now))
+
+    async def _drive(self, job_id: int):
+        if not self._claim(job_id):
+            return
+        loop = asyncio.get_running_loop()
+        keeper = loop.create_task(self._keep_lease(job_id))
+        job = self.get(job_id)
+        step = None
+        try:
+            if job["state"] == "approved" and job["in_flight"] == "burn":
+                # A burn that was sent but never recorded (its queue died) cannot be retried safely
+                self._record(job_id, state="failed",
+                             error="Interrupted while burning; check the source chain before retrying")
+                return
+            while job["state"] not in FINAL_STATES:
+                step = STEPS[job["state"]]
+                self._record(job_id, in_flight=step)
+                if step == "approve":
+                    # Skipped (approve_tx stays empty) when the allowance already covers the burn
+                    tx = await loop.run_in_executor(
+                        self._executor, self.cctp.ensure_usdc_allowance, job["source_chain"], job["amount"]
+                    )
+                    update = {"state": "approved", "approve_tx": tx}
+                elif step == "burn":
+                    # Behind a pending approval (this job's, or one sent for a concurrent job that covers this
+                    # one) the burn queues by nonce and cannot be estimated. Otherwise the estimate catches a
+                    # burn that would revert.
+                    pending = job["approve_tx"] or self.cctp.usdc_approval_pending(job["source_chain"])
+                    gas = DEPOSIT_FOR_BURN_GAS if pending else None
+                    tx = await loop.run_in_executor(
+                        self._executor, lambda: self.cctp.burn_usdc(
+                            job["source_chain"], job["amount"], dest_domain=job["dest_domain"], recipient=job["recipient"],
+                            gas=gas
+                        )
+                    )
+                    update = {"state": "burned", "burn_tx": tx}
+                elif step == "attest":
+                    attestation = await self.cctp.get_attestation_async(job["burn_tx"])
+                    update = {"state": "attested", "attestation": attestation}
+                else:
+                    tx = await loop.run_in_executor(
+                        self._executor, self.cctp.mint_usdc, job["dest_chain"], job["burn_tx"], job["attestation"]
+                    )
+                    update = {"state": "minted", "mint_tx": tx}
+                self._record(job_id, **update, attempts=0, error=None)
+                job.update(update)
+        except LeaseLost:
+            return
+        except Exception as e:
+            if step in RETRIED_STEPS:
+                # The USDC is burned: keep the job where it is and try again later
+                attempts = (job["attempts"] or 0) + 1
+                delay = min(self.retry_base * 2 ** (attempts - 1), self.retry_max)
+                self._release(job_id, in_flight=None, attempts=attempts, retry_at=time.time() + delay,
+                              error=f"{step} (attempt {attempts}, retrying in {delay:.0f} s): {e}", updated_at=time.time())
+            else:
+                try:
+                    self._record(job_id, state="failed", error=f"{step}: {e}")
+                except LeaseLost:
+                    return
+        finally:
+            keeper.cancel()
+            self._release(job_id)
+            if self.get(job_id)["state"] in FINAL_STATES:
+                with self._lock:
+                    done = self._done.setdefault(job_id, threading.Event())
+                done.set()
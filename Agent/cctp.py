@@ -1,10 +1,13 @@
 import os
-import time
-import requests
+from concurrent.futures import Future, ThreadPoolExecutor
 from web3 import Web3
 from eth_account import Account
 
-CIRCLE_ATTESTATION_API = "https://iris-api.circle.com/v1/attestations"
+from allowances import allowance_cache
+from attestation import AttestationPoller, CIRCLE_ATTESTATION_API
+from fees import fee_oracle
+from nonces import nonce_manager
+from rpc import call_tx, contract, prepare_transaction, web3_for
 USDC_ETHEREUM_ADDRESS = Web3.to_checksum_address("0xA0b86991c6218b36c1d19d4a2e9eb0ce3606eb48")  
 USDC_BASE_ADDRESS = Web3.to_checksum_address("0x833589fCD6eDb6E08f4c7C32D4f71b54bdA02913")
 
@@ -91,99 +94,110 @@ CCTP_ABI = [
 ]
 
 
+# Gas limit for a burn sent right after its approval, which cannot be estimated until the approval is mined
+DEPOSIT_FOR_BURN_GAS = 200000
+
+
 class GeneralizedCCTP:
-    def __init__(self, private_key: str, rpc_urls: dict):
+    def __init__(self, private_key: str, rpc_urls: dict, nonces=None, fees=None, allowances=None):
         self.account = Account.from_key(private_key)
         self.address = self.account.address
-        self.w3 = {chain: Web3(Web3.HTTPProvider(url)) for chain, url in rpc_urls.items()}
+        self.w3 = {chain: web3_for(url) for chain, url in rpc_urls.items()}
+        self.nonces = nonces or nonce_manager
+        self.fees = fees or fee_oracle
+        self.allowances = allowances or allowance_cache
+        self.nonces.subscribe(self.allowances.transaction_failed)
+        # One poller tracks every burn in flight; mints run off the poller's loop
+        self.attestations = AttestationPoller()
+        self._mint_executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix="cctp-mint")
+
+    def _send(self, chain: str, tx: dict) -> str:
+        # Gas, fees, chain id and the balance check come from one batched round trip
+        w3 = self.w3[chain]
+        tx = prepare_transaction(chain, w3, self.account, tx, self.fees, self.nonces)
+        return self.nonces.send(chain, w3, self.account, tx)
+
+    def _approve(self, chain: str, amount: int) -> str:
+        usdc = contract(self.w3[chain], CCTP[chain]["USDC"], USDC_ABI)
+        return self._send(chain, call_tx(usdc, "approve", CCTP[chain]["TokenMessenger"], amount))
 
     def approve_usdc(self, chain: str, amount: int):
-        w3 = self.w3[chain]
-        usdc = w3.eth.contract(address=CCTP[chain]["USDC"], abi=USDC_ABI)
-        messenger = CCTP[chain]["TokenMessenger"]
-
-        # Estimate gas automatically
-        estimated_gas = usdc.functions.approve(messenger, amount).estimate_gas({'from': self.address})
-        
-        # Fetch current fee data
-        fee_data = w3.eth.fee_history(1, 'latest', reward_percentiles=[50])
-        max_priority_fee = w3.to_wei(2, 'gwei')  # default 2 gwei if fee_history fails
-        base_fee = fee_data['baseFeePerGas'][-1] if fee_data['baseFeePerGas'] else w3.to_wei(1, 'gwei')
-        max_fee = base_fee + max_priority_fee
-
-        # Build transaction
-        tx = usdc.functions.approve(messenger, amount).build_transaction({
-            "from": self.address,
-            "nonce": w3.eth.get_transaction_count(self.address),
-            "gas": estimated_gas,
-            "maxFeePerGas": max_fee,
-            "maxPriorityFeePerGas": max_priority_fee
-        })
-
-        signed = self.account.sign_transaction(tx)
-        
-        # Check if wallet balance is enough
-        estimated_cost = max_fee * estimated_gas
-        balance = w3.eth.get_balance(self.address)
-        if balance < estimated_cost:
-            raise Exception(f"Insufficient ETH for gas. Balance: {balance}, Estimated cost: {estimated_cost}")
-
-        return w3.eth.send_raw_transaction(signed.raw_transaction).hex()
-
-    def burn_usdc(self, chain: str, amount: int, dest_domain: int, recipient: str):
-        w3 = self.w3[chain]
-        messenger = w3.eth.contract(address=CCTP[chain]["TokenMessenger"], abi=TOKEN_MESSENGER_ABI)
+        tx_hash = self._approve(chain, amount)
+        self.allowances.record_approval(chain, self.address, CCTP[chain]["USDC"], CCTP[chain]["TokenMessenger"], amount,
+                                        tx_hash)
+        return tx_hash
+
+    def ensure_usdc_allowance(self, chain: str, amount: int):
+        """
+        Reserves `amount` of the TokenMessenger's USDC allowance for a burn about
+        to be sent, approving only if it is short; returns the approval tx hash
+        or None.
+        """
+        return self.allowances.ensure(
+            chain, self.w3[chain], self.address, CCTP[chain]["USDC"], CCTP[chain]["TokenMessenger"], amount,
+            lambda total: self._approve(chain, total)
+        )
 
-        # Estimate gas automatically
-        burn_tx = messenger.functions.depositForBurn(
+    def usdc_approval_pending(self, chain: str) -> bool:
+        """Whether a USDC approval ensure_usdc_allowance() sent may not be mined yet (see AllowanceCache.pending_approval)."""
+        return self.allowances.pending_approval(
+            chain, self.address, CCTP[chain]["USDC"], CCTP[chain]["TokenMessenger"]
+        ) is not None
+
+    def burn_usdc(self, chain: str, amount: int, dest_domain: int, recipient: str, gas: int = None):
+        """
+        Burns `amount` USDC for minting on `dest_domain`. Pass `gas` (e.g.
+        DEPOSIT_FOR_BURN_GAS) to send it right behind a still-pending approval.
+        """
+        messenger = contract(self.w3[chain], CCTP[chain]["TokenMessenger"], TOKEN_MESSENGER_ABI)
+        tx = call_tx(
+            messenger, "depositForBurn",
             amount,
             dest_domain,
             bytes.fromhex(recipient[2:].zfill(64)),
             CCTP[chain]["USDC"]
         )
-        estimated_gas = burn_tx.estimate_gas({'from': self.address})
-
-        # Fetch current fee data
-        fee_data = w3.eth.fee_history(1, 'latest', reward_percentiles=[50])
-        max_priority_fee = w3.to_wei(2, 'gwei')
-        base_fee = fee_data['baseFeePerGas'][-1] if fee_data['baseFeePerGas'] else w3.to_wei(1, 'gwei')
-        max_fee = base_fee + max_priority_fee
-
-        tx = burn_tx.build_transaction({
-            "from": self.address,
-            "nonce": w3.eth.get_transaction_count(self.address),
-            "gas": estimated_gas,
-            "maxFeePerGas": max_fee,
-            "maxPriorityFeePerGas": max_priority_fee
-        })
-
-        signed = self.account.sign_transaction(tx)
-
-        # Check if wallet balance is enough
-        estimated_cost = max_fee * estimated_gas
-        balance = w3.eth.get_balance(self.address)
-        if balance < estimated_cost:
-            raise Exception(f"Insufficient ETH for gas. Balance: {balance}, Estimated cost: {estimated_cost}")
-
-        return w3.eth.send_raw_transaction(signed.raw_transaction).hex()
-
-    def get_attestation(self, burn_tx_hash: str):
-        while True:
-            resp = requests.get(f"{CIRCLE_ATTESTATION_API}/{burn_tx_hash}")
-            data = resp.json()
-            if data.get("status") == "complete":
-                return data["attestation"]
-            time.sleep(5)
+        if gas:
+            tx["gas"] = gas
+        spend = (chain, self.address, CCTP[chain]["USDC"], CCTP[chain]["TokenMessenger"], amount)
+        try:
+            tx_hash = self._send(chain, tx)
+        except Exception:
+            self.allowances.settle(*spend, sent=False)
+            raise
+        self.allowances.settle(*spend)
+        return tx_hash
+
+    def get_attestation(self, burn_tx_hash: str, max_wait: float = None):
+        """Blocks until the burn is attested; raises AttestationTimeout after `max_wait` seconds."""
+        return self.attestations.watch_threadsafe(burn_tx_hash, max_wait).result()
+
+    async def get_attestation_async(self, burn_tx_hash: str, max_wait: float = None):
+        return await self.attestations.wait(burn_tx_hash, max_wait)
+
+    def mint_when_attested(self, chain: str, burn_tx_hash: str, max_wait: float = None):
+        """
+        Returns at once with a concurrent.futures.Future that resolves to the mint
+        tx hash once the burn is attested and the mint has been sent.
+        """
+        minted = Future()
+
+        def mint(attestation):
+            try:
+                minted.set_result(self.mint_usdc(chain, burn_tx_hash, attestation))
+            except Exception as e:
+                minted.set_exception(e)
+
+        def on_attested(attested):
+            # No thread is held while waiting; the mint only takes one once attested
+            if attested.exception() is not None:
+                minted.set_exception(attested.exception())
+            else:
+                self._mint_executor.submit(mint, attested.result())
+
+        self.attestations.watch_threadsafe(burn_tx_hash, max_wait).add_done_callback(on_attested)
+        return minted
 
     def mint_usdc(self, chain: str, burn_tx_hash: str, attestation: str):
-        w3 = self.w3[chain]
-        minter = w3.eth.contract(address=CCTP[chain]["TokenMinter"], abi=CCTP_ABI)
-        tx = minter.functions.mint(burn_tx_hash, attestation).build_transaction({
-            "from": self.address,
-            "nonce": w3.eth.get_transaction_count(self.address),
-            "gas": 300000,
-            "maxFeePerGas": w3.to_wei("50", "gwei"),
-            "maxPriorityFeePerGas": w3.to_wei("2", "gwei")
-        })
-        signed = self.account.sign_transaction(tx)
-        return w3.eth.send_raw_transaction(signed.rawTransaction).hex()
+        minter = contract(self.w3[chain], CCTP[chain]["TokenMinter"], CCTP_ABI)
+        return self._send(chain, call_tx(minter, "mint", burn_tx_hash, attestation, gas=300000))
@@ -0,0 +1,81 @@
+import time
+import threading
+
+from web3 import Web3
+
+# Seconds between blocks; a fee suggestion is reused until the chain has had time to move on
+BLOCK_TIMES = {"ETH": 12.0, "BASE": 2.0}
+DEFAULT_BLOCK_TIME = 12.0
+
+
+class FeeOracle:
+    """
+    EIP-1559 fee suggestions per chain, computed from one `eth_feeHistory` call
+    and reused for the rest of the block.
+
+    The priority fee is the median of the `reward_percentile` tips paid over
+    the last `blocks` blocks (at least `min_priority_fee`). The max fee covers
+    twice the next block's base fee plus that tip, so a transaction stays
+    includable through several full blocks of base fee increases. Suggestions
+    are cached for the chain's block time (BLOCK_TIMES); every transaction
+    built in that window gets the same pricing without another RPC call.
+    """
+    def __init__(self, blocks: int = 5, reward_percentile: float = 50,
+                 min_priority_fee: int = Web3.to_wei(0.01, "gwei"), fallback_priority_fee: int = Web3.to_wei(2, "gwei")):
+        self.blocks = blocks
+        self.reward_percentile = reward_percentile
+        self.min_priority_fee = min_priority_fee
+        self.fallback_priority_fee = fallback_priority_fee
+        self.stats = {"hits": 0, "fetches": 0}
+        self._cache = {}            # chain -> (expires, suggestion)
+        self._locks = {}
+        self._lock = threading.Lock()
+
+    def _chain_lock(self, chain: str) -> threading.Lock:
+        with self._lock:
+            return self._locks.setdefault(chain, threading.Lock())
+
+    def cached(self, chain: str) -> dict:
+        """The current suggestion for `chain`, or None if it needs refreshing."""
+        cached = self._cache.get(chain)
+        if cached and time.monotonic() < cached[0]:
+            return cached[1]
+        return None
+
+    def history_request(self, w3):
+        """The fee_history call a refresh needs, so callers can put it in a JSON-RPC batch."""
+        return w3.eth.fee_history(self.blocks, "latest", reward_percentiles=[self.reward_percentile])
+
+    def update(self, chain: str, history: dict) -> dict:
+        """Caches the suggestion computed from a fee_history result."""
+        # baseFeePerGas has one entry more than the blocks asked for: the next block's base fee
+        base_fee = history["baseFeePerGas"][-1] if history["baseFeePerGas"] else Web3.to_wei(1, "gwei")
+        tips = sorted(reward[0] for reward in history.get("reward") or [] if reward)
+        priority_fee = max(tips[len(tips) // 2], self.min_priority_fee) if tips else self.fallback_priority_fee
+        suggestion = {
+            "maxFeePerGas": 2 * base_fee + priority_fee,
+            "maxPriorityFeePerGas": priority_fee,
+            "baseFeePerGas": base_fee,
+            "block": history["oldestBlock"] + len(history["baseFeePerGas"]) - 2,
+        }
+        self._cache[chain] = (time.monotonic() + BLOCK_TIMES.get(chain, DEFAULT_BLOCK_TIME), suggestion)
+        return suggestion
+
+    def suggest(self, chain: str, w3) -> dict:
+        """{"maxFeePerGas", "maxPriorityFeePerGas", "baseFeePerGas", "block"} for the next block on `chain`."""
+        with self._chain_lock(chain):
+            suggestion = self.cached(chain)
+            if suggestion is not None:
+                self.stats["hits"] += 1
+                return suggestion
+            self.stats["fetches"] += 1
+            return self.update(chain, self.history_request(w3))
+
+    def tx_fees(self, chain: str, w3) -> dict:
+        """Just the fee fields, ready to merge into a transaction."""
+        suggestion = self.suggest(chain, w3)
+        return {"maxFeePerGas": suggestion["maxFeePerGas"], "maxPriorityFeePerGas": suggestion["maxPriorityFeePerGas"]}
+
+
+# Shared by every helper in the process, so transactions on a chain are priced consistently
+fee_oracle = FeeOracle()
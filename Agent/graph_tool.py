@@ -83,6 +83,69 @@ def find_path(graph, start_token_name, end_token_name, chain=None):
         print(f"No path found between '{start_token_name}' and '{end_token_name}'.")
         return None
 
+def find_swap_route(graph, token_in, token_out, chain=None):
+    """
+    Finds the swap route between two tokens through pools on one chain.
+
+    Unlike find_path(), the route never goes through the central hubs: each hop
+    is a pool shared by consecutive tokens, so it can be executed as one
+    multi-hop swap. Among routes with the fewest hops, the one through the
+    deepest pools (by TVL) wins.
+
+    Args:
+        graph (networkx.Graph): The graph to search within.
+        token_in (str): The name (symbol) or address of the token to sell.
+        token_out (str): The name (symbol) or address of the token to buy.
+        chain (str, optional): The chain ('eth' or 'base'). If None, any chain
+                               where both tokens have pools.
+
+    Returns:
+        dict: {"chain", "tokens" (addresses), "pools" (addresses), "names", "path"
+              (readable)}, or None if no route is found.
+    """
+    def matches(data, token):
+        token = token.lower()
+        return data.get('name', '').lower() == token or data.get('id', '').split('_', 1)[-1] == token
+
+    chains = [chain.lower()] if chain else sorted({data.get('chain') for _, data in graph.nodes(data=True) if data.get('chain')})
+    for chain in chains:
+        starts = [node for node, data in graph.nodes(data=True)
+                  if data.get('type') == 'token' and data.get('chain') == chain and matches({**data, 'id': node}, token_in)]
+        ends = [node for node, data in graph.nodes(data=True)
+                if data.get('type') == 'token' and data.get('chain') == chain and matches({**data, 'id': node}, token_out)]
+        if not starts or not ends:
+            continue
+        pools_only = nx.subgraph_view(graph, filter_node=lambda node: graph.nodes[node].get('type') in ('token', 'pool'))
+
+        def weight(u, v, data):
+            # One unit per edge, plus a tie-breaker that prefers deep pools
+            pool = graph.nodes[u] if graph.nodes[u].get('type') == 'pool' else graph.nodes[v]
+            return 1 + 1 / (1 + float(pool.get('totalValueLockedUSD', 0)))
+
+        best = None
+        for start in starts:
+            for end in ends:
+                try:
+                    length, path = nx.single_source_dijkstra(pools_only, start, end, weight=weight)
+                except nx.NetworkXNoPath:
+                    continue
+                if best is None or length < best[0]:
+                    best = (length, path)
+        if best is None:
+            continue
+        path = best[1]
+        tokens, pools = path[0::2], path[1::2]
+        names = [graph.nodes[node].get('name') for node in tokens]
+        return {
+            "chain": chain,
+            "tokens": [node.split('_', 1)[1] for node in tokens],
+            "pools": [node.split('_', 1)[1] for node in pools],
+            "names": names,
+            "path": " -> ".join(names),
+        }
+    print(f"No pool route found between '{token_in}' and '{token_out}'.")
+    return None
+
 def find_pools(graph, min_liquidity=0, min_volume=0, has_token=None, chain=None):
     """
     Finds pools that match specified criteria.
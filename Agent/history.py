@@ -0,0 +1,213 @@
+import os
+import csv
+import time
+import threading
+
+import numpy as np
+import pandas as pd
+
+# Per-refresh totals, one row per snapshot
+SNAPSHOT_COLUMNS = {"ts": "<f8", "total": "<f8", "crypto": "<f8", "defi": "<f8"}
+# Every position of every snapshot; `token` indexes the wallet's tokens.txt, a tab-separated
+# csv of (chain, address, symbol) quoted as needed, since symbols are untrusted token data
+POSITION_COLUMNS = {"ts": "<f8", "token": "<i4", "balance": "<f8", "price": "<f8"}
+
+DAY = 86400.0
+CHANGE_WINDOWS = {"24h": DAY, "7d": 7 * DAY, "30d": 30 * DAY}
+
+
+class HistoryStore:
+    """
+    Append-only, columnar history of wallet refreshes on local disk.
+
+    Each wallet gets a directory holding one raw little-endian file per column
+    (e.g. snapshots.ts.f8, positions.price.f8). A refresh appends one snapshot
+    row and one row per position, so writes never rewrite earlier data. Reads
+    memory-map the files and select a time range with a binary search on the
+    timestamp column, which is sorted because rows are only ever appended.
+    A torn append (crash between columns) is trimmed on the next open.
+    Meant for a single writer process.
+    """
+    def __init__(self, root: str = "history"):
+        self.root = root
+        self._lock = threading.Lock()
+        self._tokens = {}       # wallet -> {(chain, address, symbol): id}
+        self._repaired = set()
+
+    def _dir(self, wallet: str) -> str:
+        return os.path.join(self.root, wallet.lower())
+
+    @staticmethod
+    def _path(directory: str, table: str, column: str, dtype: str) -> str:
+        return os.path.join(directory, f"{table}.{column}.{dtype[1:]}")
+
+    def _length(self, directory: str, table: str, columns: dict) -> int:
+        # Rows present in every column; anything past that is a torn append
+        lengths = []
+        for column, dtype in columns.items():
+            path = self._path(directory, table, column, dtype)
+            lengths.append(os.path.getsize(path) // np.dtype(dtype).itemsize if os.path.exists(path) else 0)
+        return min(lengths)
+
+    def _repair(self, directory: str):
+        if directory in self._repaired:
+            return
+        for table, columns in (("snapshots", SNAPSHOT_COLUMNS), ("positions", POSITION_COLUMNS)):
+            rows = self._length(directory, table, columns)
+            for column, dtype in columns.items():
+                path = self._path(directory, table, column, dtype)
+                if os.path.exists(path):
+                    os.truncate(path, rows * np.dtype(dtype).itemsize)
+        self._repaired.add(directory)
+
+    def _append(self, directory: str, table: str, columns: dict, values: dict):
+        for column, dtype in columns.items():
+            with open(self._path(directory, table, column, dtype), "ab") as f:
+                f.write(np.ascontiguousarray(values[column], dtype=dtype).tobytes())
+
+    def _read(self, directory: str, table: str, columns: dict, start: float = None, end: float = None) -> dict:
+        rows = self._length(directory, table, columns)
+        if rows == 0:
+            return {column: np.empty(0, dtype=dtype) for column, dtype in columns.items()}
+        mapped = {
+            column: np.memmap(self._path(directory, table, column, dtype), dtype=dtype, mode="r", shape=(rows,))
+            for column, dtype in columns.items()
+        }
+        ts = mapped["ts"]
+        lo = 0 if start is None else int(np.searchsorted(ts, start, side="left"))
+        hi = rows if end is None else int(np.searchsorted(ts, end, side="right"))
+        return {column: np.array(values[lo:hi]) for column, values in mapped.items()}
+
+    def _token_ids(self, wallet: str) -> dict:
+        if wallet not in self._tokens:
+            ids = {}
+            path = os.path.join(self._dir(wallet), "tokens.txt")
+            if os.path.exists(path):
+                with open(path, newline="") as f:
+                    for row in csv.reader(f, delimiter="\t"):
+                        # Files written before quoting: a tab in a symbol split it into extra fields
+                        chain, address, symbol = (row + ["", ""])[:2] + ["\t".join(row[2:])]
+                        ids[(chain, address, symbol)] = len(ids)
+            self._tokens[wallet] = ids
+        return self._tokens[wallet]
+
+    def record(self, wallet: str, portfolio, ts: float = None):
+        """Appends one snapshot of a Portfolio for `wallet` (defaults to now)."""
+        wallet = wallet.lower()
+        ts = time.time() if ts is None else ts
+        directory = self._dir(wallet)
+        frame = portfolio.frame
+        with self._lock:
+            os.makedirs(directory, exist_ok=True)
+            self._repair(directory)
+            last = self._read(directory, "snapshots", {"ts": "<f8"}, start=ts)["ts"]
+            if len(last) and last[-1] > ts:
+                raise ValueError(f"Snapshot at {ts} is older than the latest one for {wallet}")
+
+            ids = self._token_ids(wallet)
+            keys = list(zip(frame["chain"].astype(str), frame["address"].astype(str).str.lower(),
+                            frame["symbol"].fillna("").astype(str)))
+            new = [key for key in dict.fromkeys(keys) if key not in ids]
+            if new:
+                with open(os.path.join(directory, "tokens.txt"), "a", newline="") as f:
+                    writer = csv.writer(f, delimiter="\t", lineterminator="\n")
+                    for key in new:
+                        ids[key] = len(ids)
+                        writer.writerow(key)
+
+            self._append(directory, "positions", POSITION_COLUMNS, {
+                "ts": np.full(len(frame), ts),
+                "token": np.fromiter((ids[key] for key in keys), dtype="<i4", count=len(keys)),
+                "balance": frame["balance"].to_numpy(),
+                "price": frame["price"].to_numpy(),
+            })
+            self._append(directory, "snapshots", SNAPSHOT_COLUMNS, {
+                "ts": [ts], "total": [portfolio.total],
+                "crypto": [portfolio.total_crypto], "defi": [portfolio.total_defi],
+            })
+
+    def snapshots(self, wallet: str, start: float = None, end: float = None) -> pd.DataFrame:
+        """Snapshot totals in [start, end], indexed by UTC timestamp."""
+        columns = self._read(self._dir(wallet), "snapshots", SNAPSHOT_COLUMNS, start, end)
+        frame = pd.DataFrame(columns)
+        frame.index = pd.to_datetime(frame.pop("ts"), unit="s", utc=True)
+        return frame
+
+    def positions(self, wallet: str, start: float = None, end: float = None) -> pd.DataFrame:
+        """Every recorded position in [start, end] with chain, address and symbol resolved."""
+        wallet = wallet.lower()
+        columns = self._read(self._dir(wallet), "positions", POSITION_COLUMNS, start, end)
+        tokens = list(self._token_ids(wallet))
+        parts = zip(*tokens) if tokens else ((), (), ())
+        chain, address, symbol = (np.array(part, dtype=object) for part in parts)
+        token = columns.pop("token")
+        frame = pd.DataFrame(columns)
+        frame["chain"], frame["address"], frame["symbol"] = chain[token], address[token], symbol[token]
+        frame["value_usd"] = frame["balance"] * frame["price"]
+        frame["ts"] = pd.to_datetime(frame["ts"], unit="s", utc=True)
+        return frame
+
+    def price_matrix(self, wallet: str, start: float, end: float, interval: float = DAY) -> pd.DataFrame:
+        """
+        Last recorded price of every token in each `interval`-second bucket of
+        [start, end]: one row per bucket that has data, one "chain:address"
+        column per token, gaps carried forward from the previous bucket.
+        """
+        wallet = wallet.lower()
+        columns = self._read(self._dir(wallet), "positions", {"ts": "<f8", "token": "<i4", "price": "<f8"}, start, end)
+        tokens = list(self._token_ids(wallet))
+        if len(columns["ts"]) == 0 or not tokens:
+            return pd.DataFrame()
+        buckets = ((columns["ts"] - start) // interval).astype(np.int64)
+        rows, row_index = np.unique(buckets, return_inverse=True)
+        # Rows are in time order, so the last write per (bucket, token) is the latest price
+        cells = row_index * len(tokens) + columns["token"]
+        _, last = np.unique(cells[::-1], return_index=True)
+        last = len(cells) - 1 - last
+        matrix = np.full((len(rows), len(tokens)), np.nan)
+        matrix.flat[cells[last]] = columns["price"][last]
+        # Forward-fill gaps down each column
+        filled = np.where(np.isnan(matrix), 0, np.arange(len(rows))[:, None])
+        np.maximum.accumulate(filled, axis=0, out=filled)
+        matrix = matrix[filled, np.arange(len(tokens))]
+        index = pd.to_datetime(start + rows * interval, unit="s", utc=True)
+        frame = pd.DataFrame(matrix, index=index, columns=[f"{chain}:{address}" for chain, address, _ in tokens])
+        if frame.columns.has_duplicates:
+            # A token recorded under several symbols: keep its latest price
+            frame = frame.T.groupby(level=0).last().T
+        return frame
+
+    def downsample(self, wallet: str, start: float, end: float, interval: float, column: str = "total") -> pd.Series:
+        """The last `column` value in each `interval`-second bucket of [start, end]; empty buckets are dropped."""
+        columns = self._read(self._dir(wallet), "snapshots", {"ts": "<f8", column: "<f8"}, start, end)
+        ts, values = columns["ts"], columns[column]
+        if len(ts) == 0:
+            return pd.Series(dtype=np.float64)
+        buckets = ((ts - start) // interval).astype(np.int64)
+        # Timestamps are sorted, so a bucket's last row is where the next bucket starts, minus one
+        last = np.flatnonzero(np.append(buckets[1:] != buckets[:-1], True))
+        index = pd.to_datetime(start + buckets[last] * interval, unit="s", utc=True)
+        return pd.Series(values[last], index=index, name=column)
+
+    def changes(self, wallet: str, column: str = "total", windows: dict = CHANGE_WINDOWS, now: float = None) -> dict:
+        """
+        {label: (absolute change, fractional change)} of `column` between the latest
+        snapshot and the last one at or before now - window; None when the
+        history does not reach back that far.
+        """
+        now = time.time() if now is None else now
+        columns = self._read(self._dir(wallet), "snapshots", {"ts": "<f8", column: "<f8"}, end=now)
+        ts, values = columns["ts"], columns[column]
+        if len(ts) == 0:
+            return {label: None for label in windows}
+        targets = now - np.fromiter(windows.values(), dtype=np.float64)
+        positions = np.searchsorted(ts, targets, side="right") - 1
+        current = values[-1]
+        result = {}
+        for label, position in zip(windows, positions):
+            if position < 0:
+                result[label] = None
+                continue
+            previous = float(values[position])
+            result[label] = (float(current) - previous, (float(current) - previous) / previous if previous else 0.0)
+        return result
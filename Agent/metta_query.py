@@ -0,0 +1,321 @@
+import re
+import time
+import operator
+from collections import defaultdict
+
+# A flat expression such as (pool $id base "USD Coin" $t $tvl $vol)
+_EXPR_RE = re.compile(r'\(([^()]*)\)')
+_ATOM_RE = re.compile(r'"[^"]*"|\S+')
+
+# Built-in comparison goals; they run once all of their arguments are bound
+BUILTINS = {
+    ">": operator.gt,
+    "<": operator.lt,
+    ">=": operator.ge,
+    "<=": operator.le,
+    "=": lambda a, b: _key(a) == _key(b),
+    "!=": lambda a, b: _key(a) != _key(b),
+}
+
+MAX_RULE_DEPTH = 16
+
+
+class Var:
+    """A pattern variable, written `$name` in MeTTa-style patterns."""
+    __slots__ = ("name",)
+
+    def __init__(self, name: str):
+        self.name = name
+
+    def __repr__(self):
+        return f"${self.name}"
+
+    def __eq__(self, other):
+        return isinstance(other, Var) and other.name == self.name
+
+    def __hash__(self):
+        return hash(("$", self.name))
+
+
+def _key(value):
+    # Symbols and strings match case-insensitively, like the analyzer's lookups
+    return value.casefold() if isinstance(value, str) else value
+
+
+def _parse_atom(token: str):
+    if token.startswith('"'):
+        return token.strip('"')
+    if token.startswith("$") and len(token) > 1:
+        return Var(token[1:])
+    try:
+        return int(token)
+    except ValueError:
+        pass
+    try:
+        return float(token)
+    except ValueError:
+        return token
+
+
+def parse_pattern(text: str) -> tuple:
+    """Parses a single flat expression into a tuple of atoms and variables."""
+    return tuple(_parse_atom(t) for t in _ATOM_RE.findall(text.strip().strip("()")))
+
+
+def parse_query(text: str) -> list:
+    """Parses one or more expressions into a conjunctive list of goals."""
+    goals = [parse_pattern(body) for body in _EXPR_RE.findall(text)]
+    if not goals:
+        raise ValueError(f"No expressions found in query: {text!r}")
+    return goals
+
+
+def _as_goals(query) -> list:
+    if isinstance(query, str):
+        return parse_query(query)
+    if isinstance(query, tuple):
+        return [query]
+    return [parse_pattern(g) if isinstance(g, str) else tuple(g) for g in query]
+
+
+def _walk(term, env: dict):
+    while isinstance(term, Var) and term in env:
+        term = env[term]
+    return term
+
+
+def _unify(pattern: tuple, target: tuple, env: dict):
+    """Unifies two expressions of equal arity. Returns the extended env or None."""
+    # Fail fast on mismatched constants before copying the environment
+    for a, b in zip(pattern, target):
+        a, b = _walk(a, env), _walk(b, env)
+        if not isinstance(a, Var) and not isinstance(b, Var) and _key(a) != _key(b):
+            return None
+
+    new_env = None
+    for a, b in zip(pattern, target):
+        a = _walk(a, new_env if new_env is not None else env)
+        b = _walk(b, new_env if new_env is not None else env)
+        if isinstance(a, Var):
+            if a == b:
+                continue
+            if new_env is None:
+                new_env = dict(env)
+            new_env[a] = b
+        elif isinstance(b, Var):
+            if new_env is None:
+                new_env = dict(env)
+            new_env[b] = a
+        elif _key(a) != _key(b):
+            return None
+    return new_env if new_env is not None else env
+
+
+def _bucket_map():
+    # Module-level rather than a lambda so that a FactStore stays picklable
+    return defaultdict(list)
+
+
+def _variables(goals: list) -> list:
+    seen = []
+    for goal in goals:
+        for term in goal:
+            if isinstance(term, Var) and term not in seen:
+                seen.append(term)
+    return seen
+
+
+class FactStore:
+    """
+    A store of ground facts with unification-based, conjunctive queries.
+    Every argument position is indexed, so bound arguments narrow the candidate
+    facts before any unification is attempted.
+    """
+    def __init__(self):
+        self.facts = []
+        self._seen = set()
+        self._by_functor = defaultdict(list)
+        self._by_arg = defaultdict(_bucket_map)
+        self.rules = defaultdict(list)
+        self._fresh = 0
+        # Bumped on every change, so callers can key derived results on it
+        self.version = 0
+
+    def __len__(self):
+        return len(self.facts)
+
+    def __contains__(self, fact) -> bool:
+        if isinstance(fact, str):
+            fact = parse_pattern(fact)
+        return tuple(_key(a) for a in fact) in self._seen
+
+    def add(self, fact) -> bool:
+        """Adds a ground fact. Returns False if it was already present."""
+        if isinstance(fact, str):
+            fact = parse_pattern(fact)
+        fact = tuple(fact)
+        if any(isinstance(a, Var) for a in fact):
+            raise ValueError(f"Facts must be ground, got {fact!r}")
+        normalized = tuple(_key(a) for a in fact)
+        if normalized in self._seen:
+            return False
+        self._seen.add(normalized)
+
+        idx = len(self.facts)
+        self.facts.append(fact)
+        signature = (fact[0], len(fact))
+        self._by_functor[signature].append(idx)
+        for pos in range(1, len(fact)):
+            self._by_arg[signature + (pos,)][normalized[pos]].append(idx)
+        self.version += 1
+        return True
+
+    def add_rule(self, head, body):
+        """
+        Adds a conjunctive rule: `head` holds whenever every goal in `body` holds.
+        e.g. add_rule("(pair $c $a $b $id)", "(pool $id $c $a $b $tvl $vol)")
+        """
+        head = parse_pattern(head) if isinstance(head, str) else tuple(head)
+        body = _as_goals(body)
+        self.rules[(head[0], len(head))].append((head, body))
+        self.version += 1
+
+    def query(self, query, indexed: bool = True):
+        """
+        Yields one binding dict per solution, keyed by variable name.
+        `query` is a pattern string, a goal tuple, or a list of either.
+        With indexed=False every goal is resolved by a linear scan (for benchmarks).
+        """
+        goals = _as_goals(query)
+        variables = _variables(goals)
+        for env in self._solve(goals, {}, indexed, 0):
+            yield {v.name: _walk(v, env) for v in variables}
+
+    def first(self, query, indexed: bool = True):
+        """Returns the first solution of a query, or None."""
+        return next(self.query(query, indexed), None)
+
+    def ask(self, query) -> bool:
+        """True if the query has at least one solution."""
+        return self.first(query) is not None
+
+    def _solve(self, goals: list, env: dict, indexed: bool, depth: int):
+        if not goals:
+            yield env
+            return
+
+        if len(goals) == 1:
+            i = 0
+        else:
+            i = self._pick_goal(goals, env) if indexed else self._first_runnable(goals, env)
+        goal, rest = goals[i], goals[:i] + goals[i + 1:]
+
+        if goal[0] in BUILTINS:
+            args = [_walk(a, env) for a in goal[1:]]
+            if any(isinstance(a, Var) for a in args):
+                raise ValueError(f"Unbound variable in built-in goal {goal!r}")
+            if BUILTINS[goal[0]](*args):
+                yield from self._solve(rest, env, indexed, depth)
+            return
+
+        for idx in self._candidates(goal, env, indexed):
+            new_env = _unify(goal, self.facts[idx], env)
+            if new_env is not None:
+                yield from self._solve(rest, new_env, indexed, depth)
+
+        if depth >= MAX_RULE_DEPTH:
+            return
+        for head, body in self.rules.get((goal[0], len(goal)), ()):
+            head, body = self._rename(head, body)
+            new_env = _unify(head, goal, env)
+            if new_env is not None:
+                yield from self._solve(body + rest, new_env, indexed, depth + 1)
+
+    def _rename(self, head: tuple, body: list):
+        self._fresh += 1
+        suffix = f"#{self._fresh}"
+        mapping = {}
+
+        def rename(term):
+            if isinstance(term, Var):
+                if term not in mapping:
+                    mapping[term] = Var(term.name + suffix)
+                return mapping[term]
+            return term
+
+        return tuple(map(rename, head)), [tuple(map(rename, g)) for g in body]
+
+    def _candidates(self, goal: tuple, env: dict, indexed: bool):
+        if not indexed:
+            return range(len(self.facts))
+        signature = (goal[0], len(goal))
+        best = self._by_functor.get(signature, ())
+        for pos in range(1, len(goal)):
+            term = _walk(goal[pos], env)
+            if isinstance(term, Var):
+                continue
+            bucket = self._by_arg.get(signature + (pos,), {}).get(_key(term), ())
+            if len(bucket) < len(best):
+                best = bucket
+                if not best:
+                    break
+        return best
+
+    def _estimate(self, goal: tuple, env: dict) -> float:
+        if goal[0] in BUILTINS:
+            bound = all(not isinstance(_walk(a, env), Var) for a in goal[1:])
+            return -1 if bound else float("inf")
+        estimate = len(self._candidates(goal, env, True))
+        # A rule contributes the size of its most selective body goal
+        for head, body in self.rules.get((goal[0], len(goal)), ()):
+            head, body = self._rename(head, body)
+            rule_env = _unify(head, goal, env)
+            if rule_env is not None:
+                estimate += min((len(self._candidates(g, rule_env, True))
+                                 for g in body if g[0] not in BUILTINS), default=0)
+        return estimate
+
+    def _pick_goal(self, goals: list, env: dict) -> int:
+        return min(range(len(goals)), key=lambda i: self._estimate(goals[i], env))
+
+    def _first_runnable(self, goals: list, env: dict) -> int:
+        # Linear mode keeps the written order, deferring built-ins until bound
+        for i, goal in enumerate(goals):
+            if goal[0] not in BUILTINS or all(not isinstance(_walk(a, env), Var) for a in goal[1:]):
+                return i
+        return 0
+
+
+def benchmark(store: FactStore, queries: list, repeat: int = 3) -> dict:
+    """Times each query with the argument indexes and with linear evaluation."""
+    results = {}
+    for query in queries:
+        timings = {}
+        for mode, indexed in (("indexed", True), ("linear", False)):
+            start = time.perf_counter()
+            for _ in range(repeat):
+                solutions = list(store.query(query, indexed=indexed))
+            timings[mode] = (time.perf_counter() - start) / repeat
+        timings["solutions"] = len(solutions)
+        timings["speedup"] = timings["linear"] / timings["indexed"] if timings["indexed"] else float("inf")
+        results[query if isinstance(query, str) else repr(query)] = timings
+    return results
+
+
+# --- Benchmark: indexed engine vs linear evaluation ---
+if __name__ == "__main__":
+    from graph_tool import load_graph
+    from MeTTaGraphAnalyzer import MeTTaGraphAnalyzer
+
+    G = load_graph()
+    if G:
+        analyzer = MeTTaGraphAnalyzer(G)
+        queries = [
+            '(pool $id base "USD Coin" $t $tvl $vol)',
+            '(pair eth "Wrapped Ether" "USD Coin" $id)',
+            '(pool $id eth $a $b $tvl $vol) (> $tvl 50000000)',
+            '(pair base "Wrapped Ether" $mid $p1) (pair base $mid "USD Coin" $p2)',
+        ]
+        for query, t in benchmark(analyzer.facts, queries).items():
+            print(f"{query}\n   indexed: {t['indexed'] * 1e3:.3f} ms | linear: {t['linear'] * 1e3:.3f} ms"
+                  f" | {t['speedup']:.1f}x | {t['solutions']} solutions")
@@ -0,0 +1,89 @@
+from eth_abi import decode, encode
+from eth_abi.exceptions import DecodingError
+from eth_utils.abi import abi_to_signature, function_abi_to_4byte_selector, get_abi_input_types, get_abi_output_types
+from web3 import Web3
+
+# Multicall3 has the same address on every chain it is deployed to (ETH and BASE included)
+MULTICALL3 = "0xcA11bde05977b3631167028862bE2a173976CA11"
+AGGREGATE3 = bytes.fromhex("82ad56cb")          # aggregate3((address,bool,bytes)[])
+# Calls per aggregate3; keeps each eth_call well inside nodes' gas and response size caps
+MULTICALL_CHUNK = 250
+
+_functions = {}             # signature -> (selector, input types, output types)
+
+
+def _function(abi: dict) -> tuple:
+    signature = abi_to_signature(abi)
+    entry = _functions.get(signature)
+    if entry is None:
+        entry = _functions[signature] = (
+            function_abi_to_4byte_selector(abi), get_abi_input_types(abi), get_abi_output_types(abi)
+        )
+    return entry
+
+
+def read_call(target: str, abi: dict, *args) -> tuple:
+    """
+    One read for multicall(): `abi` is the function's ABI entry. Cheaper than a
+    web3 ContractFunction when building thousands of reads.
+    """
+    selector, input_types, output_types = _function(abi)
+    return Web3.to_checksum_address(target), selector + encode(input_types, args), output_types
+
+
+def block_number_call() -> tuple:
+    """Multicall3.getBlockNumber(), to learn which block a multicall read."""
+    return MULTICALL3, bytes.fromhex("42cbb15c"), ["uint256"]
+
+
+def _prepare(call) -> tuple:
+    if isinstance(call, tuple):
+        return call
+    # A web3 ContractFunction with its arguments bound, e.g. token.functions.balanceOf(owner)
+    return read_call(call.address, call.abi, *call.args)
+
+
+def _decode(output_types, data: bytes):
+    values = decode(output_types, data)
+    values = tuple(
+        Web3.to_checksum_address(value) if kind == "address" else value
+        for kind, value in zip(output_types, values)
+    )
+    return values[0] if len(values) == 1 else values
+
+
+def multicall(w3, calls, allow_failure: bool = True, chunk_size: int = MULTICALL_CHUNK, block="latest") -> list:
+    """
+    Runs contract reads through Multicall3.aggregate3 and returns their decoded
+    results in order, as web3's call() would. `calls` are ContractFunctions
+    with bound arguments or read_call() tuples.
+
+    Reads are packed `chunk_size` to an eth_call and every chunk goes to the
+    node in one JSON-RPC batch, so hundreds of reads cost one round trip. A
+    read that reverts (or returns nothing, e.g. a missing contract) gives None
+    with `allow_failure`; otherwise it raises.
+    """
+    prepared = [_prepare(call) for call in calls]
+    if not prepared:
+        return []
+    chunks = [prepared[i:i + chunk_size] for i in range(0, len(prepared), chunk_size)]
+    with w3.batch_requests() as batch:
+        for chunk in chunks:
+            data = AGGREGATE3 + encode(["(address,bool,bytes)[]"], [[(target, True, calldata) for target, calldata, _ in chunk]])
+            batch.add(w3.eth.call({"to": MULTICALL3, "data": data}, block))
+        responses = batch.execute()
+
+    results = []
+    for chunk, response in zip(chunks, responses):
+        (returned,) = decode(["(bool,bytes)[]"], bytes(response))
+        for (target, calldata, output_types), (success, data) in zip(chunk, returned):
+            if success and (data or not output_types):
+                try:
+                    results.append(_decode(output_types, data))
+                    continue
+                except DecodingError:
+                    pass
+            if not allow_failure:
+                raise Exception(f"Multicall read 0x{calldata[:4].hex()} on {target} failed")
+            results.append(None)
+    return results
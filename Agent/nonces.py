@@ -0,0 +1,153 @@
+import time
+import threading
+
+from web3.exceptions import TimeExhausted, Web3RPCError
+
+# Node errors meaning the nonce we sent is already used by a mined or pending transaction
+STALE_NONCE_ERRORS = ("nonce too low", "replacement transaction underpriced", "already imported")
+# Node errors meaning this exact transaction is already in its mempool
+KNOWN_TX_ERRORS = ("already known", "known transaction")
+
+
+class NonceManager:
+    """
+    Hands out transaction nonces per (chain, account) from a local counter.
+
+    The counter is read from the node ("pending" count) on first use and again
+    after `resync_after` idle seconds, so transactions sent from elsewhere are
+    picked up. In between, nonces come from memory: dependent transactions
+    (approve then burn, approve then swap) can be sent back to back without
+    waiting for the first to be mined. A node reporting the nonce as used (a
+    replacement or another sender) triggers a resync and one retry.
+
+    Gaps are closed without waiting for an idle period: any other failed send
+    resyncs (the node may or may not have taken it), and wait_for_receipt()
+    reconciles with the node when a receipt times out, so a dropped
+    transaction's nonce is reused even under steady traffic. Callbacks
+    registered with subscribe() hear about transactions that will not take
+    effect, so caches built on them (AllowanceCache) can drop what they assumed.
+
+    One manager is shared by every helper that signs for the same account.
+    """
+    def __init__(self, resync_after: float = 60.0):
+        self.resync_after = resync_after
+        self.stats = {"sent": 0, "syncs": 0, "retries": 0, "gaps": 0}
+        self._slots = {}            # (chain, address) -> {"lock", "next", "used_at"}
+        self._listeners = []
+        self._lock = threading.Lock()
+
+    def subscribe(self, callback):
+        """
+        Registers callback(chain, address, tx_hash) for sent transactions that will
+        not take effect: called with the hash of one whose receipt shows it
+        reverted, or with None when reconcile() finds dropped (or replaced) ones.
+        """
+        with self._lock:
+            if callback not in self._listeners:
+                self._listeners.append(callback)
+
+    def _failed(self, chain: str, address: str, tx_hash=None):
+        for callback in list(self._listeners):
+            callback(chain, address, tx_hash)
+
+    def _slot(self, chain: str, address: str) -> dict:
+        key = (chain, address.lower())
+        with self._lock:
+            slot = self._slots.get(key)
+            if slot is None:
+                slot = self._slots[key] = {"lock": threading.Lock(), "next": None, "used_at": 0.0}
+            return slot
+
+    def _sync(self, slot: dict, w3, address: str):
+        self.stats["syncs"] += 1
+        slot["next"] = w3.eth.get_transaction_count(address, "pending")
+
+    def _stale(self, slot: dict) -> bool:
+        return slot["next"] is None or time.monotonic() - slot["used_at"] > self.resync_after
+
+    def needs_sync(self, chain: str, address: str) -> bool:
+        """Whether the next send will read the nonce from the node."""
+        return self._stale(self._slot(chain, address))
+
+    def seed(self, chain: str, address: str, pending_count: int):
+        """Takes a "pending" transaction count read elsewhere (e.g. in a batch) as a fresh sync."""
+        slot = self._slot(chain, address)
+        with slot["lock"]:
+            if self._stale(slot):
+                self.stats["syncs"] += 1
+                slot["next"] = pending_count
+                slot["used_at"] = time.monotonic()
+
+    def resync(self, chain: str, address: str):
+        """Forgets the local counter; the next send reads it from the node again."""
+        slot = self._slot(chain, address)
+        with slot["lock"]:
+            slot["next"] = None
+
+    def reconcile(self, chain: str, w3, address: str) -> bool:
+        """
+        Reads the node's "pending" count and moves the counter back to it if it
+        is behind: transactions we sent were dropped, and their nonces must be
+        reused before anything later can be mined. Returns whether it moved.
+        """
+        slot = self._slot(chain, address)
+        with slot["lock"]:
+            self.stats["syncs"] += 1
+            pending = w3.eth.get_transaction_count(address, "pending")
+            moved = slot["next"] is not None and pending < slot["next"]
+            if moved:
+                self.stats["gaps"] += 1
+                slot["next"] = pending
+        if moved:
+            self._failed(chain, address)
+        return moved
+
+    def wait_for_receipt(self, chain: str, w3, address: str, tx_hash, timeout: float = 120.0, poll_latency: float = 0.5):
+        """
+        w3.eth.wait_for_transaction_receipt(), reconciling the counter if the
+        receipt times out and telling subscribers if the transaction reverted.
+        """
+        try:
+            receipt = w3.eth.wait_for_transaction_receipt(tx_hash, timeout=timeout, poll_latency=poll_latency)
+        except TimeExhausted:
+            self.reconcile(chain, w3, address)
+            raise
+        if receipt["status"] == 0:
+            self._failed(chain, address, tx_hash)
+        return receipt
+
+    def send(self, chain: str, w3, account, tx: dict) -> str:
+        """
+        Assigns the next nonce to `tx`, signs it with `account` and broadcasts
+        it; returns the transaction hash. Sends from one account on one chain
+        are serialized so nonces reach the node in order.
+        """
+        slot = self._slot(chain, account.address)
+        with slot["lock"]:
+            for attempt in range(2):
+                if self._stale(slot):
+                    self._sync(slot, w3, account.address)
+                tx["nonce"] = slot["next"]
+                signed = account.sign_transaction(tx)
+                try:
+                    tx_hash = w3.eth.send_raw_transaction(signed.raw_transaction)
+                except Exception as e:
+                    node_error = str(e).lower() if isinstance(e, (Web3RPCError, ValueError)) else ""
+                    if any(error in node_error for error in KNOWN_TX_ERRORS):
+                        tx_hash = signed.hash
+                    elif attempt == 0 and any(error in node_error for error in STALE_NONCE_ERRORS):
+                        self.stats["retries"] += 1
+                        slot["next"] = None
+                        continue
+                    else:
+                        # Rejected, or lost on the way back (a timeout may still have reached the node): reread next time
+                        slot["next"] = None
+                        raise
+                slot["next"] = tx["nonce"] + 1
+                slot["used_at"] = time.monotonic()
+                self.stats["sent"] += 1
+                return tx_hash.hex()
+
+
+# Shared by every helper in the process, so CCTP and Uniswap sends from one account never collide
+nonce_manager = NonceManager()
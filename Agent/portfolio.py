@@ -0,0 +1,99 @@
+import numpy as np
+import pandas as pd
+
+# get_wallet_balances() keys -> category labels used in the frame
+CATEGORY_KEYS = {"wallet_tokens": "wallet", "defi_tokens": "defi", "miscellaneous_tokens": "misc"}
+
+COLUMNS = ["wallet", "chain", "address", "symbol", "category", "spam", "balance", "price", "value_usd"]
+
+
+class Portfolio:
+    """
+    Columnar view of one or many wallets: one row per (wallet, chain, address)
+    with balance, price, value_usd, chain and category. Values and aggregates are
+    computed with vectorized operations once, when the portfolio is built, so a
+    dashboard rerun only reads them.
+    """
+    def __init__(self, frame: pd.DataFrame, ignored_tokens=()):
+        frame = frame.reindex(columns=COLUMNS)
+        for column in ("wallet", "chain", "category"):
+            frame[column] = frame[column].astype("category")
+        frame["spam"] = frame["spam"].fillna(False).astype(bool)
+        balance = frame["balance"].to_numpy(dtype=np.float64, na_value=0.0)
+        price = frame["price"].to_numpy(dtype=np.float64, na_value=0.0)
+        if ignored_tokens:
+            price = np.where(frame["address"].isin(list(ignored_tokens)).to_numpy(), 0.0, price)
+        frame["balance"], frame["price"] = balance, price
+        frame["value_usd"] = balance * price
+
+        totals = frame.groupby("category", observed=True)["value_usd"].sum()
+        # Weights are relative to the total of the token's own category, as on the dashboard
+        frame["weight"] = frame["value_usd"] / frame["category"].map(totals).astype(np.float64).replace(0.0, np.nan)
+        frame["weight"] = frame["weight"].fillna(0.0)
+
+        self.frame = frame
+        self.category_totals = {c: float(totals.get(c, 0.0)) for c in CATEGORY_KEYS.values()}
+        self.by_chain = frame.groupby(["chain", "category"], observed=True)["value_usd"].sum().unstack(fill_value=0.0)
+        self.by_wallet = frame.groupby("wallet", observed=True)["value_usd"].sum()
+
+    @classmethod
+    def from_wallets(cls, wallets: dict, ignored_tokens=()) -> "Portfolio":
+        """Builds a portfolio from {wallet_address: get_wallet_balances() result}; failed wallets are skipped."""
+        columns = {column: [] for column in COLUMNS if column != "value_usd"}
+        for wallet, classified in wallets.items():
+            for key, category in CATEGORY_KEYS.items():
+                tokens = classified.get(key) or ()
+                columns["wallet"] += [wallet] * len(tokens)
+                columns["category"] += [category] * len(tokens)
+                for column in ("chain", "address", "symbol", "spam", "balance", "price"):
+                    columns[column] += [token.get(column) for token in tokens]
+        return cls(pd.DataFrame(columns), ignored_tokens)
+
+    @classmethod
+    def from_balances(cls, classified: dict, wallet: str = "", ignored_tokens=()) -> "Portfolio":
+        """A single-wallet portfolio from a get_wallet_balances() result."""
+        return cls.from_wallets({wallet: classified}, ignored_tokens)
+
+    def __len__(self):
+        return len(self.frame)
+
+    @property
+    def total_crypto(self) -> float:
+        return self.category_totals["wallet"]
+
+    @property
+    def total_defi(self) -> float:
+        return self.category_totals["defi"]
+
+    @property
+    def total(self) -> float:
+        return self.total_crypto + self.total_defi
+
+    def holdings(self, category: str = "wallet") -> pd.DataFrame:
+        return self.frame[self.frame["category"] == category]
+
+    def top_holdings(self, n: int = 10, category: str = "wallet") -> pd.DataFrame:
+        return self.holdings(category).nlargest(n, "value_usd")
+
+
+# --- Example Usage ---
+if __name__ == "__main__":
+    import time
+
+    # A synthetic multi-wallet portfolio to time the build and the aggregates
+    rng = np.random.default_rng(0)
+    wallets = {}
+    for w in range(200):
+        tokens = [
+            {"chain": ("base", "ethereum")[i % 2], "address": f"0x{w:020x}{i:020x}", "symbol": f"TKN{i}",
+             "spam": False, "balance": float(rng.random() * 100), "price": float(rng.random() * 10)}
+            for i in range(250)
+        ]
+        wallets[f"0x{w:040x}"] = {"wallet_tokens": tokens[:200], "defi_tokens": tokens[200:], "miscellaneous_tokens": []}
+
+    start = time.perf_counter()
+    portfolio = Portfolio.from_wallets(wallets)
+    print(f"{len(portfolio)} positions in {(time.perf_counter() - start) * 1e3:.1f} ms")
+    print(f"total ${portfolio.total:,.2f} (crypto ${portfolio.total_crypto:,.2f}, defi ${portfolio.total_defi:,.2f})")
+    print(portfolio.by_chain)
+    print(portfolio.top_holdings(5)[["wallet", "symbol", "value_usd", "weight"]])
@@ -0,0 +1,236 @@
+import time
+import asyncio
+import sqlite3
+import threading
+
+
+class SQLitePriceStore:
+    """
+    On-disk price entries shared by every process that opens the same file
+    (e.g. the Streamlit app and the uAgent). WAL mode keeps readers and the
+    single writer from blocking each other.
+    """
+    def __init__(self, path: str):
+        self.path = path
+        self._local = threading.local()
+        with self._conn() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS prices ("
+                " chain TEXT NOT NULL, address TEXT NOT NULL, price REAL, fetched_at REAL NOT NULL,"
+                " PRIMARY KEY (chain, address))"
+            )
+
+    def _conn(self) -> sqlite3.Connection:
+        # sqlite3 connections cannot be shared across threads
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = self._local.conn = sqlite3.connect(self.path, timeout=5)
+        return conn
+
+    # Keys per query; two bound variables each, well under SQLite's variable limit
+    CHUNK = 400
+
+    def get_many(self, keys: list) -> dict:
+        entries = {}
+        conn = self._conn()
+        keys = list(keys)
+        for i in range(0, len(keys), self.CHUNK):
+            chunk = keys[i:i + self.CHUNK]
+            rows = conn.execute(
+                "SELECT chain, address, price, fetched_at FROM prices WHERE (chain, address) IN"
+                f" (VALUES {','.join(['(?, ?)'] * len(chunk))})",
+                [part for key in chunk for part in key]
+            )
+            for chain, address, price, fetched_at in rows:
+                entries[(chain, address)] = (price, fetched_at)
+        return entries
+
+    def put_many(self, entries: dict):
+        with self._conn() as conn:
+            conn.executemany(
+                "INSERT OR REPLACE INTO prices (chain, address, price, fetched_at) VALUES (?, ?, ?, ?)",
+                [(chain, address, price, fetched_at) for (chain, address), (price, fetched_at) in entries.items()]
+            )
+
+
+class PriceCache:
+    """
+    TTL cache in front of a price client, keyed by (chain, address).
+
+    - Entries younger than `ttl` are served directly.
+    - Entries up to `ttl + stale_ttl` old are served as-is while a background
+      task refreshes them (stale-while-revalidate).
+    - Concurrent misses for the same token share one upstream request.
+    - With a `batch_window`, misses from every caller (e.g. many wallets loading
+      at once) are collected per chain for that many seconds and fetched
+      together, so the client sends full batches instead of one per caller.
+    - Tokens with no price are cached too, so they are not refetched every call.
+    - An optional `backend` (e.g. SQLitePriceStore) is consulted, off the event
+      loop, for tokens missing from memory or older than `ttl` there, and
+      written through on every fetch, so several processes share prices: a
+      fresher row another process wrote wins over going upstream.
+
+    Lookups run on the client's background loop whatever loop the caller is
+    on, so in-flight and queued fetches are shared by every caller.
+    """
+    def __init__(self, client, ttl: float = 60.0, stale_ttl: float = 300.0, backend=None, batch_window: float = None):
+        self.client = client
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self.backend = backend
+        self.batch_window = batch_window
+        self._entries = {}          # (chain, address) -> (price or None, fetched_at)
+        self._inflight = {}         # (chain, address) -> Future
+        self._queued = {}           # chain -> [address] waiting for the batch window
+        self._refreshing = set()
+        self._tasks = set()
+        self.stats = {"hits": 0, "stale_hits": 0, "misses": 0, "upstream_requests": 0}
+
+    async def get_prices(self, addresses, chain: str) -> dict:
+        """Same contract as the client's get_prices: {address: price_usd}, unpriced tokens omitted."""
+        return await self.client._on_background_loop(self._get_prices(addresses, chain))
+
+    async def _get_prices(self, addresses, chain: str) -> dict:
+        if isinstance(addresses, str):
+            addresses = [addresses]
+        addresses = list(dict.fromkeys(addresses))
+        keys = {address: (chain, address.lower()) for address in addresses}
+
+        now = time.time()
+        if self.backend:
+            expired = [key for key in keys.values() if key not in self._entries or now - self._entries[key][1] >= self.ttl]
+            if expired:
+                stored = await asyncio.get_running_loop().run_in_executor(None, self.backend.get_many, expired)
+                for key, entry in stored.items():
+                    current = self._entries.get(key)
+                    if current is None or entry[1] > current[1]:
+                        self._entries[key] = entry
+            now = time.time()
+        prices, missing, stale = {}, [], []
+        for address, key in keys.items():
+            entry = self._entries.get(key)
+            age = now - entry[1] if entry else None
+            if entry is None or age >= self.ttl + self.stale_ttl:
+                missing.append(address)
+                continue
+            if age < self.ttl:
+                self.stats["hits"] += 1
+            else:
+                self.stats["stale_hits"] += 1
+                if key not in self._refreshing:
+                    stale.append(address)
+            if entry[0] is not None:
+                prices[address] = entry[0]
+
+        if stale:
+            self._revalidate_in_background(stale, chain)
+        if missing:
+            self.stats["misses"] += len(missing)
+            prices.update(await self._fetch_coalesced(missing, chain))
+        return prices
+
+    def get_prices_sync(self, addresses, chain: str) -> dict:
+        """Blocking variant, run on the client's background loop."""
+        return asyncio.run_coroutine_threadsafe(
+            self.get_prices(addresses, chain), self.client._background_loop()
+        ).result()
+
+    def invalidate(self, chain: str = None):
+        """Drops cached entries, for one chain or all of them (memory only)."""
+        if chain is None:
+            self._entries.clear()
+        else:
+            for key in [k for k in self._entries if k[0] == chain]:
+                del self._entries[key]
+
+    async def _fetch_coalesced(self, addresses: list, chain: str) -> dict:
+        loop = asyncio.get_running_loop()
+        inflight = self._inflight
+        waiting, to_fetch = {}, []
+        for address in addresses:
+            key = (chain, address.lower())
+            future = inflight.get(key)
+            if future is None:
+                future = inflight[key] = loop.create_future()
+                to_fetch.append(address)
+            waiting[address] = future
+
+        if to_fetch:
+            if self.batch_window is None:
+                await self._fetch(to_fetch, chain, inflight)
+            else:
+                self._enqueue(to_fetch, chain, inflight)
+
+        prices = {}
+        for address, future in waiting.items():
+            # Shielded: a caller being cancelled must not cancel a future other callers share
+            price = await asyncio.shield(future)
+            if price is not None:
+                prices[address] = price
+        return prices
+
+    def _enqueue(self, addresses: list, chain: str, inflight: dict):
+        loop = asyncio.get_running_loop()
+        queued = self._queued
+        if chain not in queued:
+            queued[chain] = []
+            task = loop.create_task(self._fetch_queued(chain, inflight, queued))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+        queued[chain].extend(addresses)
+
+    async def _fetch_queued(self, chain: str, inflight: dict, queued: dict):
+        try:
+            await asyncio.sleep(self.batch_window)
+        except BaseException as e:
+            self._fail(queued.pop(chain), chain, inflight, e)
+            raise
+        try:
+            await self._fetch(queued.pop(chain), chain, inflight)
+        except Exception:
+            pass  # every waiting caller gets the error from its future
+
+    def _fail(self, addresses: list, chain: str, inflight: dict, error: BaseException):
+        # Resolves every future, also when the fetching task is cancelled (e.g. a stream
+        # shutting down), so callers coalesced onto it fail instead of waiting forever
+        if not isinstance(error, Exception):
+            error = Exception(f"Price fetch for {chain} was cancelled")
+        for address in addresses:
+            future = inflight.pop((chain, address.lower()))
+            future.set_exception(error)
+            future.exception()  # mark retrieved; the caller that fetched re-raises
+
+    async def _fetch(self, addresses: list, chain: str, inflight: dict):
+        keys = [(chain, address.lower()) for address in addresses]
+        try:
+            self.stats["upstream_requests"] += 1
+            fetched = await self.client.get_prices(addresses, chain)
+        except BaseException as e:
+            self._fail(addresses, chain, inflight, e)
+            raise
+
+        now = time.time()
+        entries = {}
+        for address, key in zip(addresses, keys):
+            entries[key] = (fetched.get(address), now)
+            inflight.pop(key).set_result(entries[key][0])
+        self._entries.update(entries)
+        if self.backend:
+            self.backend.put_many(entries)
+
+    def _revalidate_in_background(self, addresses: list, chain: str):
+        keys = {(chain, address.lower()) for address in addresses}
+        self._refreshing.update(keys)
+
+        async def revalidate():
+            try:
+                await self._fetch_coalesced(addresses, chain)
+            except Exception:
+                pass  # keep serving the stale entries; the next call retries
+            finally:
+                self._refreshing.difference_update(keys)
+
+        task = asyncio.get_running_loop().create_task(revalidate())
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
@@ -0,0 +1,393 @@
+import math
+import time
+import asyncio
+import threading
+
+import aiohttp
+
+DEXSCREENER_API = "https://api.dexscreener.com/latest/dex/tokens"
+GECKOTERMINAL_API = "https://api.geckoterminal.com/api/v2/simple/networks"
+
+# Largest number of comma-separated addresses DexScreener accepts per request
+DEXSCREENER_MAX_BATCH = 30
+GECKOTERMINAL_MAX_BATCH = 30
+
+# Our chain names -> DexScreener chainId
+DEXSCREENER_CHAIN_IDS = {
+    "eth": "ethereum",
+    "ethereum": "ethereum",
+    "base": "base",
+}
+
+# Our chain names -> GeckoTerminal network id
+GECKOTERMINAL_NETWORKS = {
+    "eth": "eth",
+    "ethereum": "eth",
+    "base": "base",
+}
+
+
+class RetryableStatus(Exception):
+    pass
+
+
+class _LoopState:
+    """The session and concurrency limit, bound to the source's background loop."""
+    def __init__(self, max_concurrency: int):
+        connector = aiohttp.TCPConnector(limit=max_concurrency, keepalive_timeout=30, ttl_dns_cache=300)
+        self.session = aiohttp.ClientSession(connector=connector, headers={"Accept": "application/json"})
+        self.semaphore = asyncio.Semaphore(max_concurrency)
+
+
+def _run_until_stopped(loop):
+    loop.run_forever()
+    loop.close()
+
+
+class PriceSource:
+    """
+    Base class for anything that prices tokens: subclasses implement the async
+    get_prices(addresses, chain) -> {address: price_usd} and aclose(). Sync
+    callers use get_prices_sync(), which runs on a private background loop so
+    sessions are reused across calls; async callers on other loops (e.g. one
+    asyncio.run() per Streamlit rerun) hop onto the same loop, so no session is
+    left behind on a loop that has since closed.
+    """
+    name = "source"
+
+    def __init__(self):
+        self._sync_loop = None
+        self._sync_lock = threading.Lock()
+
+    async def get_prices(self, addresses, chain: str = None) -> dict:
+        raise NotImplementedError
+
+    async def aclose(self):
+        pass
+
+    def get_prices_sync(self, addresses, chain: str = None) -> dict:
+        """Blocking variant of get_prices() for synchronous callers."""
+        return asyncio.run_coroutine_threadsafe(self.get_prices(addresses, chain), self._background_loop()).result()
+
+    def close(self):
+        """Closes the session and stops the background loop."""
+        with self._sync_lock:
+            loop = self._sync_loop
+        if loop:
+            asyncio.run_coroutine_threadsafe(self.aclose(), loop).result()
+            with self._sync_lock:
+                self._sync_loop = None
+            loop.call_soon_threadsafe(loop.stop)
+
+    def _background_loop(self):
+        with self._sync_lock:
+            if self._sync_loop is None:
+                self._sync_loop = asyncio.new_event_loop()
+                threading.Thread(target=_run_until_stopped, args=(self._sync_loop,), daemon=True,
+                                 name=f"{self.name}-prices").start()
+            return self._sync_loop
+
+    async def _on_background_loop(self, coro):
+        """Awaits `coro` on the background loop, from whichever loop the caller runs."""
+        loop = self._background_loop()
+        if asyncio.get_running_loop() is loop:
+            return await coro
+        return await asyncio.wrap_future(asyncio.run_coroutine_threadsafe(coro, loop))
+
+
+class HTTPPriceSource(PriceSource):
+    """
+    A JSON price API queried in batches of `batch_size` addresses through one
+    pooled keep-alive session on the background loop, with a per-request timeout and
+    retries (exponential backoff) on timeouts, connection errors, 429 and 5xx.
+    Subclasses provide _url() and _parse().
+    """
+    max_batch = 30
+
+    def __init__(self, base_url: str, batch_size: int = None, max_concurrency: int = 4,
+                 timeout: float = 10.0, retries: int = 2, backoff: float = 0.5):
+        super().__init__()
+        self.base_url = base_url
+        self.batch_size = min(batch_size or self.max_batch, self.max_batch)
+        self.max_concurrency = max_concurrency
+        self.timeout = aiohttp.ClientTimeout(total=timeout)
+        self.retries = retries
+        self.backoff = backoff
+        self._loop_state = None
+
+    async def get_prices(self, addresses, chain: str = None) -> dict:
+        """
+        Returns {address: price_usd} for the given token address(es) on `chain`.
+        Addresses keep the casing they were requested with; unpriced tokens are omitted.
+        """
+        return await self._on_background_loop(self._get_prices(addresses, chain))
+
+    async def _get_prices(self, addresses, chain: str) -> dict:
+        if isinstance(addresses, str):
+            addresses = [addresses]
+        addresses = list(dict.fromkeys(addresses))
+        if not addresses:
+            return {}
+        if self._loop_state is None:
+            self._loop_state = _LoopState(self.max_concurrency)
+        state = self._loop_state
+        batches = await asyncio.gather(*(
+            self._fetch_batch(state, addresses[i : i + self.batch_size], chain)
+            for i in range(0, len(addresses), self.batch_size)
+        ))
+        prices = {}
+        for batch in batches:
+            prices.update(batch)
+        return prices
+
+    async def aclose(self):
+        """Closes the pooled session; the next request opens a new one."""
+        state, self._loop_state = self._loop_state, None
+        if state:
+            await self._on_background_loop(state.session.close())
+
+    def _url(self, addresses: list, chain: str) -> str:
+        raise NotImplementedError
+
+    def _parse(self, data: dict, addresses: list, chain: str) -> dict:
+        raise NotImplementedError
+
+    async def _fetch_batch(self, state: _LoopState, addresses: list, chain: str) -> dict:
+        url = self._url(addresses, chain)
+        for attempt in range(self.retries + 1):
+            try:
+                async with state.semaphore:
+                    async with state.session.get(url, timeout=self.timeout) as response:
+                        if response.status == 429 or response.status >= 500:
+                            raise RetryableStatus(f"{self.name} returned HTTP {response.status}")
+                        response.raise_for_status()
+                        data = await response.json(content_type=None)
+                return self._parse(data, addresses, chain)
+            except (aiohttp.ClientConnectionError, asyncio.TimeoutError, RetryableStatus):
+                if attempt == self.retries:
+                    raise
+                await asyncio.sleep(self.backoff * 2**attempt)
+
+
+class DexScreenerClient(HTTPPriceSource):
+    """DexScreener /latest/dex/tokens: prices from each token's deepest pair on the chain."""
+    name = "dexscreener"
+    max_batch = DEXSCREENER_MAX_BATCH
+
+    def __init__(self, base_url: str = DEXSCREENER_API, batch_size: int = DEXSCREENER_MAX_BATCH, **kwargs):
+        super().__init__(base_url, batch_size, **kwargs)
+
+    def _url(self, addresses: list, chain: str) -> str:
+        return f"{self.base_url}/{','.join(addresses)}"
+
+    def _parse(self, data: dict, addresses: list, chain: str) -> dict:
+        chain_id = DEXSCREENER_CHAIN_IDS.get(chain.lower(), chain.lower()) if chain else None
+        return self._parse_pairs(data, addresses, chain_id)
+
+    @staticmethod
+    def _parse_pairs(data: dict, addresses: list, chain_id: str) -> dict:
+        # A token trades in many pairs; take the price from its deepest pair on the chain
+        wanted = {a.lower(): a for a in addresses}
+        best = {}
+        for pair in data.get("pairs") or []:
+            if chain_id and pair.get("chainId", chain_id) != chain_id:
+                continue
+            address = (pair.get("baseToken") or {}).get("address", "").lower()
+            if address not in wanted or "priceUsd" not in pair:
+                continue
+            liquidity = float((pair.get("liquidity") or {}).get("usd") or 0)
+            if address not in best or liquidity > best[address][0]:
+                best[address] = (liquidity, float(pair["priceUsd"]))
+        return {wanted[a]: price for a, (_, price) in best.items()}
+
+
+class GeckoTerminalClient(HTTPPriceSource):
+    """GeckoTerminal /simple/networks/<network>/token_price: one USD price per token."""
+    name = "geckoterminal"
+    max_batch = GECKOTERMINAL_MAX_BATCH
+
+    def __init__(self, base_url: str = GECKOTERMINAL_API, batch_size: int = GECKOTERMINAL_MAX_BATCH, **kwargs):
+        super().__init__(base_url, batch_size, **kwargs)
+
+    async def get_prices(self, addresses, chain: str = None) -> dict:
+        if not chain:
+            return {}       # prices are per network; there is no cross-chain lookup
+        return await super().get_prices(addresses, chain)
+
+    def _url(self, addresses: list, chain: str) -> str:
+        network = GECKOTERMINAL_NETWORKS.get(chain.lower(), chain.lower())
+        return f"{self.base_url}/{network}/token_price/{','.join(addresses)}"
+
+    def _parse(self, data: dict, addresses: list, chain: str) -> dict:
+        token_prices = ((data.get("data") or {}).get("attributes") or {}).get("token_prices") or {}
+        token_prices = {address.lower(): price for address, price in token_prices.items()}
+        prices = {}
+        for address in addresses:
+            price = token_prices.get(address.lower())
+            if price is not None:
+                prices[address] = float(price)
+        return prices
+
+
+class LatencyHistogram:
+    """
+    Request latencies in log-spaced buckets (1 ms to ~65 s, 8 per doubling), so
+    percentiles are cheap to read and memory stays constant.
+    """
+    BUCKETS_PER_DOUBLING = 8
+    MIN_LATENCY = 0.001
+    BUCKETS = 16 * BUCKETS_PER_DOUBLING
+
+    def __init__(self):
+        self.counts = [0] * (self.BUCKETS + 1)
+        self.count = 0
+        self.total = 0.0
+
+    def _bucket(self, seconds: float) -> int:
+        if seconds <= self.MIN_LATENCY:
+            return 0
+        return min(self.BUCKETS, int(math.log2(seconds / self.MIN_LATENCY) * self.BUCKETS_PER_DOUBLING) + 1)
+
+    def _upper(self, bucket: int) -> float:
+        return self.MIN_LATENCY * 2 ** (bucket / self.BUCKETS_PER_DOUBLING)
+
+    def record(self, seconds: float):
+        self.counts[self._bucket(seconds)] += 1
+        self.count += 1
+        self.total += seconds
+
+    def quantile(self, q: float) -> float:
+        """Upper bound of the bucket holding the q-th quantile (None if nothing was recorded)."""
+        if not self.count:
+            return None
+        rank = q * self.count
+        seen = 0
+        for bucket, count in enumerate(self.counts):
+            seen += count
+            if seen >= rank:
+                return self._upper(bucket)
+        return self._upper(self.BUCKETS)
+
+    def summary(self) -> dict:
+        if not self.count:
+            return {"count": 0}
+        return {
+            "count": self.count,
+            "mean_ms": self.total / self.count * 1e3,
+            **{f"p{int(q * 100)}_ms": self.quantile(q) * 1e3 for q in (0.5, 0.9, 0.99)},
+        }
+
+
+class HedgedPriceClient(PriceSource):
+    """
+    Queries several price sources for tail-latency control.
+
+    The first source is asked first. If it has not answered after its own
+    `hedge_quantile` latency (from its histogram; `initial_hedge_delay` until
+    `min_samples` requests have been seen), the next source is asked as well.
+    The first successful answer wins and the others are cancelled. A source
+    that fails, or leaves tokens unpriced, hands the remaining tokens to the
+    next one straight away.
+    """
+    name = "hedged"
+
+    def __init__(self, sources: list, hedge_quantile: float = 0.95, initial_hedge_delay: float = 0.5,
+                 min_hedge_delay: float = 0.01, min_samples: int = 20):
+        super().__init__()
+        self.sources = list(sources)
+        self.hedge_quantile = hedge_quantile
+        self.initial_hedge_delay = initial_hedge_delay
+        self.min_hedge_delay = min_hedge_delay
+        self.min_samples = min_samples
+        self.latency = {source.name: LatencyHistogram() for source in self.sources}
+        self.stats = {source.name: {"requests": 0, "failures": 0, "cancelled": 0, "answered": 0}
+                      for source in self.sources}
+        self.stats["hedged"] = 0
+
+    def hedge_delay(self, source) -> float:
+        histogram = self.latency[source.name]
+        if histogram.count < self.min_samples:
+            return self.initial_hedge_delay
+        return max(self.min_hedge_delay, histogram.quantile(self.hedge_quantile))
+
+    async def _timed(self, source, addresses: list, chain: str) -> dict:
+        self.stats[source.name]["requests"] += 1
+        start = time.perf_counter()
+        try:
+            prices = await source.get_prices(addresses, chain)
+        except asyncio.CancelledError:
+            self.stats[source.name]["cancelled"] += 1
+            raise
+        except Exception:
+            self.stats[source.name]["failures"] += 1
+            raise
+        self.latency[source.name].record(time.perf_counter() - start)
+        return prices
+
+    async def get_prices(self, addresses, chain: str = None) -> dict:
+        if isinstance(addresses, str):
+            addresses = [addresses]
+        remaining = list(dict.fromkeys(addresses))
+        prices = {}
+        if not remaining:
+            return prices
+
+        queue = iter(self.sources)
+        pending = {}        # task -> source
+        errors = []
+
+        def launch():
+            source = next(queue, None)
+            if source is not None:
+                task = asyncio.ensure_future(self._timed(source, remaining, chain))
+                pending[task] = source
+            return source
+
+        last = launch()
+        try:
+            while remaining and pending:
+                done, _ = await asyncio.wait(
+                    pending, timeout=self.hedge_delay(last), return_when=asyncio.FIRST_COMPLETED
+                )
+                if not done:
+                    # The slowest outstanding request is past its usual latency: hedge
+                    nxt = launch()
+                    if nxt is not None:
+                        self.stats["hedged"] += 1
+                        last = nxt
+                    else:
+                        await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                    continue
+
+                for task in done:
+                    source = pending.pop(task)
+                    if task.exception() is not None:
+                        errors.append(task.exception())
+                        continue
+                    answered = {a: p for a, p in task.result().items() if a in remaining}
+                    if answered:
+                        self.stats[source.name]["answered"] += len(answered)
+                    prices.update(answered)
+                    remaining = [a for a in remaining if a not in answered]
+
+                if remaining and not pending:
+                    # Failure or gaps: the next source gets what is still unpriced
+                    last = launch() or last
+        finally:
+            for task in pending:
+                task.cancel()
+
+        if not prices and errors:
+            raise errors[-1]
+        return prices
+
+    async def aclose(self):
+        for source in self.sources:
+            await source.aclose()
+
+    def summary(self) -> dict:
+        """Per-source request counts and latency percentiles."""
+        return {
+            source.name: {**self.stats[source.name], **self.latency[source.name].summary()}
+            for source in self.sources
+        }
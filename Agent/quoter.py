@@ -0,0 +1,472 @@
+import math
+import time
+import threading
+
+import numpy as np
+from web3 import Web3
+
+from fees import BLOCK_TIMES, DEFAULT_BLOCK_TIME
+from multicall import block_number_call, multicall, read_call
+
+Q96 = 1 << 96
+MIN_TICK, MAX_TICK = -887272, 887272
+MIN_SQRT_RATIO = 4295128739
+MAX_SQRT_RATIO = 1461446703485210103287273052203988822378723970342
+FEE_DENOMINATOR = 1_000_000
+UINT256_MAX = (1 << 256) - 1
+
+UNISWAP_V3_FACTORY = {
+    "ETH": "0x1F98431c8aD98523631AE4a59f267346ea31F984",
+    "BASE": "0x33128a8fC17869897dcE68Ed026d694621f6FDfD",
+}
+POOL_INIT_CODE_HASH = bytes.fromhex("e34f199b19b2b4f47f68442619d555527d244f78a3297ea89325f843f87b8b54")
+
+POOL_ABI = [
+    {"inputs": [], "name": "slot0", "stateMutability": "view", "type": "function", "outputs": [
+        {"name": "sqrtPriceX96", "type": "uint160"}, {"name": "tick", "type": "int24"},
+        {"name": "observationIndex", "type": "uint16"}, {"name": "observationCardinality", "type": "uint16"},
+        {"name": "observationCardinalityNext", "type": "uint16"}, {"name": "feeProtocol", "type": "uint8"},
+        {"name": "unlocked", "type": "bool"}]},
+    {"inputs": [], "name": "liquidity", "outputs": [{"name": "", "type": "uint128"}], "stateMutability": "view", "type": "function"},
+    {"inputs": [], "name": "fee", "outputs": [{"name": "", "type": "uint24"}], "stateMutability": "view", "type": "function"},
+    {"inputs": [], "name": "tickSpacing", "outputs": [{"name": "", "type": "int24"}], "stateMutability": "view", "type": "function"},
+    {"inputs": [], "name": "token0", "outputs": [{"name": "", "type": "address"}], "stateMutability": "view", "type": "function"},
+    {"inputs": [], "name": "token1", "outputs": [{"name": "", "type": "address"}], "stateMutability": "view", "type": "function"},
+    {"inputs": [{"name": "wordPosition", "type": "int16"}], "name": "tickBitmap",
+     "outputs": [{"name": "", "type": "uint256"}], "stateMutability": "view", "type": "function"},
+    {"inputs": [{"name": "tick", "type": "int24"}], "name": "ticks", "stateMutability": "view", "type": "function", "outputs": [
+        {"name": "liquidityGross", "type": "uint128"}, {"name": "liquidityNet", "type": "int128"},
+        {"name": "feeGrowthOutside0X128", "type": "uint256"}, {"name": "feeGrowthOutside1X128", "type": "uint256"},
+        {"name": "tickCumulativeOutside", "type": "int56"}, {"name": "secondsPerLiquidityOutsideX128", "type": "uint160"},
+        {"name": "secondsOutside", "type": "uint32"}, {"name": "initialized", "type": "bool"}]},
+]
+_POOL_FUNCTIONS = {entry["name"]: entry for entry in POOL_ABI}
+
+
+# Fee tiers (hundredths of a bip) the V3 factories have enabled
+FEE_TIERS = (100, 500, 3000, 10000)
+
+
+def pool_fee(chain: str, token_a: str, token_b: str, pool: str):
+    """The fee tier of `pool`, recognized by its address (no RPC); None if it is not a standard-tier V3 pool."""
+    for fee in FEE_TIERS:
+        if pool_address(chain, token_a, token_b, fee).lower() == pool.lower():
+            return fee
+    return None
+
+
+def pool_address(chain: str, token_a: str, token_b: str, fee: int) -> str:
+    """The V3 pool for a token pair and fee tier, derived offline (CREATE2) like the periphery's PoolAddress."""
+    token0, token1 = sorted((Web3.to_checksum_address(token_a), Web3.to_checksum_address(token_b)), key=str.lower)
+    salt = Web3.keccak(bytes.fromhex(token0[2:]).rjust(32, b"\0") + bytes.fromhex(token1[2:]).rjust(32, b"\0")
+                       + fee.to_bytes(32, "big"))
+    factory = bytes.fromhex(UNISWAP_V3_FACTORY[chain][2:])
+    return Web3.to_checksum_address(Web3.keccak(b"\xff" + factory + salt + POOL_INIT_CODE_HASH)[12:])
+
+
+# --- Exact integer ports of v3-core's TickMath, SqrtPriceMath and SwapMath ---
+
+_TICK_RATIOS = (
+    (0x2, 0xfff97272373d413259a46990580e213a), (0x4, 0xfff2e50f5f656932ef12357cf3c7fdcc),
+    (0x8, 0xffe5caca7e10e4e61c3624eaa0941cd0), (0x10, 0xffcb9843d60f6159c9db58835c926644),
+    (0x20, 0xff973b41fa98c081472e6896dfb254c0), (0x40, 0xff2ea16466c96a3843ec78b326b52861),
+    (0x80, 0xfe5dee046a99a2a811c461f1969c3053), (0x100, 0xfcbe86c7900a88aedcffc83b479aa3a4),
+    (0x200, 0xf987a7253ac413176f2b074cf7815e54), (0x400, 0xf3392b0822b70005940c7a398e4b70f3),
+    (0x800, 0xe7159475a2c29b7443b29c7fa6e889d9), (0x1000, 0xd097f3bdfd2022b8845ad8f792aa5825),
+    (0x2000, 0xa9f746462d870fdf8a65dc1f90e061e5), (0x4000, 0x70d869a156d2a1b890bb3df62baf32f7),
+    (0x8000, 0x31be135f97d08fd981231505542fcfa6), (0x10000, 0x9aa508b5b7a84e1c677de54f3e99bc9),
+    (0x20000, 0x5d6af8dedb81196699c329225ee604), (0x40000, 0x2216e584f5fa1ea926041bedfe98),
+    (0x80000, 0x48a170391f7dc42444e8fa2),
+)
+
+
+def get_sqrt_ratio_at_tick(tick: int) -> int:
+    abs_tick = abs(tick)
+    if abs_tick > MAX_TICK:
+        raise ValueError(f"Tick {tick} out of range")
+    ratio = 0xfffcb933bd6fad37aa2d162d1a594001 if abs_tick & 0x1 else 1 << 128
+    for bit, factor in _TICK_RATIOS:
+        if abs_tick & bit:
+            ratio = (ratio * factor) >> 128
+    if tick > 0:
+        ratio = UINT256_MAX // ratio
+    return (ratio >> 32) + (1 if ratio & 0xffffffff else 0)
+
+
+def get_tick_at_sqrt_ratio(sqrt_price_x96: int) -> int:
+    """The greatest tick whose sqrt ratio is <= sqrt_price_x96."""
+    if not MIN_SQRT_RATIO <= sqrt_price_x96 < MAX_SQRT_RATIO:
+        raise ValueError("sqrt price out of range")
+    tick = math.floor(2 * math.log(sqrt_price_x96 / Q96) / math.log(1.0001))
+    tick = max(MIN_TICK, min(MAX_TICK, tick))
+    # The float estimate is off by at most one either way
+    while tick > MIN_TICK and get_sqrt_ratio_at_tick(tick) > sqrt_price_x96:
+        tick -= 1
+    while tick < MAX_TICK and get_sqrt_ratio_at_tick(tick + 1) <= sqrt_price_x96:
+        tick += 1
+    return tick
+
+
+def _mul_div_rounding_up(a: int, b: int, denominator: int) -> int:
+    return -(-a * b // denominator)
+
+
+def _next_sqrt_price_from_amount0(sqrt_price: int, liquidity: int, amount: int, add: bool) -> int:
+    if amount == 0:
+        return sqrt_price
+    numerator1 = liquidity << 96
+    product = amount * sqrt_price
+    if add:
+        if product <= UINT256_MAX and numerator1 + product <= UINT256_MAX:
+            return _mul_div_rounding_up(numerator1, sqrt_price, numerator1 + product)
+        return -(-numerator1 // (numerator1 // sqrt_price + amount))
+    if product > UINT256_MAX or numerator1 <= product:
+        raise ValueError("Not enough liquidity for the output amount")
+    return _mul_div_rounding_up(numerator1, sqrt_price, numerator1 - product)
+
+
+def _next_sqrt_price_from_amount1(sqrt_price: int, liquidity: int, amount: int, add: bool) -> int:
+    if add:
+        return sqrt_price + (amount << 96) // liquidity
+    quotient = -(-(amount << 96) // liquidity)
+    if sqrt_price <= quotient:
+        raise ValueError("Not enough liquidity for the output amount")
+    return sqrt_price - quotient
+
+
+def get_amount0_delta(sqrt_a: int, sqrt_b: int, liquidity: int, round_up: bool) -> int:
+    if sqrt_a > sqrt_b:
+        sqrt_a, sqrt_b = sqrt_b, sqrt_a
+    numerator1, numerator2 = liquidity << 96, sqrt_b - sqrt_a
+    if round_up:
+        return -(-_mul_div_rounding_up(numerator1, numerator2, sqrt_b) // sqrt_a)
+    return numerator1 * numerator2 // sqrt_b // sqrt_a
+
+
+def get_amount1_delta(sqrt_a: int, sqrt_b: int, liquidity: int, round_up: bool) -> int:
+    if sqrt_a > sqrt_b:
+        sqrt_a, sqrt_b = sqrt_b, sqrt_a
+    if round_up:
+        return _mul_div_rounding_up(liquidity, sqrt_b - sqrt_a, Q96)
+    return liquidity * (sqrt_b - sqrt_a) // Q96
+
+
+def compute_swap_step(sqrt_current: int, sqrt_target: int, liquidity: int, amount_remaining: int, fee: int) -> tuple:
+    """One swap step within a tick range: (next sqrt price, amount in, amount out, fee amount)."""
+    zero_for_one = sqrt_current >= sqrt_target
+    exact_in = amount_remaining >= 0
+    if exact_in:
+        remaining_less_fee = amount_remaining * (FEE_DENOMINATOR - fee) // FEE_DENOMINATOR
+        amount_in = (get_amount0_delta(sqrt_target, sqrt_current, liquidity, True) if zero_for_one
+                     else get_amount1_delta(sqrt_current, sqrt_target, liquidity, True))
+        if remaining_less_fee >= amount_in:
+            sqrt_next = sqrt_target
+        elif zero_for_one:
+            sqrt_next = _next_sqrt_price_from_amount0(sqrt_current, liquidity, remaining_less_fee, True)
+        else:
+            sqrt_next = _next_sqrt_price_from_amount1(sqrt_current, liquidity, remaining_less_fee, True)
+    else:
+        amount_out = (get_amount1_delta(sqrt_target, sqrt_current, liquidity, False) if zero_for_one
+                      else get_amount0_delta(sqrt_current, sqrt_target, liquidity, False))
+        if -amount_remaining >= amount_out:
+            sqrt_next = sqrt_target
+        elif zero_for_one:
+            sqrt_next = _next_sqrt_price_from_amount1(sqrt_current, liquidity, -amount_remaining, False)
+        else:
+            sqrt_next = _next_sqrt_price_from_amount0(sqrt_current, liquidity, -amount_remaining, False)
+
+    reached = sqrt_next == sqrt_target
+    if zero_for_one:
+        if not (reached and exact_in):
+            amount_in = get_amount0_delta(sqrt_next, sqrt_current, liquidity, True)
+        if not (reached and not exact_in):
+            amount_out = get_amount1_delta(sqrt_next, sqrt_current, liquidity, False)
+    else:
+        if not (reached and exact_in):
+            amount_in = get_amount1_delta(sqrt_current, sqrt_next, liquidity, True)
+        if not (reached and not exact_in):
+            amount_out = get_amount0_delta(sqrt_current, sqrt_next, liquidity, False)
+    if not exact_in and amount_out > -amount_remaining:
+        amount_out = -amount_remaining
+    if exact_in and sqrt_next != sqrt_target:
+        fee_amount = amount_remaining - amount_in
+    else:
+        fee_amount = _mul_div_rounding_up(amount_in, fee, FEE_DENOMINATOR - fee)
+    return sqrt_next, amount_in, amount_out, fee_amount
+
+
+class PoolState:
+    """
+    A V3 pool as of one block: price, active liquidity and the initialized
+    ticks (with their liquidityNet) inside the bitmap words that were loaded.
+    Swaps are simulated exactly like UniswapV3Pool.swap within that range;
+    a swap that would leave it is reported as incomplete.
+    """
+    def __init__(self, address: str, token0: str, token1: str, fee: int, tick_spacing: int,
+                 sqrt_price_x96: int, tick: int, liquidity: int, ticks: dict, word_range: tuple, block: int = None):
+        self.address = address
+        self.token0, self.token1 = token0, token1
+        self.fee = fee
+        self.tick_spacing = tick_spacing
+        self.sqrt_price_x96 = sqrt_price_x96
+        self.tick = tick
+        self.liquidity = liquidity
+        self.block = block
+        self.liquidity_net = dict(ticks)
+        self.initialized = np.array(sorted(ticks), dtype=np.int64)
+        # Ticks outside the loaded words are unknown
+        self.min_tick = max(MIN_TICK, word_range[0] * 256 * tick_spacing)
+        self.max_tick = min(MAX_TICK, (word_range[1] + 1) * 256 * tick_spacing - 1)
+        self._segments = {}
+
+    def zero_for_one(self, token_in: str) -> bool:
+        return token_in.lower() == self.token0.lower()
+
+    def _next_tick(self, tick: int, lte: bool) -> tuple:
+        # TickBitmap.nextInitializedTickWithinOneWord on the sorted initialized ticks
+        spacing = self.tick_spacing
+        compressed = tick // spacing
+        if lte:
+            word_start = (compressed >> 8) << 8
+            i = np.searchsorted(self.initialized, compressed * spacing, side="right") - 1
+            if i >= 0 and self.initialized[i] >= word_start * spacing:
+                return int(self.initialized[i]), True
+            return word_start * spacing, False
+        compressed += 1
+        word_end = ((compressed >> 8) << 8) + 255
+        i = np.searchsorted(self.initialized, compressed * spacing, side="left")
+        if i < len(self.initialized) and self.initialized[i] <= word_end * spacing:
+            return int(self.initialized[i]), True
+        return word_end * spacing, False
+
+    def _steps(self, zero_for_one: bool, amount_specified: int):
+        """Yields the state after each swap step: (sqrt price, tick, liquidity, in, out, fee, within range)."""
+        sqrt_price, tick, liquidity = self.sqrt_price_x96, self.tick, self.liquidity
+        limit = MIN_SQRT_RATIO + 1 if zero_for_one else MAX_SQRT_RATIO - 1
+        remaining = amount_specified
+        while remaining != 0 and sqrt_price != limit:
+            tick_next, initialized = self._next_tick(tick, zero_for_one)
+            if not self.min_tick <= tick_next <= self.max_tick:
+                yield sqrt_price, tick, liquidity, 0, 0, 0, False
+                return
+            sqrt_next_tick = get_sqrt_ratio_at_tick(tick_next)
+            target = (limit if (sqrt_next_tick < limit if zero_for_one else sqrt_next_tick > limit)
+                      else sqrt_next_tick)
+            start = sqrt_price
+            sqrt_price, amount_in, amount_out, fee_amount = compute_swap_step(
+                sqrt_price, target, liquidity, remaining, self.fee
+            )
+            if remaining > 0:
+                remaining -= amount_in + fee_amount
+            else:
+                remaining += amount_out
+            if sqrt_price == sqrt_next_tick:
+                if initialized:
+                    net = self.liquidity_net[tick_next]
+                    liquidity += -net if zero_for_one else net
+                tick = tick_next - 1 if zero_for_one else tick_next
+            elif sqrt_price != start:
+                tick = get_tick_at_sqrt_ratio(sqrt_price)
+            yield sqrt_price, tick, liquidity, amount_in, amount_out, fee_amount, True
+
+    def simulate(self, token_in: str, amount: int, exact_input: bool = True) -> dict:
+        """
+        Exact result of swapping `amount` in (or out, with exact_input=False):
+        amount_in (fees included), amount_out, the final price and tick, and
+        whether the swap completed inside the loaded ticks.
+        """
+        zero_for_one = self.zero_for_one(token_in)
+        amount_in = amount_out = 0
+        sqrt_price, tick, complete = self.sqrt_price_x96, self.tick, True
+        for sqrt_price, tick, _, step_in, step_out, step_fee, within in self._steps(
+                zero_for_one, amount if exact_input else -amount):
+            if not within:
+                complete = False
+                break
+            amount_in += step_in + step_fee
+            amount_out += step_out
+        complete = complete and (amount_in == amount if exact_input else amount_out == amount)
+        return {"amount_in": amount_in, "amount_out": amount_out, "sqrt_price_x96": sqrt_price,
+                "tick": tick, "complete": complete}
+
+    def segments(self, zero_for_one: bool) -> dict:
+        """
+        The swap curve in one direction as float arrays, one row per step between
+        boundary ticks: cumulative input (fees included) and output at the
+        start and end of the step, its starting sqrt price and its liquidity.
+        Built once per state with the exact step math; quotes interpolate it.
+        """
+        if zero_for_one not in self._segments:
+            rows = []
+            in_total = out_total = 0
+            sqrt_price, liquidity = self.sqrt_price_x96, self.liquidity
+            for next_price, _, next_liquidity, step_in, step_out, step_fee, within in self._steps(zero_for_one, UINT256_MAX >> 2):
+                if not within:
+                    break
+                rows.append((in_total, in_total + step_in + step_fee, out_total, out_total + step_out,
+                             sqrt_price / Q96, liquidity))
+                in_total += step_in + step_fee
+                out_total += step_out
+                sqrt_price, liquidity = next_price, next_liquidity
+            table = np.array(rows, dtype=np.float64).reshape(-1, 6)
+            self._segments[zero_for_one] = {
+                "in_start": table[:, 0], "in_end": table[:, 1], "out_start": table[:, 2], "out_end": table[:, 3],
+                "sqrt_price": table[:, 4], "liquidity": table[:, 5],
+            }
+        return self._segments[zero_for_one]
+
+
+def _quote_one(state: PoolState, zero_for_one: bool, amounts: np.ndarray, exact_input: bool) -> np.ndarray:
+    seg = state.segments(zero_for_one)
+    ends = seg["in_end"] if exact_input else seg["out_end"]
+    k = np.searchsorted(ends, amounts, side="left")
+    result = np.full(amounts.shape, np.nan)
+    ok = k < len(ends)
+    k = k[ok]
+    s0, L = seg["sqrt_price"][k], seg["liquidity"][k]
+    keep = 1 - state.fee / FEE_DENOMINATOR
+    with np.errstate(divide="ignore", invalid="ignore"):
+        if exact_input:
+            net = (amounts[ok] - seg["in_start"][k]) * keep
+            if zero_for_one:
+                s1 = 1 / (1 / s0 + net / L)
+                partial = L * (s0 - s1)
+            else:
+                s1 = s0 + net / L
+                partial = L * (1 / s0 - 1 / s1)
+            result[ok] = seg["out_start"][k] + np.where(L > 0, partial, 0.0)
+        else:
+            rest = amounts[ok] - seg["out_start"][k]
+            if zero_for_one:
+                s1 = s0 - rest / L
+                partial = L * (1 / s1 - 1 / s0)
+            else:
+                s1 = 1 / (1 / s0 - rest / L)
+                partial = L * (s1 - s0)
+            result[ok] = seg["in_start"][k] + np.where(L > 0, partial / keep, 0.0)
+    return result
+
+
+def quote_exact_input(states, tokens_in, amounts) -> np.ndarray:
+    """
+    Output amounts for swapping each of `amounts` into each pool in `states`
+    (with `tokens_in` one token per pool, or one for all). `amounts` is 1-D
+    (the same amounts for every pool) or (pools, amounts). Returns a
+    (pools, amounts) float array; NaN where the loaded ticks cannot fill the
+    swap. Uses only the cached states: no RPC.
+    """
+    return _quote(states, tokens_in, amounts, True)
+
+
+def quote_exact_output(states, tokens_in, amounts) -> np.ndarray:
+    """Input amounts (fees included) needed to receive each of `amounts`; see quote_exact_input()."""
+    return _quote(states, tokens_in, amounts, False)
+
+
+def _quote(states, tokens_in, amounts, exact_input: bool) -> np.ndarray:
+    amounts = np.asarray(amounts, dtype=np.float64)
+    if amounts.ndim == 1:
+        amounts = np.broadcast_to(amounts, (len(states), len(amounts)))
+    if isinstance(tokens_in, str):
+        tokens_in = [tokens_in] * len(states)
+    return np.stack([
+        _quote_one(state, state.zero_for_one(token_in), row, exact_input)
+        for state, token_in, row in zip(states, tokens_in, amounts)
+    ]) if len(states) else np.empty((0, amounts.shape[-1]))
+
+
+class PoolStateCache:
+    """
+    PoolStates per (chain, pool), reloaded at most once per block time
+    (BLOCK_TIMES). A load of any number of pools takes three multicall rounds:
+    price and liquidity (plus the block number and, for new pools, tokens,
+    fee and tick spacing), the tick bitmap words within `words` of the
+    current tick, then the initialized ticks in them.
+    """
+    def __init__(self, words: int = 4):
+        self.words = words
+        self.stats = {"hits": 0, "loads": 0, "batches": 0}
+        self._states = {}           # (chain, pool) -> (expires, PoolState)
+        self._static = {}           # (chain, pool) -> (token0, token1, fee, tick spacing)
+        self._lock = threading.Lock()
+
+    def get(self, chain: str, w3, pools) -> list:
+        """The state of each pool, or None where no pool could be read."""
+        pools = [Web3.to_checksum_address(pool) for pool in pools]
+        now = time.monotonic()
+        with self._lock:
+            cached = {pool: self._states.get((chain, pool)) for pool in pools}
+        stale = [pool for pool, entry in cached.items() if entry is None or now >= entry[0]]
+        self.stats["hits"] += len(pools) - len(stale)
+        if stale:
+            loaded = self._load(chain, w3, stale)
+            expires = time.monotonic() + BLOCK_TIMES.get(chain, DEFAULT_BLOCK_TIME)
+            with self._lock:
+                for pool in stale:
+                    cached[pool] = self._states[(chain, pool)] = (expires, loaded.get(pool))
+        return [cached[pool][1] for pool in pools]
+
+    def _read(self, w3, calls) -> list:
+        self.stats["batches"] += 1
+        return multicall(w3, calls)
+
+    def _load(self, chain: str, w3, pools) -> dict:
+        self.stats["loads"] += len(pools)
+        new = [pool for pool in pools if (chain, pool) not in self._static]
+        calls = [block_number_call()]
+        for pool in pools:
+            calls += [read_call(pool, _POOL_FUNCTIONS["slot0"]), read_call(pool, _POOL_FUNCTIONS["liquidity"])]
+        for pool in new:
+            calls += [read_call(pool, _POOL_FUNCTIONS[name]) for name in ("token0", "token1", "fee", "tickSpacing")]
+        results = self._read(w3, calls)
+        block, results = results[0], results[1:]
+        for i, pool in enumerate(new):
+            static = tuple(results[2 * len(pools) + 4 * i: 2 * len(pools) + 4 * i + 4])
+            if None not in static:
+                self._static[(chain, pool)] = static
+        state = {}
+        for i, pool in enumerate(pools):
+            slot0, liquidity = results[2 * i], results[2 * i + 1]
+            # No pool deployed there (or not a pool): leave it out
+            if slot0 is not None and liquidity is not None and (chain, pool) in self._static:
+                state[pool] = {"sqrt_price_x96": slot0[0], "tick": slot0[1], "liquidity": liquidity}
+        pools = list(state)
+
+        # Bitmap words around the current tick of each pool
+        words = {}
+        for pool in pools:
+            spacing = self._static[(chain, pool)][3]
+            center = (state[pool]["tick"] // spacing) >> 8
+            words[pool] = range(max(center - self.words, -(1 << 15)), min(center + self.words, (1 << 15) - 1) + 1)
+        bitmaps = self._read(w3, [read_call(pool, _POOL_FUNCTIONS["tickBitmap"], word)
+                                  for pool in pools for word in words[pool]])
+
+        initialized = {pool: [] for pool in pools}
+        i = 0
+        for pool in pools:
+            spacing = self._static[(chain, pool)][3]
+            for word in words[pool]:
+                bitmap = bitmaps[i] or 0
+                i += 1
+                while bitmap:
+                    bit = (bitmap & -bitmap).bit_length() - 1
+                    initialized[pool].append(((word << 8) + bit) * spacing)
+                    bitmap &= bitmap - 1
+        ticks = [(pool, tick) for pool in pools for tick in initialized[pool]]
+        infos = self._read(w3, [read_call(pool, _POOL_FUNCTIONS["ticks"], tick) for pool, tick in ticks]) if ticks else []
+        nets = {pool: {} for pool in pools}
+        for (pool, tick), info in zip(ticks, infos):
+            if info is None:
+                raise Exception(f"Could not read tick {tick} of pool {pool}")
+            nets[pool][tick] = info[1]
+
+        loaded = {}
+        for pool in pools:
+            token0, token1, fee, spacing = self._static[(chain, pool)]
+            loaded[pool] = PoolState(pool, token0, token1, fee, spacing, ticks=nets[pool],
+                                     word_range=(words[pool].start, words[pool].stop - 1), block=block, **state[pool])
+        return loaded
+
+
+# Shared by every helper in the process
+pool_state_cache = PoolStateCache()
@@ -0,0 +1,188 @@
+import time
+
+import numpy as np
+import pandas as pd
+
+from history import DAY
+
+# Wallet chain names -> chain names used in the pool graph
+GRAPH_CHAINS = {"ethereum": "eth"}
+
+# A position larger than this share of its token's pool TVL would move the price when exited
+ILLIQUID_SHARE = 0.02
+
+
+def pool_depth(graph) -> pd.Series:
+    """Summed pool TVL (USD) per (chain, token address), from the liquidity graph."""
+    chains, tokens, tvl = [], [], []
+    for _, data in graph.nodes(data=True):
+        if data.get("type") == "pool":
+            value = float(data.get("totalValueLockedUSD", 0))
+            for key in ("token0", "token1"):
+                chains.append(data["chain"])
+                tokens.append(data[key].lower())
+                tvl.append(value)
+    frame = pd.DataFrame({"chain": chains, "address": tokens, "tvl": tvl})
+    return frame.groupby(["chain", "address"])["tvl"].sum()
+
+
+def daily_returns(prices: pd.DataFrame, min_days: int = 2) -> pd.DataFrame:
+    """
+    Day-over-day returns per token from HistoryStore.price_matrix() (one row per
+    day with data). Returns across days with no data are dropped, so a move over
+    a multi-day gap is not counted as a 1-day return.
+    """
+    if len(prices) < min_days:
+        return pd.DataFrame()
+    values = prices.to_numpy()
+    with np.errstate(divide="ignore", invalid="ignore"):
+        returns = values[1:] / values[:-1] - 1
+    returns[~np.isfinite(returns)] = np.nan
+    one_day = np.asarray(prices.index[1:] - prices.index[:-1] == pd.Timedelta(seconds=DAY))
+    return pd.DataFrame(returns[one_day], index=prices.index[1:][one_day], columns=prices.columns)
+
+
+class RiskReport:
+    """
+    Portfolio risk metrics computed in one vectorized pass over a Portfolio:
+    concentration (HHI), per-chain exposure, liquidity depth of held tokens
+    against the pool graph, and historical VaR and correlations from the
+    recorded price history (HistoryStore.price_matrix() with daily buckets).
+    """
+    def __init__(self, portfolio, depth: pd.Series = None, prices: pd.DataFrame = None,
+                 var_level: float = 0.95, top: int = 5):
+        frame = portfolio.frame[(portfolio.frame["category"] != "misc") & ~portfolio.frame["spam"]]
+        frame = frame[frame["value_usd"] > 0]
+        values = frame["value_usd"].to_numpy()
+        total = values.sum()
+        self.total = float(total)
+        self.positions = int(len(frame))
+
+        # Concentration: HHI of value shares (1 = one asset, 1/n = n equal assets)
+        shares = values / total if total else values
+        self.hhi = float(np.square(shares).sum()) if total else 0.0
+        self.effective_assets = 1 / self.hhi if self.hhi else 0.0
+        order = np.argsort(-shares)
+        self.top_share = float(shares[order[:top]].sum()) if total else 0.0
+        symbols = frame["symbol"].to_numpy()
+        self.top_holdings = [(str(symbols[i]), float(shares[i])) for i in order[:top]]
+
+        self.chain_exposure = (
+            frame.groupby("chain", observed=True)["value_usd"].sum().div(total).sort_values(ascending=False).to_dict()
+            if total else {}
+        )
+
+        # Liquidity: each position as a share of the pool TVL its token trades in
+        self.illiquid = []
+        self.unlisted_share = None
+        if depth is not None and total:
+            chain = frame["chain"].astype(str).replace(GRAPH_CHAINS)
+            keys = pd.MultiIndex.from_arrays([chain, frame["address"].astype(str).str.lower()])
+            tvl = depth.reindex(keys).to_numpy()
+            listed = ~np.isnan(tvl)
+            self.unlisted_share = float(values[~listed].sum() / total)
+            with np.errstate(divide="ignore", invalid="ignore"):
+                pool_share = np.where(listed & (tvl > 0), values / tvl, np.inf)
+            flagged = np.flatnonzero(listed & (pool_share > ILLIQUID_SHARE))
+            flagged = flagged[np.argsort(-values[flagged])][:top]
+            self.illiquid = [(str(symbols[i]), float(pool_share[i]), float(tvl[i])) for i in flagged]
+
+        # Market risk: historical 1-day VaR of today's holdings replayed over past daily returns
+        self.var_level = var_level
+        self.var = self.var_share = None
+        self.history_days = 0
+        self.avg_correlation = None
+        self.correlated_pairs = []
+        returns = daily_returns(prices) if prices is not None else pd.DataFrame()
+        if not returns.empty and total:
+            tokens = frame["chain"].astype(str) + ":" + frame["address"].astype(str).str.lower()
+            exposure = pd.Series(values, index=tokens.to_numpy()).groupby(level=0).sum()
+            held = returns.columns.intersection(exposure.index)
+            matrix = returns[held].fillna(0.0).to_numpy()
+            self.history_days = int(len(matrix))
+            if len(held) and self.history_days >= 2:
+                pnl = matrix @ exposure[held].to_numpy()
+                self.var = float(max(0.0, -np.quantile(pnl, 1 - var_level)))
+                self.var_share = self.var / self.total
+
+                # Correlations between the largest holdings
+                biggest = exposure[held].nlargest(top).index
+                if len(biggest) >= 2:
+                    corr = returns[biggest].corr().to_numpy()
+                    upper = np.triu_indices(len(biggest), k=1)
+                    pairs = corr[upper]
+                    valid = ~np.isnan(pairs)
+                    if valid.any():
+                        self.avg_correlation = float(pairs[valid].mean())
+                        names = dict(zip(tokens.to_numpy(), symbols))
+                        ranked = np.argsort(-np.nan_to_num(pairs, nan=-2.0))[:3]
+                        self.correlated_pairs = [
+                            (str(names[biggest[upper[0][k]]]), str(names[biggest[upper[1][k]]]), float(pairs[k]))
+                            for k in ranked if valid[k]
+                        ]
+
+    @classmethod
+    def for_wallet(cls, portfolio, wallet: str, history=None, graph=None, depth: pd.Series = None,
+                   lookback_days: int = 90, now: float = None, **kwargs) -> "RiskReport":
+        """Builds the report from a wallet's Portfolio, its recorded history and the pool graph."""
+        now = time.time() if now is None else now
+        prices = history.price_matrix(wallet, now - lookback_days * DAY, now, interval=DAY) if history else None
+        if depth is None and graph is not None:
+            depth = pool_depth(graph)
+        return cls(portfolio, depth, prices, **kwargs)
+
+    def level(self) -> str:
+        """A coarse overall rating from concentration, liquidity and VaR."""
+        score = 0
+        score += 2 if self.hhi > 0.5 else 1 if self.hhi > 0.25 else 0
+        score += 1 if self.illiquid else 0
+        score += 1 if (self.unlisted_share or 0) > 0.25 else 0
+        if self.var_share is not None:
+            score += 2 if self.var_share > 0.1 else 1 if self.var_share > 0.05 else 0
+        return "high" if score >= 4 else "medium" if score >= 2 else "low"
+
+    def to_dict(self) -> dict:
+        return {
+            "level": self.level(),
+            "total_usd": self.total,
+            "positions": self.positions,
+            "hhi": self.hhi,
+            "effective_assets": self.effective_assets,
+            "top_share": self.top_share,
+            "top_holdings": self.top_holdings,
+            "chain_exposure": self.chain_exposure,
+            "illiquid": self.illiquid,
+            "unlisted_share": self.unlisted_share,
+            "var": self.var,
+            "var_share": self.var_share,
+            "var_level": self.var_level,
+            "history_days": self.history_days,
+            "avg_correlation": self.avg_correlation,
+            "correlated_pairs": self.correlated_pairs,
+        }
+
+    def to_context(self) -> str:
+        """A compact plain-text summary to hand to the agent with the user's question."""
+        lines = [
+            f"Risk level: {self.level()} | value ${self.total:,.0f} in {self.positions} positions",
+            f"Concentration: HHI {self.hhi:.3f} (~{self.effective_assets:.1f} effective assets), "
+            f"top {len(self.top_holdings)} = {self.top_share:.0%}: "
+            + ", ".join(f"{s} {w:.0%}" for s, w in self.top_holdings),
+            "Chains: " + ", ".join(f"{c} {w:.0%}" for c, w in self.chain_exposure.items()),
+        ]
+        if self.unlisted_share is not None:
+            liquidity = f"Liquidity: {self.unlisted_share:.0%} of value in tokens without known pools"
+            if self.illiquid:
+                liquidity += "; large vs pool TVL: " + ", ".join(
+                    f"{s} {share:.0%} of ${tvl:,.0f}" for s, share, tvl in self.illiquid
+                )
+            lines.append(liquidity)
+        if self.var is not None:
+            lines.append(f"1-day {self.var_level:.0%} historical VaR: ${self.var:,.0f} ({self.var_share:.1%})"
+                         f" over {self.history_days} days")
+        else:
+            lines.append("VaR: not enough recorded price history yet")
+        if self.avg_correlation is not None:
+            lines.append(f"Avg correlation of top holdings: {self.avg_correlation:.2f}; most correlated: "
+                         + ", ".join(f"{a}/{b} {c:.2f}" for a, b, c in self.correlated_pairs))
+        return "\n".join(lines)
@@ -0,0 +1,87 @@
+import threading
+
+from web3 import Web3
+
+_web3 = {}                  # RPC URL -> Web3
+_contracts = {}             # (id(w3), address, id(abi)) -> Contract
+_chain_ids = {}             # id(w3) -> chain id
+_lock = threading.Lock()
+
+
+def web3_for(url: str) -> Web3:
+    """One Web3 per RPC URL, so every helper shares its HTTP connection pool and caches."""
+    with _lock:
+        w3 = _web3.get(url)
+        if w3 is None:
+            w3 = _web3[url] = Web3(Web3.HTTPProvider(url))
+        return w3
+
+
+def contract(w3: Web3, address: str, abi: list):
+    """A cached contract object; ABIs are module-level lists, so their identity is a stable key."""
+    key = (id(w3), address, id(abi))
+    with _lock:
+        instance = _contracts.get(key)
+        if instance is None:
+            instance = _contracts[key] = w3.eth.contract(address=Web3.to_checksum_address(address), abi=abi)
+        return instance
+
+
+def chain_id(w3: Web3) -> int:
+    """The chain id of `w3`'s node, read once."""
+    if id(w3) not in _chain_ids:
+        _chain_ids[id(w3)] = w3.eth.chain_id
+    return _chain_ids[id(w3)]
+
+
+def call_tx(instance, fn_name: str, *args, **fields) -> dict:
+    """An unsigned call to `fn_name` on a contract, e.g. for prepare_transaction()."""
+    return {"to": instance.address, "data": instance.encode_abi(fn_name, args=list(args)), **fields}
+
+
+def prepare_transaction(chain: str, w3: Web3, account, tx: dict, fees, nonces) -> dict:
+    """
+    Completes `tx` ({"to", "data"} plus any of value, gas and fees) for
+    NonceManager.send(): gas limit, EIP-1559 fees and chain id, and checks that
+    the account can pay for it.
+
+    Everything still unknown goes to the node in one JSON-RPC batch: the gas
+    estimate and balance, plus a fee_history refresh, the chain id and the
+    account's pending nonce when the shared caches do not have them. A send
+    then costs two round trips instead of one per value.
+    """
+    tx = {"from": account.address, "value": 0, **tx}
+    reads = []
+    with w3.batch_requests() as batch:
+        if "gas" not in tx:
+            reads.append("gas")
+            batch.add(w3.eth.estimate_gas(tx))
+        reads.append("balance")
+        batch.add(w3.eth.get_balance(account.address))
+        if "maxFeePerGas" not in tx and fees.cached(chain) is None:
+            reads.append("fees")
+            batch.add(fees.history_request(w3))
+        if id(w3) not in _chain_ids:
+            reads.append("chain_id")
+            batch.add(w3.eth.chain_id)
+        if nonces.needs_sync(chain, account.address):
+            reads.append("nonce")
+            batch.add(w3.eth.get_transaction_count(account.address, "pending"))
+        results = dict(zip(reads, batch.execute()))
+
+    if "gas" in results:
+        tx["gas"] = results["gas"]
+    if "fees" in results:
+        fees.update(chain, results["fees"])
+    if "chain_id" in results:
+        _chain_ids[id(w3)] = results["chain_id"]
+    if "nonce" in results:
+        nonces.seed(chain, account.address, results["nonce"])
+    for field, value in fees.tx_fees(chain, w3).items():
+        tx.setdefault(field, value)
+    tx["chainId"] = _chain_ids[id(w3)]
+
+    estimated_cost = tx["gas"] * tx["maxFeePerGas"] + tx["value"]
+    if results["balance"] < estimated_cost:
+        raise Exception(f"Insufficient ETH for gas. Balance: {results['balance']}, Estimated cost: {estimated_cost}")
+    return tx
@@ -0,0 +1,588 @@
+"""
+Local stand-ins for the external services the agent talks to, so that the
+benchmarks in benchmarks.py can run offline with controlled latency.
+"""
+import json
+import random
+import asyncio
+import hashlib
+import threading
+from types import SimpleNamespace
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from time import sleep, time
+
+# DexScreener rejects requests for more than this many token addresses
+DEXSCREENER_MAX_ADDRESSES = 30
+
+# ERC-20 function selectors the JSON-RPC stand-in understands
+ERC20_APPROVE = bytes.fromhex("095ea7b3")
+ERC20_ALLOWANCE = bytes.fromhex("dd62ed3e")
+# name(), version() and nonces(owner) of an EIP-2612 token: every token is "Stand-in" v1 with no permits used
+ERC20_PERMIT_READS = {
+    bytes.fromhex("06fdde03"): lambda: _abi_encode(["string"], ["Stand-in"]),
+    bytes.fromhex("54fd4d50"): lambda: _abi_encode(["string"], ["1"]),
+    bytes.fromhex("7ecebe00"): lambda: _abi_encode(["uint256"], [0]),
+}
+# balanceOf(owner) and decimals(): every account holds 1,000 of every 18-decimal token
+ERC20_READS = {
+    bytes.fromhex("70a08231"): lambda: _abi_encode(["uint256"], [1000 * 10**18]),
+    bytes.fromhex("313ce567"): lambda: _abi_encode(["uint8"], [18]),
+}
+MULTICALL3 = "0xca11bde05977b3631167028862be2a173976ca11"
+MULTICALL_AGGREGATE3 = bytes.fromhex("82ad56cb")
+MULTICALL_BLOCK_NUMBER = bytes.fromhex("42cbb15c")
+# Uniswap V3 pool reads, answered from the stand-in's `pools`
+POOL_READS = {
+    bytes.fromhex("3850c7bd"): lambda pool: _abi_encode(
+        ["uint160", "int24", "uint16", "uint16", "uint16", "uint8", "bool"],
+        [pool["sqrt_price_x96"], pool["tick"], 0, 1, 1, 0, True]),
+    bytes.fromhex("1a686502"): lambda pool: _abi_encode(["uint128"], [pool["liquidity"]]),
+    bytes.fromhex("ddca3f43"): lambda pool: _abi_encode(["uint24"], [pool["fee"]]),
+    bytes.fromhex("d0c93a7c"): lambda pool: _abi_encode(["int24"], [pool["tick_spacing"]]),
+    bytes.fromhex("0dfe1681"): lambda pool: _abi_encode(["address"], [pool["token0"]]),
+    bytes.fromhex("d21220a7"): lambda pool: _abi_encode(["address"], [pool["token1"]]),
+}
+POOL_TICK_BITMAP = bytes.fromhex("5339c296")
+POOL_TICKS = bytes.fromhex("f30dba93")
+QUOTER_EXACT_INPUT_SINGLE = bytes.fromhex("c6a5026a")
+
+
+def _abi_encode(types, values) -> bytes:
+    from eth_abi import encode
+    return encode(types, values)
+
+
+def fake_address(*parts) -> str:
+    """A deterministic, checksum-free contract address derived from `parts`."""
+    return "0x" + hashlib.sha256("/".join(map(str, parts)).encode()).hexdigest()[:40]
+
+
+def synthetic_pool(seed, token0: str, token1: str, fee: int = 3000, tick_spacing: int = 60,
+                   tick: int = -200_000, positions: int = 40, width: int = 2000) -> dict:
+    """
+    A Uniswap V3 pool for jsonrpc_standin(): `positions` random ranges of up to
+    `width` tick spacings either side of `tick`, plus one wide backstop range.
+    """
+    from quoter import get_sqrt_ratio_at_tick
+    rng = random.Random(seed)
+    token0, token1 = sorted((token0, token1), key=str.lower)
+    center = tick // tick_spacing
+    ticks, liquidity = {}, 0
+    ranges = [(center - 4 * width, center + 4 * width, 10**18)]
+    ranges += [(center - rng.randint(1, width), center + rng.randint(1, width), rng.randint(10**16, 10**18))
+               for _ in range(positions)]
+    for lower, upper, amount in ranges:
+        ticks[lower * tick_spacing] = ticks.get(lower * tick_spacing, 0) + amount
+        ticks[upper * tick_spacing] = ticks.get(upper * tick_spacing, 0) - amount
+        liquidity += amount
+    return {
+        "token0": token0, "token1": token1, "fee": fee, "tick_spacing": tick_spacing, "tick": tick,
+        "sqrt_price_x96": rng.randrange(get_sqrt_ratio_at_tick(tick), get_sqrt_ratio_at_tick(tick + 1)), "liquidity": liquidity, "ticks": ticks,
+    }
+
+
+def fake_price(address: str) -> float:
+    return int(address[2:10], 16) % 100_000 / 100
+
+
+class StandInServer:
+    """
+    Runs an HTTP request handler on a random local port in a background thread.
+    Besides the handler's own settings, every stand-in accepts fault injection:
+    `slow_rate` of requests take `slow_delay` seconds instead of `delay`, and
+    `error_rate` of requests fail with `error_status`.
+    """
+    def __init__(self, handler_cls, seed: int = 0, **settings):
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", 0), handler_cls)
+        self.httpd.daemon_threads = True
+        settings = {"delay": 0.0, "slow_rate": 0.0, "slow_delay": 1.0, "error_rate": 0.0, "error_status": 503, **settings}
+        self.httpd.settings = SimpleNamespace(**settings)
+        self.httpd.random = random.Random(seed)
+        self.httpd.request_count = 0
+        self._thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+
+    @property
+    def url(self) -> str:
+        host, port = self.httpd.server_address
+        return f"http://{host}:{port}"
+
+    @property
+    def settings(self):
+        return self.httpd.settings
+
+    @property
+    def request_count(self) -> int:
+        return self.httpd.request_count
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+class _JSONHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    # Buffer headers and body into one write, so keep-alive clients do not
+    # wait out a delayed ACK between the two
+    wbufsize = 64 * 1024
+
+    def log_message(self, *args):
+        pass
+
+    def _begin(self) -> bool:
+        """Counts the request, applies the configured latency and faults; False if an error was sent."""
+        settings = self.server.settings
+        self.server.request_count += 1
+        roll_slow, roll_error = self.server.random.random(), self.server.random.random()
+        sleep(settings.slow_delay if roll_slow < settings.slow_rate else settings.delay)
+        if roll_error < settings.error_rate:
+            self._send_json({"error": "injected failure"}, settings.error_status)
+            return False
+        return True
+
+    def _send_json(self, payload, status=200):
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        try:
+            self.end_headers()
+            self.wfile.write(body)
+        except (BrokenPipeError, ConnectionResetError):
+            self.close_connection = True  # the client gave up (e.g. a cancelled hedge)
+
+
+class _DexScreenerHandler(_JSONHandler):
+    def do_GET(self):
+        if not self._begin():
+            return
+        prefix = "/latest/dex/tokens/"
+        if not self.path.startswith(prefix):
+            return self._send_json({"error": "not found"}, 404)
+        addresses = [a for a in self.path[len(prefix):].split(",") if a]
+        if len(addresses) > DEXSCREENER_MAX_ADDRESSES:
+            return self._send_json({"error": "too many addresses"}, 400)
+        pairs = [
+            {"baseToken": {"address": a}, "priceUsd": str(fake_price(a))}
+            for a in addresses
+        ]
+        self._send_json({"pairs": pairs})
+
+
+def dexscreener_standin(delay: float = 0.05, **faults) -> StandInServer:
+    """A DexScreener `/latest/dex/tokens/<addresses>` stand-in. Set DEXSCREENER_API to `url + "/latest/dex/tokens"`."""
+    return StandInServer(_DexScreenerHandler, delay=delay, **faults)
+
+
+class _GeckoTerminalHandler(_JSONHandler):
+    def do_GET(self):
+        if not self._begin():
+            return
+        # /networks/<network>/token_price/<addresses>
+        parts = self.path.strip("/").split("/")
+        if len(parts) != 4 or parts[0] != "networks" or parts[2] != "token_price":
+            return self._send_json({"error": "not found"}, 404)
+        addresses = [a.lower() for a in parts[3].split(",") if a]
+        prices = {a: str(fake_price(a)) for a in addresses}
+        self._send_json({"data": {"type": "simple_token_price", "attributes": {"token_prices": prices}}})
+
+
+def geckoterminal_standin(delay: float = 0.05, **faults) -> StandInServer:
+    """A GeckoTerminal `/networks/<network>/token_price/<addresses>` stand-in. Use `url + "/networks"` as the base URL."""
+    return StandInServer(_GeckoTerminalHandler, delay=delay, **faults)
+
+
+PENDING_ATTESTATION = {"attestation": "PENDING", "status": "pending_confirmations"}
+
+
+class _AttestationHandler(_JSONHandler):
+    def do_GET(self):
+        if not self._begin():
+            return
+        burn_tx_hash = self.path.rstrip("/").rsplit("/", 1)[-1]
+        settings = self.server.settings
+        with settings.lock:
+            first_seen = settings.first_seen.setdefault(burn_tx_hash, time())
+            ready_after = settings.ready_after(burn_tx_hash) if callable(settings.ready_after) else settings.ready_after
+        if time() - first_seen < ready_after:
+            return self._send_json(settings.pending_body)
+        attestation = "0x" + hashlib.sha256(burn_tx_hash.encode()).hexdigest() * 2
+        self._send_json({"attestation": attestation, "status": "complete"})
+
+
+def attestation_standin(ready_after=1.0, delay: float = 0.01, pending_body=PENDING_ATTESTATION, **faults) -> StandInServer:
+    """
+    A Circle `/v1/attestations/<hash>` stand-in: a burn is attested `ready_after`
+    seconds (or `ready_after(hash)`) after it is first polled; until then it
+    answers `pending_body`.
+    """
+    return StandInServer(_AttestationHandler, delay=delay, ready_after=ready_after, pending_body=pending_body,
+                         first_seen={}, lock=threading.Lock(), **faults)
+
+
+class StandInCctp:
+    """
+    Mimics GeneralizedCCTP: approve, burn and mint block for `tx_delay` seconds and
+    return fake tx hashes; attestations come from an AttestationPoller (e.g. one
+    pointed at attestation_standin()). The first `mint_failures` mints raise,
+    like a flaky RPC node.
+    """
+    def __init__(self, attestations, tx_delay: float = 0.05, mint_failures: int = 0):
+        self.attestations = attestations
+        self.tx_delay = tx_delay
+        self.mint_failures = mint_failures
+        self.sent = []
+        self._lock = threading.Lock()
+
+    def _send(self, *parts) -> str:
+        sleep(self.tx_delay)
+        with self._lock:
+            self.sent.append(parts)
+            return fake_address("tx", len(self.sent), *parts) + "0" * 24
+
+    def approve_usdc(self, chain: str, amount: int):
+        return self._send("approve", chain, amount)
+
+    def ensure_usdc_allowance(self, chain: str, amount: int):
+        return self._send("approve", chain, amount)
+
+    def usdc_approval_pending(self, chain: str) -> bool:
+        return False
+
+    def burn_usdc(self, chain: str, amount: int, dest_domain: int, recipient: str, gas: int = None):
+        return self._send("burn", chain, amount, dest_domain, recipient)
+
+    def mint_usdc(self, chain: str, burn_tx_hash: str, attestation: str):
+        with self._lock:
+            failing, self.mint_failures = self.mint_failures > 0, max(self.mint_failures - 1, 0)
+        if failing:
+            sleep(self.tx_delay)
+            raise Exception("503 Service Unavailable")
+        return self._send("mint", chain, burn_tx_hash)
+
+    async def get_attestation_async(self, burn_tx_hash: str, max_wait: float = None):
+        return await self.attestations.wait(burn_tx_hash, max_wait)
+
+
+class StandInEth:
+    """
+    Mimics the parts of a Web3 instance that sending uses (`w3.eth`): every call
+    takes `rpc_delay` seconds, and a block is mined every `block_time` seconds,
+    including pending transactions whose nonces follow on from the account's
+    mined count. Sends with a used nonce fail like a node's "nonce too low".
+    """
+    def __init__(self, rpc_delay: float = 0.05, block_time: float = 1.0):
+        self.rpc_delay = rpc_delay
+        self.block_time = block_time
+        self.calls = {}
+        self.mined = {}             # address -> mined transaction count
+        self.pending = {}           # address -> {nonce: tx hash}
+        self.receipts = {}
+        self.reverting = set()      # tx hashes mined with status 0
+        self.eth = self
+        self._started = time()
+        self._block = 0
+        self._lock = threading.Lock()
+
+    def _call(self, method: str):
+        sleep(self.rpc_delay)
+        with self._lock:
+            self.calls[method] = self.calls.get(method, 0) + 1
+            while self._block < int((time() - self._started) / self.block_time):
+                self._block += 1
+                for address, queued in self.pending.items():
+                    while self.mined.get(address, 0) in queued:
+                        nonce = self.mined.get(address, 0)
+                        tx_hash = queued.pop(nonce)
+                        self.receipts[tx_hash] = {"blockNumber": self._block, "status": int(tx_hash not in self.reverting)}
+                        self.mined[address] = nonce + 1
+
+    @property
+    def block_number(self) -> int:
+        self._call("eth_blockNumber")
+        return self._block
+
+    def get_transaction_count(self, address: str, block_identifier: str = "latest") -> int:
+        self._call("eth_getTransactionCount")
+        with self._lock:
+            count = self.mined.get(address, 0)
+            if block_identifier == "pending":
+                while count in self.pending.get(address, {}):
+                    count += 1
+            return count
+
+    def send_raw_transaction(self, raw: bytes):
+        from web3 import Web3
+        from eth_account import Account
+        from eth_account.typed_transactions import TypedTransaction
+        from hexbytes import HexBytes
+        self._call("eth_sendRawTransaction")
+        address = Account.recover_transaction(raw)
+        nonce = TypedTransaction.from_bytes(HexBytes(raw)).as_dict()["nonce"]
+        tx_hash = bytes(Web3.keccak(raw))
+        with self._lock:
+            queued = self.pending.setdefault(address, {})
+            if nonce < self.mined.get(address, 0):
+                raise ValueError("nonce too low")
+            if nonce in queued:
+                raise ValueError("already known" if queued[nonce] == tx_hash else "replacement transaction underpriced")
+            queued[nonce] = tx_hash
+        return tx_hash
+
+    def fee_history(self, block_count: int, newest_block: str = "latest", reward_percentiles=None) -> dict:
+        self._call("eth_feeHistory")
+        with self._lock:
+            newest = self._block
+        oldest = max(0, newest - block_count + 1)
+        blocks = range(oldest, newest + 1)
+        # Base fee drifts with the block number; tips vary a little from block to block
+        return {
+            "oldestBlock": oldest,
+            "baseFeePerGas": [10**9 + (n % 7) * 10**8 for n in range(oldest, newest + 2)],
+            "gasUsedRatio": [0.5 for _ in blocks],
+            "reward": [[10**8 + (n % 3) * 10**7 for _ in reward_percentiles or ()] for n in blocks],
+        }
+
+    def get_transaction_receipt(self, tx_hash: bytes):
+        self._call("eth_getTransactionReceipt")
+        with self._lock:
+            return self.receipts.get(self._hash(tx_hash))
+
+    def wait_for_transaction_receipt(self, tx_hash, timeout: float = 120.0, poll_latency: float = 0.1):
+        from web3.exceptions import TimeExhausted
+        deadline = time() + timeout
+        while (receipt := self.get_transaction_receipt(tx_hash)) is None:
+            if time() > deadline:
+                raise TimeExhausted(f"Transaction {tx_hash} is not in the chain after {timeout} seconds")
+            sleep(poll_latency)
+        return receipt
+
+    def drop(self, tx_hash):
+        """Evicts a pending transaction, as a node does under mempool pressure; later nonces stall behind it."""
+        with self._lock:
+            for queued in self.pending.values():
+                for nonce, queued_hash in list(queued.items()):
+                    if queued_hash == self._hash(tx_hash):
+                        del queued[nonce]
+
+    def revert(self, tx_hash):
+        """Makes a pending transaction revert when it is mined."""
+        with self._lock:
+            self.reverting.add(self._hash(tx_hash))
+
+    @staticmethod
+    def _hash(tx_hash) -> bytes:
+        return bytes.fromhex(tx_hash.removeprefix("0x")) if isinstance(tx_hash, str) else bytes(tx_hash)
+
+
+class _JSONRPCHandler(_JSONHandler):
+    def do_POST(self):
+        payload = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"null")
+        if not self._begin():
+            return
+        if isinstance(payload, list):
+            self.server.batch_sizes.append(len(payload))
+            return self._send_json([self._answer(request) for request in payload])
+        self.server.batch_sizes.append(1)
+        self._send_json(self._answer(payload))
+
+    def _answer(self, request: dict) -> dict:
+        settings = self.server.settings
+        method, params = request["method"], request.get("params") or []
+        with settings.lock:
+            settings.methods[method] = settings.methods.get(method, 0) + 1
+        handler = getattr(self, "_" + method, None)
+        if handler is None:
+            return {"jsonrpc": "2.0", "id": request["id"], "error": {"code": -32601, "message": f"{method} not supported"}}
+        try:
+            result = handler(settings.chain, *params)
+        except ValueError as e:
+            return {"jsonrpc": "2.0", "id": request["id"], "error": {"code": -32000, "message": str(e)}}
+        return {"jsonrpc": "2.0", "id": request["id"], "result": result}
+
+    def _eth_chainId(self, chain):
+        return hex(self.server.settings.chain_id)
+
+    def _eth_blockNumber(self, chain):
+        return hex(chain.block_number)
+
+    def _eth_getBalance(self, chain, address, block="latest"):
+        return hex(self.server.settings.balance)
+
+    def _eth_estimateGas(self, chain, tx, block="latest"):
+        data = bytes.fromhex(tx.get("data", tx.get("input", "0x"))[2:])
+        return hex(21000 + 16 * len(data) + (40000 if data else 0))
+
+    def _eth_getTransactionReceipt(self, chain, tx_hash):
+        receipt = chain.get_transaction_receipt(tx_hash)
+        if receipt is None:
+            return None
+        return {"transactionHash": tx_hash, "blockNumber": hex(receipt["blockNumber"]), "status": hex(receipt["status"]),
+                "gasUsed": hex(21000), "logs": []}
+
+    def _eth_getTransactionCount(self, chain, address, block="latest"):
+        return hex(chain.get_transaction_count(address, block))
+
+    def _eth_feeHistory(self, chain, count, newest="latest", percentiles=None):
+        history = chain.fee_history(int(count, 16) if isinstance(count, str) else count, newest, percentiles)
+        return {
+            "oldestBlock": hex(history["oldestBlock"]),
+            "baseFeePerGas": [hex(fee) for fee in history["baseFeePerGas"]],
+            "gasUsedRatio": history["gasUsedRatio"],
+            "reward": [[hex(tip) for tip in tips] for tips in history["reward"]],
+        }
+
+    def _eth_sendRawTransaction(self, chain, raw):
+        from eth_account import Account
+        from eth_account.typed_transactions import TypedTransaction
+        from hexbytes import HexBytes
+        tx_hash = chain.send_raw_transaction(bytes.fromhex(raw[2:]))
+        tx = TypedTransaction.from_bytes(HexBytes(raw)).as_dict()
+        data = bytes(tx["data"])
+        if data[:4] == ERC20_APPROVE:
+            # Approvals take effect on send; good enough for counting round trips
+            owner = Account.recover_transaction(raw).lower()
+            token, spender = "0x" + bytes(tx["to"]).hex(), "0x" + data[16:36].hex()
+            with self.server.settings.lock:
+                self.server.settings.allowances[(token, owner, spender)] = int.from_bytes(data[36:68], "big")
+        return "0x" + tx_hash.hex()
+
+    def _eth_call(self, chain, tx, block="latest"):
+        data = bytes.fromhex(tx.get("data", tx.get("input", "0x"))[2:])
+        if tx["to"].lower() == MULTICALL3:
+            return "0x" + self._multicall(chain, data).hex()
+        if data[:4] == ERC20_ALLOWANCE:
+            owner, spender = "0x" + data[16:36].hex(), "0x" + data[48:68].hex()
+            with self.server.settings.lock:
+                allowance = self.server.settings.allowances.get((tx["to"].lower(), owner, spender), 0)
+            return "0x" + allowance.to_bytes(32, "big").hex()
+        if data[:4] in ERC20_PERMIT_READS:
+            return "0x" + ERC20_PERMIT_READS[data[:4]]().hex()
+        if data[:4] in ERC20_READS:
+            return "0x" + ERC20_READS[data[:4]]().hex()
+        pool = self.server.settings.pools.get(tx["to"].lower())
+        if pool is not None:
+            return "0x" + self._pool_call(pool, data).hex()
+        if data[:4] == QUOTER_EXACT_INPUT_SINGLE:
+            return "0x" + self._quote_call(data).hex()
+        raise ValueError("execution reverted")
+
+    def _multicall(self, chain, data: bytes) -> bytes:
+        # Multicall3: aggregate3 runs each read like its own eth_call, failures included
+        from eth_abi import decode
+        if data[:4] == MULTICALL_BLOCK_NUMBER:
+            return _abi_encode(["uint256"], [chain.block_number])
+        if data[:4] != MULTICALL_AGGREGATE3:
+            raise ValueError("execution reverted")
+        (calls,) = decode(["(address,bool,bytes)[]"], data[4:])
+        results = []
+        for target, allow_failure, calldata in calls:
+            try:
+                results.append((True, bytes.fromhex(self._eth_call(chain, {"to": target, "data": "0x" + calldata.hex()})[2:])))
+            except ValueError:
+                if not allow_failure:
+                    raise ValueError("Multicall3: call failed")
+                results.append((False, b""))
+        with self.server.settings.lock:
+            self.server.settings.methods["multicall reads"] = self.server.settings.methods.get("multicall reads", 0) + len(calls)
+        return _abi_encode(["(bool,bytes)[]"], [results])
+
+    def _pool_call(self, pool: dict, data: bytes) -> bytes:
+        from eth_abi import decode
+        if data[:4] in POOL_READS:
+            return POOL_READS[data[:4]](pool)
+        if data[:4] == POOL_TICK_BITMAP:
+            (word,) = decode(["int16"], data[4:])
+            spacing = pool["tick_spacing"]
+            bitmap = sum(1 << ((tick // spacing) & 0xff) for tick in pool["ticks"] if (tick // spacing) >> 8 == word)
+            return _abi_encode(["uint256"], [bitmap])
+        if data[:4] == POOL_TICKS:
+            (tick,) = decode(["int24"], data[4:])
+            net = pool["ticks"].get(tick, 0)
+            return _abi_encode(["uint128", "int128", "uint256", "uint256", "int56", "uint160", "uint32", "bool"],
+                               [abs(net), net, 0, 0, 0, 0, 0, tick in pool["ticks"]])
+        raise ValueError("execution reverted")
+
+    def _quote_call(self, data: bytes) -> bytes:
+        # QuoterV2.quoteExactInputSingle: the real quoter runs the swap and reverts; this runs it in Python
+        from eth_abi import decode
+        from quoter import PoolState
+        ((token_in, token_out, amount_in, fee, _),) = decode(["(address,address,uint256,uint24,uint160)"], data[4:])
+        for address, pool in self.server.settings.pools.items():
+            if {pool["token0"].lower(), pool["token1"].lower()} == {token_in.lower(), token_out.lower()} and pool["fee"] == fee:
+                state = PoolState(address, pool["token0"], pool["token1"], fee, pool["tick_spacing"],
+                                  pool["sqrt_price_x96"], pool["tick"], pool["liquidity"], pool["ticks"],
+                                  (-(1 << 15), (1 << 15) - 1))
+                result = state.simulate(token_in, amount_in)
+                return _abi_encode(["uint256", "uint160", "uint32", "uint256"],
+                                   [result["amount_out"], result["sqrt_price_x96"], 0, 100_000])
+        raise ValueError("execution reverted")
+
+
+def jsonrpc_standin(delay: float = 0.05, block_time: float = 2.0, chain_id: int = 1,
+                    balance: int = 10**20, allowances: dict = None, pools: dict = None, **faults) -> StandInServer:
+    """
+    An Ethereum JSON-RPC node stand-in (single and batch requests) backed by a
+    StandInEth chain. `delay` applies per HTTP request, so a batch costs one
+    delay. ERC-20 `allowance` calls are answered from `allowances`
+    ({(token, owner, spender): amount}, lowercase), which approvals sent to the
+    node update. Calls to an address in `pools` ({address: synthetic_pool()},
+    lowercase) read that Uniswap V3 pool, and QuoterV2's quoteExactInputSingle
+    at any other address quotes against them. Multicall3 (aggregate3,
+    getBlockNumber) runs at its usual address. The server's settings count
+    calls per method; `batch_sizes` lists the size of every HTTP request.
+    """
+    server = StandInServer(_JSONRPCHandler, delay=delay, chain=StandInEth(0, block_time), chain_id=chain_id,
+                           balance=balance, allowances=dict(allowances or {}),
+                           pools=dict(pools or {}), methods={}, lock=threading.Lock(), **faults)
+    server.httpd.batch_sizes = []
+    return server
+
+
+class StandInCdpClient:
+    """
+    Mimics `CdpClient` for `evm.list_token_balances`: every wallet holds
+    `tokens_per_chain` tokens on each network, served in pages after `delay` seconds.
+    The first `shared_fraction` of each wallet's tokens are the same popular tokens
+    for every wallet; the rest are unique to the wallet.
+    """
+    def __init__(self, tokens_per_chain: int = 50, delay: float = 0.1, shared_fraction: float = 1.0):
+        self.tokens_per_chain = tokens_per_chain
+        self.delay = delay
+        self.shared_tokens = int(tokens_per_chain * shared_fraction)
+        self.calls = 0
+        self.evm = self
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+    async def list_token_balances(self, address, network, page_size=None, page_token=None):
+        self.calls += 1
+        await asyncio.sleep(self.delay)
+        page_size = page_size or 20
+        start = int(page_token or 0)
+        end = min(start + page_size, self.tokens_per_chain)
+        balances = [
+            SimpleNamespace(
+                token=SimpleNamespace(
+                    contract_address=fake_address(network, i) if i < self.shared_tokens else fake_address(network, address, i),
+                    symbol=f"TKN{i}", network=network
+                ),
+                amount=SimpleNamespace(amount=(i + 1) * 10**18, decimals=18),
+            )
+            for i in range(start, end)
+        ]
+        next_page_token = str(end) if end < self.tokens_per_chain else None
+        return SimpleNamespace(balances=balances, next_page_token=next_page_token)
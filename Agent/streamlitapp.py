@@ -17,7 +17,10 @@ from cdp import CdpClient
 from openai import OpenAI
 from time import sleep
 
-from wallet_analyzer import get_wallet_balances
+from wallet_analyzer import get_wallet_balances, IGNORED_PRICE_TOKENS
+from portfolio import Portfolio
+from history import HistoryStore, DAY
+from risk import RiskReport, pool_depth
 
 from langgraph.checkpoint.memory import MemorySaver
 
@@ -26,6 +29,9 @@ from langgraph.graph import StateGraph
 
 memory = InMemorySaver()
 
+# Every wallet refresh is recorded here; the performance chart and deltas read it back
+history = HistoryStore(os.getenv("HISTORY_PATH", "history"))
+
 
 
 
@@ -63,9 +69,10 @@ from uagents_core.contrib.protocols.chat import (
 
 # Local project modules
 from cctp import GeneralizedCCTP
-from uniswap import UniswapV3Helper
+from bridge_jobs import BridgeJobQueue
+from uniswap import UniswapV3Helper, ADDRESS_THIS, SWAP_GAS, SWAP_HOP_GAS, MINT_POSITION_GAS, UNISWAP_ROUTER, NONFUNGIBLE_POSITION_MANAGER, WETH9
 from wallet_analyzer import get_wallet_balances
-from graph_tool import find_pools, find_path, load_graph
+from graph_tool import find_pools, find_path, find_swap_route, load_graph
 from MeTTaGraphAnalyzer import MeTTaGraphAnalyzer
 
 # --- 2. Configuration & Initialization ---
@@ -96,8 +103,23 @@ CCTP_DOMAINS = {"ETH": 0, "BASE": 6}
 # Initialize helpers
 cctp = GeneralizedCCTP(WALLET_PRIVATE_KEY, RPC_URLS)
 uni = UniswapV3Helper(WALLET_PRIVATE_KEY, RPC_URLS)
+
+
+@st.cache_resource
+def bridge_job_queue() -> BridgeJobQueue:
+    # Streamlit reruns this script on every interaction; the queue (and its CCTP
+    # helper and background loop) is created once per process
+    return BridgeJobQueue(
+        GeneralizedCCTP(WALLET_PRIVATE_KEY, RPC_URLS), os.getenv("BRIDGE_JOBS_PATH", "bridge_jobs.sqlite")
+    ).start()
+
+
+# Bridges run as persistent jobs; unfinished ones resume on startup
+bridge_queue = bridge_job_queue()
 G = load_graph()
-analyzer = MeTTaGraphAnalyzer(G)
+# Pool TVL per held token, for the liquidity part of the risk assessment
+token_depth = pool_depth(G)
+analyzer = MeTTaGraphAnalyzer.from_snapshot(G)
 
 
 
@@ -124,39 +146,115 @@ def perform_cctp_bridge(source_chain: str, dest_chain: str, token: str, amount:
     # Convert amount to the correct decimal format (USDC has 6 decimals)
     amount_in_units = int(amount * 10**6)
     
-    # 1. Approve USDC for burning
-    tx1 = cctp.approve_usdc(source_chain, amount_in_units)
-    
-    # 2. Burn USDC on the source chain
+    # Approve, burn, attest and mint run as a persistent background job,
+    # since attestation alone takes minutes
     dest_domain = CCTP_DOMAINS[dest_chain.upper()]
     recipient_address = CCTP_RECIPIENTS[dest_chain.upper()]
-    tx2 = cctp.burn_usdc(source_chain, amount_in_units, dest_domain=dest_domain, recipient=recipient_address)
-    
-    # 3. Get attestation for the burn transaction
-    att = cctp.get_attestation(tx2)
+    job_id = bridge_queue.submit(source_chain.upper(), dest_chain.upper(), amount_in_units, dest_domain, recipient_address)
     
-    # 4. Mint USDC on the destination chain
-    tx3 = cctp.mint_usdc(dest_chain, tx2, att)
-    
-    return {"approve_tx": tx1, "burn_tx": tx2, "mint_tx": tx3}
+    return {"job_id": job_id, "status": "queued", "note": "Use get_bridge_status with this job_id to follow the bridge."}
 
 @tool
-def perform_uniswap_swap(chain: str, token_in: str, token_out: str, fee: int, amount_in: int, amount_out_min: int):
+def get_bridge_status(job_id: int) -> dict:
     """
-    Executes a token swap on Uniswap V3.
+    Returns the state of a CCTP bridge job started by perform_cctp_bridge:
+    queued, approved, burned, attested, minted or failed, with its transaction hashes.
     """
-    approve_tx = uni.approve_token(chain, token_in, amount_in)
-    swap_tx = uni.swap_exact_input_single(chain, token_in, token_out, fee, amount_in, amount_out_min)
-    return {"approve_tx": approve_tx, "swap_tx": swap_tx}
+    job = bridge_queue.get(job_id)
+    if job is None:
+        return {"error": f"No bridge job {job_id}."}
+    return {key: job[key] for key in ("id", "source_chain", "dest_chain", "amount", "state",
+                                      "approve_tx", "burn_tx", "mint_tx", "error")}
+
+@tool
+def quote_uniswap_swap(chain: str, token_in: str, token_out: str, fee: int, amounts_in: List[int]) -> dict:
+    """
+    Quotes Uniswap V3 swaps through one pool for one or more input amounts, from
+    locally simulated pool state. Use this to compare trade sizes before swapping.
+    """
+    return {"amounts_in": amounts_in, "amounts_out": uni.quote_exact_input_single(chain, token_in, token_out, fee, amounts_in)}
+
+@tool
+def perform_uniswap_swap(chain: str, token_in: str, token_out: str, fee: int, amount_in: int, amount_out_min: int = None,
+                         slippage_bps: int = 50):
+    """
+    Executes a token swap on Uniswap V3. Without amount_out_min, the minimum is
+    the local quote less slippage_bps basis points.
+    """
+    if amount_out_min is None:
+        (quote,) = uni.quote_exact_input_single(chain, token_in, token_out, fee, [amount_in])
+        if quote is None:
+            return {"error": "Pool liquidity near the current price cannot fill this swap; pass amount_out_min to force it."}
+        amount_out_min = quote * (10_000 - slippage_bps) // 10_000
+    approve_tx = uni.ensure_allowance(chain, token_in, amount_in, UNISWAP_ROUTER[chain])
+    # Behind a pending approval the swap cannot be estimated; otherwise the estimate catches a swap that would revert
+    swap_tx = uni.swap_exact_input_single(chain, token_in, token_out, fee, amount_in, amount_out_min,
+                                          gas=SWAP_GAS if approve_tx else None)
+    return {"approve_tx": approve_tx, "swap_tx": swap_tx, "amount_out_min": amount_out_min}
+
+@tool
+def perform_uniswap_route_swap(token_in: str, token_out: str, amount_in: int, amount_out_min: int = None,
+                               slippage_bps: int = 50, chain: str = None):
+    """
+    Swaps along the best pool route between two tokens (e.g. A -> WETH -> USDC),
+    found in the liquidity graph, in a single multi-hop transaction. Tokens are
+    names or addresses; chain is 'eth' or 'base'. Without amount_out_min, the
+    minimum is the local quote less slippage_bps basis points.
+    """
+    route = find_swap_route(G, token_in, token_out, chain)
+    if route is None:
+        return {"error": f"No pool route between {token_in} and {token_out}."}
+    chain = route["chain"].upper()
+    fees = uni.route_fees(chain, route["tokens"], route["pools"])
+    if amount_out_min is None:
+        (quote,) = uni.quote_exact_input_path(chain, route["tokens"], fees, [amount_in])
+        if quote is None:
+            return {"error": "Pool liquidity along the route cannot fill this swap; pass amount_out_min to force it."}
+        amount_out_min = quote * (10_000 - slippage_bps) // 10_000
+    approve_tx = uni.ensure_allowance(chain, route["tokens"][0], amount_in, UNISWAP_ROUTER[chain])
+    # As for single-pool swaps: a fixed limit only behind a pending approval, else the estimate catches reverts
+    swap_tx = uni.swap_exact_input(chain, route["tokens"], fees, amount_in, amount_out_min,
+                                   gas=SWAP_GAS + SWAP_HOP_GAS * (len(fees) - 1) if approve_tx else None)
+    return {"route": route["path"], "fees": fees, "approve_tx": approve_tx, "swap_tx": swap_tx, "amount_out_min": amount_out_min}
+
+@tool
+def perform_uniswap_rebalance(chain: str, swaps: List[dict], slippage_bps: int = 50):
+    """
+    Executes several Uniswap V3 swaps (e.g. a portfolio rebalance) as one
+    transaction. Each swap is {"token_in", "token_out", "fee", "amount_in"},
+    optionally with "amount_out_min" (else the local quote less slippage_bps
+    basis points) and "to_eth": true to receive ETH instead of WETH.
+    """
+    uni.pool_states(chain, [(swap["token_in"], swap["token_out"], swap["fee"]) for swap in swaps])
+    bundle = uni.bundle(chain)
+    unwrap_min = 0
+    for swap in swaps:
+        amount_out_min = swap.get("amount_out_min")
+        if amount_out_min is None:
+            (quote,) = uni.quote_exact_input_single(chain, swap["token_in"], swap["token_out"], swap["fee"], [swap["amount_in"]])
+            if quote is None:
+                return {"error": f"Pool liquidity cannot fill the {swap['token_in']} -> {swap['token_out']} swap."}
+            amount_out_min = quote * (10_000 - slippage_bps) // 10_000
+        if swap.get("to_eth") and swap["token_out"].lower() != WETH9[chain].lower():
+            return {"error": "Only swaps into WETH can be paid out as ETH."}
+        recipient = ADDRESS_THIS if swap.get("to_eth") else None
+        bundle.swap_exact_input_single(swap["token_in"], swap["token_out"], swap["fee"], swap["amount_in"], amount_out_min, recipient)
+        if swap.get("to_eth"):
+            unwrap_min += amount_out_min
+    if unwrap_min:
+        bundle.unwrap_weth(unwrap_min)
+    return bundle.send()
 
 @tool
 def add_liquidity_uniswap(chain: str, token0: str, token1: str, fee: int, tick_lower: int, tick_upper: int, amount0: int, amount1: int):
     """
     Adds liquidity to a Uniswap V3 pool.
     """
-    approve_tx0 = uni.approve_token(chain, token0, amount0)
-    approve_tx1 = uni.approve_token(chain, token1, amount1)
-    add_liquidity_tx = uni.add_liquidity(chain, token0, token1, fee, tick_lower, tick_upper, amount0, amount1)
+    approve_tx0, approve_tx1 = uni.ensure_allowances(chain, [
+        (token0, amount0, NONFUNGIBLE_POSITION_MANAGER[chain]), (token1, amount1, NONFUNGIBLE_POSITION_MANAGER[chain])
+    ])
+    add_liquidity_tx = uni.add_liquidity(chain, token0, token1, fee, tick_lower, tick_upper, amount0, amount1,
+                                         gas=MINT_POSITION_GAS if approve_tx0 or approve_tx1 else None)
     return {"approve_txs": [approve_tx0, approve_tx1], "add_liquidity_tx": add_liquidity_tx}
 
 @tool
@@ -204,8 +302,12 @@ tools = [
     web_search,
     add_liquidity_uniswap,
     remove_liquidity_uniswap,
+    quote_uniswap_swap,
     perform_uniswap_swap,
+    perform_uniswap_route_swap,
+    perform_uniswap_rebalance,
     perform_cctp_bridge,
+    get_bridge_status,
     MeTTaGraphAnalyzerTool,
 ]
 tool_node = ToolNode(tools)
@@ -307,121 +409,6 @@ client = OpenAI(
 )
 
 
-def get_token_price(token_address, chain):
-    token_address_string = ",".join(token_address) if isinstance(token_address, list) else token_address
-    url = f"https://api.dexscreener.com/latest/dex/tokens/{token_address_string}"
-    headers = {"Accept": "application/json"}
-
-    response = requests.get(url, headers=headers)
-    response.raise_for_status()
-    pairs = response.json().get("pairs", [])
-
-
-    return {
-        pair["baseToken"]["address"]: float(pair.get("priceUsd", 0.0))
-        for pair in pairs
-        if "priceUsd" in pair
-    }
-
-
-async def fetch_balances(cdp, address, chain):
-    balances = await cdp.evm.list_token_balances(address, chain, page_size=100)
-    balances_price = {}
-
-    # Collect basic balance info
-    for balance in balances.balances:
-        balances_price[balance.token.contract_address] = {
-            "symbol": balance.token.symbol,
-            "balance": float(balance.amount.amount) / 10**balance.amount.decimals,
-            "chain": chain,
-        }
-
-    # Batch fetch prices (10 at a time)
-    all_balances_price = {}
-    for i in range(0, len(balances.balances), 10):
-        batch = balances.balances[i : i + 10]
-        addresses = [balance.token.contract_address for balance in batch]
-        batch_prices = get_token_price(addresses, chain)
-        all_balances_price.update(batch_prices)
-
-    # Merge prices into balances
-    for balance in balances.balances:
-        addr = balance.token.contract_address
-        price = all_balances_price.get(addr, 0.0)
-        balances_price[addr]["price"] = price
-        balances_price[addr]["value_usd"] = balances_price[addr]["balance"] * price
-
-
-    try:
-        # remove goof
-        balances_price["0x8e5C04F82d6464b420E2018362E7e7aB813cF190"]["price"] = 0
-        balances_price["0x8e5C04F82d6464b420E2018362E7e7aB813cF190"]["value_usd"] = 0
-    except KeyError:
-        pass
-
-    return balances_price
-
-def categorize_tokens(tokens):
-    wallet_tokens = []
-    defi_tokens = []
-    miscellaneous_tokens = []
-
-    for t, data in tokens.items():
-        name = data["symbol"].lower()
-        symbol = data["symbol"].lower()
-
-        # Heuristic rules for DeFi/farm/airdrop tokens
-        if (
-            "moo" in name
-            or "farm" in name
-            or "stake" in name
-            or "lp" in symbol
-            or "stk" in symbol
-            or "moo" in symbol
-            or "cake" in symbol 
-            or "mw" in symbol
-        ):
-            data['protocol'] = "DeFi"
-            defi_tokens.append(data)
-        elif (
-             "airdrop" in name
-            or "reward" in name
-        ):
-            miscellaneous_tokens.append(data)
-        else:
-            wallet_tokens.append(data)
-
-    return wallet_tokens, defi_tokens, miscellaneous_tokens
-
-
-
-async def get_wallet_balances(wallet_address):
-
-    async with CdpClient() as cdp:
-        # Base balances
-        base_balances_price = await fetch_balances(cdp, wallet_address, "base")
-
-        # Ethereum balances
-        eth_balances_price = await fetch_balances(cdp, wallet_address, "ethereum")
-
-        # Merge all balances
-        all_balances = {**base_balances_price, **eth_balances_price}
-
-
-        wallet_tokens, defi_tokens, miscellaneous_tokens = categorize_tokens(all_balances)
-
-        classified_tokens = {
-            "wallet_tokens": wallet_tokens,
-            "defi_tokens": defi_tokens,
-            "miscellaneous_tokens": miscellaneous_tokens
-        }
-
-        return classified_tokens
-
-
-
-
-
 # Configure page
 st.set_page_config(
     page_title="DeFi Portfolio Manager",
@@ -512,6 +499,7 @@ if 'wallet_connected' not in st.session_state:
     st.session_state.transaction_history = []
     st.session_state.cached_balance_data = None
     st.session_state.cached_defi_data = None
+    st.session_state.cached_portfolio = None
     st.session_state.last_fetch_time = None
 
 # Chain ID mappings
@@ -532,10 +520,13 @@ def fetch_all_wallet_data(address):
         # Get balance data 
         data = asyncio.get_event_loop().run_until_complete(get_wallet_balances(address))
 
+        # Values and aggregates are computed once here, not on every rerun
+        portfolio = Portfolio.from_balances(data, address, IGNORED_PRICE_TOKENS)
+        history.record(address, portfolio)
 
         balance_data = {}
         balance_data["tokens"] = data['wallet_tokens']
-        balance_data["total_balance_usd"] = sum(token['value_usd'] for token in balance_data["tokens"])
+        balance_data["total_balance_usd"] = portfolio.total_crypto
 
         # Get DeFi positions
         defi_data = data['defi_tokens']
@@ -544,23 +535,30 @@ def fetch_all_wallet_data(address):
         
         # Get NFT data
         
-        return balance_data, defi_data
+        return balance_data, defi_data, portfolio
 
-def calculate_portfolio_metrics(balance_data, defi_data):
+def calculate_portfolio_metrics(portfolio, address=None):
     """Calculate portfolio metrics from real data"""
-    if not balance_data:
+    if portfolio is None:
         return 0, 0, 0, 0
     
-    total_crypto = balance_data.get('total_balance_usd', 0)
-    total_defi = sum(pos.get('value_usd', 0) for pos in defi_data) if defi_data else 0
-    total_portfolio = total_crypto + total_defi
+    total_crypto = portfolio.total_crypto
+    total_defi = portfolio.total_defi
+    total_portfolio = portfolio.total
     
-    # Calculate 24h change (simulated for demo)
-    daily_change = total_portfolio * 0.025  # 2.5% gain
+    # 24h change from the recorded history (0 until it reaches back a day)
+    change = history.changes(address, "total")["24h"] if address else None
+    daily_change = change[0] if change else 0.0
     
     return total_portfolio, total_crypto, total_defi, daily_change
 
 
+def format_change(address, column, window="24h"):
+    """A metric delta like "+2.5%" from the recorded history, or None if there is not enough of it"""
+    change = history.changes(address, column)[window]
+    return f"{change[1] * 100:+.1f}%" if change else None
+
+
 
 
 # Sidebar for wallet connection and overview
@@ -581,17 +579,18 @@ with st.sidebar:
         if st.button("🔗 Connect Wallet", key="connect_wallet") and wallet_input:
             with st.spinner("Connecting to wallet..."):
                 # Fetch real wallet data
-                balance_data, defi_data = fetch_all_wallet_data(wallet_input)
+                balance_data, defi_data, portfolio = fetch_all_wallet_data(wallet_input)
                 
                 if balance_data:
                     st.session_state.wallet_connected = True
                     st.session_state.wallet_address = wallet_input
                     st.session_state.cached_balance_data = balance_data
                     st.session_state.cached_defi_data = defi_data
+                    st.session_state.cached_portfolio = portfolio
                     st.session_state.last_fetch_time = datetime.now()
                     
                     # Calculate total portfolio value
-                    total_portfolio, _, _, _ = calculate_portfolio_metrics(balance_data, defi_data)
+                    total_portfolio, _, _, _ = calculate_portfolio_metrics(portfolio)
                     st.session_state.wallet_balance = total_portfolio
                     
                     st.success("Wallet connected successfully!")
@@ -609,6 +608,7 @@ with st.sidebar:
                 st.session_state.wallet_balance = .0
                 st.session_state.cached_balance_data = None
                 st.session_state.cached_defi_data = None
+                st.session_state.cached_portfolio = None
                 st.rerun()
         
         st.markdown(f"**Address:** `{st.session_state.wallet_address[:10]}...`")
@@ -617,13 +617,14 @@ with st.sidebar:
         # Refresh data button
         if st.button("🔄 Refresh Data"):
             with st.spinner("Refreshing wallet data..."):
-                balance_data, defi_data = fetch_all_wallet_data(st.session_state.wallet_address)
+                balance_data, defi_data, portfolio = fetch_all_wallet_data(st.session_state.wallet_address)
                 if balance_data:
                     st.session_state.cached_balance_data = balance_data
                     st.session_state.cached_defi_data = defi_data
+                    st.session_state.cached_portfolio = portfolio
                     st.session_state.last_fetch_time = datetime.now()
                     
-                    total_portfolio, _, _, _ = calculate_portfolio_metrics(balance_data, defi_data)
+                    total_portfolio, _, _, _ = calculate_portfolio_metrics(portfolio)
                     st.session_state.wallet_balance = total_portfolio
                     st.success("Data refreshed!")
                     st.rerun()
@@ -635,17 +636,17 @@ with st.sidebar:
     # Portfolio metrics in sidebar
     if st.session_state.wallet_connected and st.session_state.cached_balance_data:
         total_portfolio, total_crypto, total_defi, daily_change = calculate_portfolio_metrics(
-            st.session_state.cached_balance_data, 
-            st.session_state.cached_defi_data
+            st.session_state.cached_portfolio, st.session_state.wallet_address
         )
+        total_delta = format_change(st.session_state.wallet_address, "total")
         
         st.markdown("<div class='sidebar-metric'>", unsafe_allow_html=True)
         st.metric("Total Portfolio Value", f"${total_portfolio:,.2f}", 
-                 f"+${daily_change:,.2f} (+{(daily_change/total_portfolio)*100:.1f}%)")
+                 f"{'+' if daily_change >= 0 else '-'}${abs(daily_change):,.2f} ({total_delta})" if total_delta else None)
         st.markdown("</div>", unsafe_allow_html=True)
         
         st.markdown("<div class='sidebar-metric'>", unsafe_allow_html=True)
-        st.metric("Crypto Assets", f"${total_crypto:,.2f}", "+8.2%")
+        st.metric("Crypto Assets", f"${total_crypto:,.2f}", format_change(st.session_state.wallet_address, "crypto"))
         st.markdown("</div>", unsafe_allow_html=True)
         
         st.markdown("<div class='sidebar-metric'>", unsafe_allow_html=True)
@@ -669,27 +670,28 @@ with tab1:
     else:
         balance_data = st.session_state.cached_balance_data
         defi_data = st.session_state.cached_defi_data
+        portfolio = st.session_state.cached_portfolio
         
         if balance_data:
-            total_portfolio, total_crypto, total_defi, daily_change = calculate_portfolio_metrics(balance_data, defi_data)
+            address = st.session_state.wallet_address
+            total_portfolio, total_crypto, total_defi, daily_change = calculate_portfolio_metrics(portfolio, address)
             
             # Portfolio overview metrics
             col1, col2, col3, col4 = st.columns(4)
             
             with col1:
                 st.markdown("<div class='metric-card'>", unsafe_allow_html=True)
-                st.metric("Total Balance", f"${total_portfolio:,.2f}", 
-                         f"+{(daily_change/total_portfolio)*100:.1f}%")
+                st.metric("Total Balance", f"${total_portfolio:,.2f}", format_change(address, "total"))
                 st.markdown("</div>", unsafe_allow_html=True)
                 
             with col2:
                 st.markdown("<div class='metric-card'>", unsafe_allow_html=True)
-                st.metric("Crypto Assets", f"${total_crypto:,.2f}", "+8.2%")
+                st.metric("Crypto Assets", f"${total_crypto:,.2f}", format_change(address, "crypto"))
                 st.markdown("</div>", unsafe_allow_html=True)
                 
             with col3:
                 st.markdown("<div class='metric-card'>", unsafe_allow_html=True)
-                st.metric("DeFi Positions", f"${total_defi:,.2f}", "+18.7%")
+                st.metric("DeFi Positions", f"${total_defi:,.2f}", format_change(address, "defi"))
                 st.markdown("</div>", unsafe_allow_html=True)
                 
             with col4:
@@ -708,43 +710,45 @@ with tab1:
                 
                 if balance_data.get('tokens'):
                     # Create pie chart for crypto allocation
-                    tokens = balance_data['tokens']
-                    values = [token['value_usd'] for token in tokens]
-                    labels = [token['symbol'] for token in tokens]
+                    tokens = portfolio.holdings("wallet")
                     
-                    fig_pie = px.pie(values=values, names=labels, title="Crypto Asset Allocation")
+                    fig_pie = px.pie(tokens, values="value_usd", names="symbol", title="Crypto Asset Allocation")
                     fig_pie.update_traces(textposition='inside', textinfo='percent+label')
                     st.plotly_chart(fig_pie, use_container_width=True)
                     
-                    # Real crypto assets table
-                    crypto_df = pd.DataFrame([
-                        {
-                            'Asset': token['symbol'],
-                            'Balance': f"{token['balance']:.4f}",
-                            'Price': f"${token['price']:,.2f}",
-                            'Value': f"${token['value_usd']:,.2f}",
-                            'Weight': f"{(token['value_usd']/total_crypto)*100:.1f}%"
+                    # Real crypto assets table; numbers stay numeric and are formatted by the grid
+                    crypto_df = pd.DataFrame({
+                        'Asset': tokens['symbol'],
+                        'Chain': tokens['chain'],
+                        'Balance': tokens['balance'],
+                        'Price': tokens['price'],
+                        'Value': tokens['value_usd'],
+                        'Weight': tokens['weight'] * 100,
+                    }).sort_values('Value', ascending=False)
+                    st.dataframe(
+                        crypto_df,
+                        use_container_width=True,
+                        hide_index=True,
+                        column_config={
+                            'Balance': st.column_config.NumberColumn(format="%.4f"),
+                            'Price': st.column_config.NumberColumn(format="$%.2f"),
+                            'Value': st.column_config.NumberColumn(format="$%.2f"),
+                            'Weight': st.column_config.NumberColumn(format="%.1f%%"),
                         }
-                        for token in tokens
-                    ])
-                    st.dataframe(crypto_df, use_container_width=True)
+                    )
             
            
             
             # Portfolio performance chart (simulated historical data)
             st.subheader("📈 Portfolio Performance (30 days)")
             
-            dates = [datetime.now() - timedelta(days=i) for i in range(30, 0, -1)]
-            # Generate realistic portfolio performance based on current value
-            base_value = total_portfolio
-            performance_values = []
-            for i in range(30):
-                daily_variance = np.random.normal(0, base_value * 0.02)  # 2% daily variance
-                trend = (i / 30) * base_value * 0.1  # 10% growth trend over 30 days
-                value = base_value - trend + daily_variance
-                performance_values.append(max(value, base_value * 0.8))  # Floor at 80% of current
+            # Recorded refreshes over the last 30 days, at most one point per 3 hours
+            now = time.time()
+            performance = history.downsample(address, now - 30 * DAY, now, interval=DAY / 8)
+            if len(performance) < 2:
+                st.info("Performance history builds up as the wallet is refreshed; check back after a few refreshes.")
             
-            fig_line = px.line(x=dates, y=performance_values, title="Portfolio Value Over Time")
+            fig_line = px.line(x=performance.index, y=performance.to_numpy(), title="Portfolio Value Over Time")
             fig_line.update_traces(line_color='#667eea', line_width=3)
             fig_line.update_layout(
                 showlegend=False,
@@ -857,7 +861,17 @@ with tab2:
             st.session_state.chat_history.append({'sender': 'user','content': "How can I optimize my yield farming strategies?",'timestamp': datetime.now()})
             st.rerun()
         if col3.button("⚠️ Risk Assessment"):
-            st.session_state.chat_history.append({'sender': 'user','content': "Assess the risk level of my current positions",'timestamp': datetime.now()})
+            prompt = "Assess the risk level of my current positions"
+            st.session_state.chat_history.append({'sender': 'user','content': prompt,'timestamp': datetime.now()})
+            # Numbers are computed locally and handed to the agent with the question
+            report = RiskReport.for_wallet(
+                st.session_state.cached_portfolio, st.session_state.wallet_address,
+                history=history, depth=token_depth
+            )
+            wallet_data = (st.session_state.cached_balance_data, st.session_state.cached_defi_data)
+            with st.spinner("Assessing portfolio risk..."):
+                ai_response = run_agent_query(f"{prompt}\n\nRisk metrics:\n{report.to_context()}", wallet_data)
+            st.session_state.chat_history.append({'sender': 'ai','content': ai_response,'timestamp': datetime.now()})
             st.rerun()
         if col4.button("🔄 Rebalance Advice"):
             st.session_state.chat_history.append({'sender': 'user','content': "Should I rebalance my portfolio?",'timestamp': datetime.now()})
@@ -0,0 +1,165 @@
+import re
+import bisect
+from collections import defaultdict
+
+# Symbols and shorthand users type, mapped to the token names used in the graph.
+# The subgraph data only carries token names, so symbols have to come from here.
+COMMON_ALIASES = {
+    "weth": "wrapped ether",
+    "eth": "wrapped ether",
+    "ether": "wrapped ether",
+    "usdc": "usd coin",
+    "usdbc": "usd base coin",
+    "usdt": "tether usd",
+    "tether": "tether usd",
+    "dai": "dai stablecoin",
+    "wbtc": "wrapped btc",
+    "cbbtc": "coinbase wrapped btc",
+    "cbeth": "coinbase wrapped staked eth",
+    "wsteth": "wrapped liquid staked ether 2.0",
+    "steth": "liquid staked ether 2.0",
+    "uni": "uniswap",
+    "link": "chainlink token",
+    "aero": "aerodrome",
+}
+
+_ADDRESS_RE = re.compile(r"^0x[0-9a-f]{40}$")
+_MIN_PREFIX = 4
+_MIN_FUZZY_SCORE = 0.7
+
+
+def _normalize(text: str) -> str:
+    return " ".join(text.casefold().split())
+
+
+def _trigrams(text: str) -> set:
+    padded = f"  {text} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class TokenAliasIndex:
+    """
+    Maps what users type (names, symbols, contract addresses, misspellings) to
+    canonical token ids from the liquidity graph. Exact aliases are a dict lookup;
+    partial input falls back to a sorted prefix index and then a trigram index.
+    On a collision the token with the most pool liquidity wins.
+    """
+    def __init__(self):
+        self.tokens = {}                        # token id -> {"id", "name", "chain", "address", "liquidity"}
+        self._aliases = defaultdict(set)        # normalized alias -> token ids
+        self._sorted_aliases = []
+        self._trigrams = defaultdict(list)      # trigram -> aliases containing it
+        self._gram_counts = {}                  # alias -> number of distinct trigrams
+
+    @classmethod
+    def from_graph(cls, graph) -> "TokenAliasIndex":
+        index = cls()
+        liquidity = defaultdict(float)
+        for node, data in graph.nodes(data=True):
+            if data.get("type") == "pool":
+                tvl = float(data.get("totalValueLockedUSD", 0))
+                for key in ("token0", "token1"):
+                    liquidity[f"{data['chain']}_{data[key]}"] += tvl
+        for node, data in graph.nodes(data=True):
+            if data.get("type") == "token":
+                index.add_token(node, data["name"], data["chain"], liquidity.get(node, 0.0))
+        index.build()
+        return index
+
+    def add_token(self, token_id: str, name: str, chain: str, liquidity: float = 0.0):
+        address = token_id.split("_", 1)[1].lower() if "_" in token_id else None
+        self.tokens[token_id] = {
+            "id": token_id, "name": name, "chain": chain,
+            "address": address, "liquidity": liquidity
+        }
+        self._aliases[_normalize(name)].add(token_id)
+        if address:
+            self._aliases[address].add(token_id)
+
+    def build(self):
+        """Adds the common aliases and (re)builds the prefix and trigram indexes."""
+        for alias, name in COMMON_ALIASES.items():
+            for token_id in self._aliases.get(name, ()):
+                self._aliases[alias].add(token_id)
+
+        self._sorted_aliases = sorted(a for a in self._aliases if not _ADDRESS_RE.match(a))
+        self._trigrams.clear()
+        for alias in self._sorted_aliases:
+            grams = _trigrams(alias)
+            self._gram_counts[alias] = len(grams)
+            for gram in grams:
+                self._trigrams[gram].append(alias)
+
+    def resolve(self, text: str, chain: str = None):
+        """
+        Resolves user input to a token record, optionally restricted to one chain.
+        Returns None if nothing plausible matches.
+        """
+        key = _normalize(text)
+        if not key:
+            return None
+
+        best = self._best(self._aliases.get(key, ()), chain)
+        if best or _ADDRESS_RE.match(key):
+            return best
+
+        if len(key) >= _MIN_PREFIX:
+            start = bisect.bisect_left(self._sorted_aliases, key)
+            candidates = set()
+            for alias in self._sorted_aliases[start:]:
+                if not alias.startswith(key):
+                    break
+                candidates.update(self._aliases[alias])
+            best = self._best(candidates, chain)
+            if best:
+                return best
+
+        return self._fuzzy(key, chain)
+
+    def canonical_name(self, text: str, chain: str = None) -> str:
+        """The lowercase graph name for `text`, or `text` unchanged if it cannot be resolved."""
+        token = self.resolve(text, chain)
+        return token["name"].lower() if token else text
+
+    def _fuzzy(self, key: str, chain: str = None):
+        grams = _trigrams(key)
+        overlap = defaultdict(int)
+        for gram in grams:
+            for alias in self._trigrams.get(gram, ()):
+                overlap[alias] += 1
+
+        best, best_rank = None, None
+        for alias, shared in overlap.items():
+            # Dice coefficient over trigram sets
+            score = 2 * shared / (len(grams) + self._gram_counts[alias])
+            if score < _MIN_FUZZY_SCORE or (best_rank and score < best_rank[0]):
+                continue
+            token = self._best(self._aliases[alias], chain)
+            if token and (best_rank is None or (score, token["liquidity"]) > best_rank):
+                best, best_rank = token, (score, token["liquidity"])
+        return best
+
+    def _best(self, token_ids, chain: str = None):
+        candidates = [self.tokens[t] for t in token_ids if chain is None or self.tokens[t]["chain"] == chain]
+        return max(candidates, key=lambda t: t["liquidity"], default=None)
+
+
+# --- Example Usage ---
+if __name__ == "__main__":
+    import time
+    from graph_tool import load_graph
+
+    G = load_graph()
+    if G:
+        start = time.perf_counter()
+        index = TokenAliasIndex.from_graph(G)
+        print(f"Alias index built in {(time.perf_counter() - start) * 1e3:.1f} ms")
+
+        queries = [("weth", "eth"), ("USDC", "base"), ("0xc02aaa39b223fe8d0a0e5c4f27ead9083c756cc2", "eth"),
+                   ("wrapped eth", "eth"), ("usd coi", "base"), ("wraped ether", "base")]
+        for text, chain in queries:
+            start = time.perf_counter()
+            for _ in range(1000):
+                token = index.resolve(text, chain)
+            elapsed_us = (time.perf_counter() - start) * 1e3
+            print(f"  {text!r} on {chain} -> {token['name'] if token else None} ({elapsed_us:.1f} µs)")
@@ -0,0 +1,142 @@
+import re
+import sqlite3
+import threading
+
+# Bump whenever the patterns below change, so stored categories get recomputed
+CLASSIFIER_VERSION = 2
+
+# Farm/vault/LP receipts and staking derivatives
+_DEFI_PATTERN = re.compile(r"moo|farm|stake|lp|stk|cake|mw")
+_MISC_PATTERN = re.compile(r"airdrop|reward")
+# Unsolicited tokens that advertise a site or a "claim" in their symbol. Airdrop and reward
+# tokens on their own are "misc", not spam: only a link or call to action marks them.
+_SPAM_PATTERN = re.compile(r"https?:|www\.|\.(?:com|io|org|net|xyz|app)\b|claim|visit")
+
+
+def classify_symbol(symbol: str) -> tuple:
+    """Returns (category, spam) for a token symbol: category is "defi", "misc" or "wallet"."""
+    text = (symbol or "").lower()
+    if _DEFI_PATTERN.search(text):
+        category = "defi"
+    elif _MISC_PATTERN.search(text):
+        category = "misc"
+    else:
+        category = "wallet"
+    return category, bool(_SPAM_PATTERN.search(text))
+
+
+class TokenRegistry:
+    """
+    Token metadata keyed by (chain, address): symbol, decimals, category and spam flag.
+
+    Every known token is held in memory; only tokens that are new, or whose symbol
+    changed, are classified. With a `path` the registry is stored in SQLite and
+    loaded again on start, so a restart does not reclassify anything. The file is
+    only opened (and created) on first use, not when the registry is constructed.
+    """
+    def __init__(self, path: str = None):
+        self.path = path
+        self._tokens = {}       # (chain, address) -> {"symbol", "decimals", "category", "spam"}
+        self._by_key = {}       # (chain, address) as callers pass it, unnormalized -> the same entries
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._loaded = not path
+        self.stats = {"hits": 0, "classified": 0}
+
+    def _load(self):
+        # Opens the store and reads every entry classified by the current rules; once, on first use
+        with self._lock:
+            if self._loaded:
+                return
+            with self._conn() as conn:
+                conn.execute("PRAGMA journal_mode=WAL")
+                conn.execute(
+                    "CREATE TABLE IF NOT EXISTS tokens ("
+                    " chain TEXT NOT NULL, address TEXT NOT NULL, symbol TEXT, decimals INTEGER,"
+                    " category TEXT NOT NULL, spam INTEGER NOT NULL, classifier INTEGER NOT NULL,"
+                    " PRIMARY KEY (chain, address))"
+                )
+            rows = self._conn().execute(
+                "SELECT chain, address, symbol, decimals, category, spam FROM tokens WHERE classifier = ?",
+                (CLASSIFIER_VERSION,)
+            )
+            for chain, address, symbol, decimals, category, spam in rows:
+                self._tokens[(chain, address)] = {
+                    "symbol": symbol, "decimals": decimals, "category": category, "spam": bool(spam)
+                }
+            self._loaded = True
+
+    def _conn(self) -> sqlite3.Connection:
+        # sqlite3 connections cannot be shared across threads
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = self._local.conn = sqlite3.connect(self.path, timeout=5)
+        return conn
+
+    def __len__(self):
+        if not self._loaded:
+            self._load()
+        return len(self._tokens)
+
+    def get(self, chain: str, address: str):
+        if not self._loaded:
+            self._load()
+        return self._tokens.get((chain, address.lower()))
+
+    def lookup(self, chain: str, address: str, symbol: str, decimals: int = None) -> dict:
+        """The registry entry for a token, classifying and storing it if it is new."""
+        return self.lookup_many([(chain, address, symbol, decimals)])[0]
+
+    def lookup_many(self, tokens) -> list:
+        """lookup() for an iterable of (chain, address, symbol, decimals); writes new entries in one transaction."""
+        if not self._loaded:
+            self._load()
+        entries, new = [], {}
+        known = self._tokens
+        with self._lock:
+            for chain, address, symbol, decimals in tokens:
+                key = (chain, address.lower())
+                entry = known.get(key)
+                if entry is None or entry["symbol"] != symbol or (decimals is not None and entry["decimals"] != decimals):
+                    category, spam = classify_symbol(symbol)
+                    entry = known[key] = new[key] = {
+                        "symbol": symbol, "decimals": decimals, "category": category, "spam": spam
+                    }
+                entries.append(entry)
+            self.stats["classified"] += len(new)
+            self.stats["hits"] += len(entries) - len(new)
+        if new and self.path:
+            with self._conn() as conn:
+                conn.executemany(
+                    "INSERT OR REPLACE INTO tokens (chain, address, symbol, decimals, category, spam, classifier)"
+                    " VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    [(chain, address, e["symbol"], e["decimals"], e["category"], int(e["spam"]), CLASSIFIER_VERSION)
+                     for (chain, address), e in new.items()]
+                )
+        return entries
+
+    def lookup_balances(self, balances: dict) -> list:
+        """
+        lookup_many() for balances keyed by (chain, address), as wallet_analyzer
+        builds them ({(chain, address): {"symbol", "decimals", ...}}). Entries are
+        also indexed by those keys as given, so refreshing known tokens costs one
+        dict lookup each, with no address normalization.
+        """
+        entries, missing = [], []
+        by_key = self._by_key
+        with self._lock:
+            for key, data in balances.items():
+                entry = by_key.get(key)
+                # Symbols can be renamed; decimals are fixed when a token is deployed
+                if entry is None or entry["symbol"] != data["symbol"]:
+                    missing.append(key)
+                entries.append(entry)
+            self.stats["hits"] += len(entries) - len(missing)
+        if missing:
+            found = self.lookup_many(
+                (chain, address, balances[chain, address]["symbol"], balances[chain, address].get("decimals"))
+                for chain, address in missing
+            )
+            by_key.update(zip(missing, found))
+            entries = [by_key[key] for key in balances]
+        return entries
@@ -2,14 +2,32 @@ import time
 from web3 import Web3
 from eth_account import Account
 
+from allowances import ERC20_ALLOWANCE_ABI, allowance_cache, sign_permit
+from fees import fee_oracle
+from multicall import multicall, read_call
+from nonces import nonce_manager
+from quoter import POOL_ABI, pool_address, pool_fee, pool_state_cache, quote_exact_input, quote_exact_output
+from rpc import call_tx, chain_id, contract, prepare_transaction, web3_for
+
+# SwapRouter02, which UNISWAP_ROUTER_ABI describes (no deadline in the swap structs)
 UNISWAP_ROUTER = {
-    "ETH": "0xE592427A0AEce92De3Edee1F18E0157C05861564",
-    "BASE": "0xE592427A0AEce92De3Edee1F18E0157C05861564"
+    "ETH": "0x68b3465833fb72A70ecDF485E0e4C7bD8665Fc45",
+    "BASE": "0x2626664c2603336E57B271c5C0b26F421741e481"
+}
+
+# The WETH9 the routers wrap and unwrap ETH with
+WETH9 = {
+    "ETH": "0xC02aaA39b223FE8D0A0e5C4F27eAD9083C756Cc2",
+    "BASE": "0x4200000000000000000000000000000000000006"
 }
 
+# SwapRouter02 recipient aliases: the caller, and the router itself (to unwrap or sweep afterwards)
+MSG_SENDER = "0x0000000000000000000000000000000000000001"
+ADDRESS_THIS = "0x0000000000000000000000000000000000000002"
+
 NONFUNGIBLE_POSITION_MANAGER = {
     "ETH": "0xC36442b4a4522E871399CD717aBDD847Ab11FE88",
-    "BASE": "0xC36442b4a4522E871399CD717aBDD847Ab11FE88"
+    "BASE": "0x03a520b32C04BF3bEEf7BEb72E919cf822Ed34f1"
 }
 
 ERC20_ABI = [
@@ -18,6 +36,9 @@ ERC20_ABI = [
     {"constant": True,"inputs":[],"name":"decimals","outputs":[{"name":"","type":"uint8"}],"type":"function"}
 ]
 
+ERC20_FUNCTIONS = {entry["name"]: entry for entry in ERC20_ABI}
+ERC20_ALLOWANCE_FUNCTIONS = {entry["name"]: entry for entry in ERC20_ALLOWANCE_ABI}
+
 POSITION_MANAGER_ABI = [
     # mint liquidity
     {"inputs":[
@@ -153,7 +174,7 @@ UNISWAP_ROUTER_ABI = [
         "type":"function"
     },
     {
-        "inputs":[{"internalType":"bytes[]","name":"data","type":"bytes[]"},{"internalType":"uint256","name":"deadline","type":"uint256"}],
+        "inputs":[{"internalType":"uint256","name":"deadline","type":"uint256"},{"internalType":"bytes[]","name":"data","type":"bytes[]"}],
         "name":"multicall",
         "outputs":[{"internalType":"bytes[]","name":"results","type":"bytes[]"}],
         "stateMutability":"payable",
@@ -195,12 +216,19 @@ UNISWAP_ROUTER_ABI = [
         "type":"function"
     },
     {
-        "inputs":[{"internalType":"uint256","name":"amountMinimum","type":"uint256"},{"internalType":"address","name":"recipient","type":"address"}],
+        "inputs":[],
         "name":"refundETH",
         "outputs":[],
         "stateMutability":"payable",
         "type":"function"
     },
+    {
+        "inputs":[{"internalType":"address","name":"token","type":"address"},{"internalType":"uint256","name":"amountMinimum","type":"uint256"},{"internalType":"address","name":"recipient","type":"address"}],
+        "name":"sweepToken",
+        "outputs":[],
+        "stateMutability":"payable",
+        "type":"function"
+    },
     {
         "inputs":[
             {"internalType":"address","name":"token","type":"address"},
@@ -256,51 +284,180 @@ UNISWAP_ROUTER_ABI = [
 ]
 
 
+# Gas limits for transactions sent right behind a still-pending approval, which cannot be estimated until it is mined
+SWAP_GAS = 300000
+SWAP_HOP_GAS = 150000       # each pool after the first in a multi-hop swap
+MINT_POSITION_GAS = 600000
+ROUTER_PAYMENT_GAS = 50000  # unwrapWETH9, refundETH or sweepToken inside a router multicall
+
+
+def encode_path(tokens, fees) -> bytes:
+    """A V3 swap path: token, fee (3 bytes), token, fee, ..., token, as exactInput() takes it."""
+    if len(tokens) != len(fees) + 1:
+        raise ValueError("A path needs exactly one fee between each pair of tokens")
+    path = bytes.fromhex(Web3.to_checksum_address(tokens[0])[2:])
+    for fee, token in zip(fees, tokens[1:]):
+        path += fee.to_bytes(3, "big") + bytes.fromhex(Web3.to_checksum_address(token)[2:])
+    return path
+
+
+class RouterBundle:
+    """
+    Router operations (swaps, unwrapping WETH, refunding ETH, sweeping tokens)
+    collected into one multicall(deadline, data[]) transaction: one nonce, one
+    gas estimate and one confirmation for the whole sequence, which reverts as
+    a whole if any step fails. Build it with UniswapV3Helper.bundle().
+
+    Tokens the swaps spend are approved for the router once per token, for
+    their total, when the bundle is sent.
+    """
+    def __init__(self, helper, chain: str, deadline: int = None):
+        self.helper = helper
+        self.chain = chain
+        self.router = helper.router[chain]
+        self.deadline = deadline or int(time.time()) + 300
+        self.calls = []
+        self.value = 0
+        self.spends = {}            # token -> amount the router will pull
+        self.fallback_gas = 0       # gas limit to use while an approval is pending
+
+    def _add(self, fn_name: str, *args, gas: int):
+        self.calls.append(self.router.encode_abi(fn_name, args=list(args)))
+        self.fallback_gas += gas
+        return self
+
+    def _pay(self, token: str, amount: int, with_eth: bool):
+        if with_eth:
+            # The router wraps msg.value when it pays WETH in
+            if token.lower() != WETH9[self.chain].lower():
+                raise ValueError("Only WETH swaps can be paid with ETH")
+            self.value += amount
+        else:
+            token = Web3.to_checksum_address(token)
+            self.spends[token] = self.spends.get(token, 0) + amount
+
+    def swap_exact_input_single(self, token_in: str, token_out: str, fee: int, amount_in: int, amount_out_min: int,
+                                recipient: str = None, with_eth: bool = False):
+        """Adds an exactInputSingle; with `with_eth`, `token_in` is WETH paid for with the transaction's ETH."""
+        self._pay(token_in, amount_in, with_eth)
+        params = (Web3.to_checksum_address(token_in), Web3.to_checksum_address(token_out), fee,
+                  recipient or self.helper.address, amount_in, amount_out_min, 0)
+        return self._add("exactInputSingle", params, gas=SWAP_GAS)
+
+    def swap_exact_input(self, tokens, fees, amount_in: int, amount_out_min: int, recipient: str = None,
+                         with_eth: bool = False):
+        """Adds a multi-hop exactInput along `tokens` (see UniswapV3Helper.swap_exact_input())."""
+        self._pay(tokens[0], amount_in, with_eth)
+        params = (encode_path(tokens, fees), recipient or self.helper.address, amount_in, amount_out_min)
+        return self._add("exactInput", params, gas=SWAP_GAS + SWAP_HOP_GAS * (len(fees) - 1))
+
+    def unwrap_weth(self, amount_min: int, recipient: str = None):
+        """Unwraps all the WETH the router holds (swaps sent to ADDRESS_THIS) and sends it on as ETH."""
+        return self._add("unwrapWETH9", amount_min, Web3.to_checksum_address(recipient or self.helper.address),
+                         gas=ROUTER_PAYMENT_GAS)
+
+    def sweep_token(self, token: str, amount_min: int, recipient: str = None):
+        """Sends all of `token` the router holds (swaps sent to ADDRESS_THIS) to `recipient`."""
+        return self._add("sweepToken", Web3.to_checksum_address(token), amount_min,
+                         Web3.to_checksum_address(recipient or self.helper.address), gas=ROUTER_PAYMENT_GAS)
+
+    def refund_eth(self):
+        """Returns ETH sent with the transaction that the swaps did not use."""
+        return self._add("refundETH", gas=ROUTER_PAYMENT_GAS)
+
+    def transaction(self) -> dict:
+        """The unsigned multicall transaction ({"to", "data", "value"})."""
+        if not self.calls:
+            raise ValueError("The bundle has no operations")
+        return call_tx(self.router, "multicall", self.deadline, self.calls, value=self.value)
+
+    def estimate_gas(self) -> int:
+        """Gas for the whole bundle, estimated by the node (needs the router's allowances in place)."""
+        return self.helper.w3[self.chain].eth.estimate_gas({"from": self.helper.address, **self.transaction()})
+
+    def send(self, gas: int = None) -> dict:
+        """
+        Approves what the swaps spend where needed, then sends the bundle:
+        {"approve_txs", "tx"}. Gas is `gas` (e.g. from estimate_gas()) or
+        estimated for the whole bundle, unless an approval was just sent, in
+        which case the per-operation limits apply (an estimate would revert
+        until the approval is mined).
+        """
+        router = self.router.address
+        approvals = self.helper.ensure_allowances(self.chain, [(token, amount, router) for token, amount in self.spends.items()])
+        tx = self.transaction()
+        if any(approvals):
+            tx["gas"] = self.fallback_gas
+        elif gas:
+            tx["gas"] = gas
+        tx_hash = self.helper._spend(self.chain, tx, [(token, router, amount) for token, amount in self.spends.items()])
+        return {"approve_txs": [approval for approval in approvals if approval], "tx": tx_hash}
+
+
 class UniswapV3Helper:
-    def __init__(self, private_key: str, rpc_urls: dict):
+    def __init__(self, private_key: str, rpc_urls: dict, nonces=None, fees=None, allowances=None, pools=None):
         self.account = Account.from_key(private_key)
         self.address = self.account.address
-        self.w3 = {chain: Web3(Web3.HTTPProvider(url)) for chain, url in rpc_urls.items()}
-        self.router = {chain: self.w3[chain].eth.contract(address=UNISWAP_ROUTER[chain], abi=UNISWAP_ROUTER_ABI) for chain in rpc_urls}
-        self.position_manager = {chain: self.w3[chain].eth.contract(address=NONFUNGIBLE_POSITION_MANAGER[chain], abi=POSITION_MANAGER_ABI) for chain in rpc_urls}
+        self.w3 = {chain: web3_for(url) for chain, url in rpc_urls.items()}
+        self.nonces = nonces or nonce_manager
+        self.fees = fees or fee_oracle
+        self.allowances = allowances or allowance_cache
+        self.nonces.subscribe(self.allowances.transaction_failed)
+        self.pools = pools or pool_state_cache
+        self.router = {chain: contract(self.w3[chain], UNISWAP_ROUTER[chain], UNISWAP_ROUTER_ABI) for chain in rpc_urls}
+        self.position_manager = {chain: contract(self.w3[chain], NONFUNGIBLE_POSITION_MANAGER[chain], POSITION_MANAGER_ABI) for chain in rpc_urls}
 
     def _build_and_send_tx(self, chain, tx):
+        # Gas (unless given), fees, chain id and the balance check come from one batched round trip
         w3 = self.w3[chain]
+        tx = prepare_transaction(chain, w3, self.account, tx, self.fees, self.nonces)
+        return self.nonces.send(chain, w3, self.account, tx)
 
-        # Estimate gas if not provided
-        if "gas" not in tx:
-            tx["gas"] = tx.get("gas", w3.eth.estimate_gas(tx))
-
-        # Estimate max fee
-        fee_data = w3.eth.fee_history(1, "latest", reward_percentiles=[50])
-        max_priority_fee = w3.to_wei(2, "gwei")
-        base_fee = fee_data["baseFeePerGas"][-1] if fee_data["baseFeePerGas"] else w3.to_wei(1, "gwei")
-        max_fee = base_fee + max_priority_fee
-        tx.setdefault("maxFeePerGas", max_fee)
-        tx.setdefault("maxPriorityFeePerGas", max_priority_fee)
-
-        # Check balance
-        estimated_cost = tx["gas"] * tx["maxFeePerGas"]
-        balance = w3.eth.get_balance(self.address)
-        if balance < estimated_cost:
-            raise Exception(f"Insufficient ETH for gas. Balance: {balance}, Estimated cost: {estimated_cost}")
-
-        signed = self.account.sign_transaction(tx)
-        return w3.eth.send_raw_transaction(signed.raw_transaction).hex()
-
-    def approve_token(self, chain: str, token_address: str, amount: int):
-        token = self.w3[chain].eth.contract(address=token_address, abi=ERC20_ABI)
-        tx = token.functions.approve(NONFUNGIBLE_POSITION_MANAGER[chain], amount).build_transaction({
-            "from": self.address,
-            "nonce": self.w3[chain].eth.get_transaction_count(self.address)
-        })
-        return self._build_and_send_tx(chain, tx)
-
-    def add_liquidity(self, chain: str, token0: str, token1: str, fee: int, tick_lower: int, tick_upper: int, amount0: int, amount1: int):
-        deadline = int(time.time()) + 300
+    def _approve(self, chain: str, token_address: str, spender: str, amount: int) -> str:
+        token = contract(self.w3[chain], token_address, ERC20_ABI)
+        return self._build_and_send_tx(chain, call_tx(token, "approve", Web3.to_checksum_address(spender), amount))
+
+    def approve_token(self, chain: str, token_address: str, amount: int, spender: str = None):
+        """Approves `spender` (the position manager by default) to move `amount` of the token."""
+        spender = spender or NONFUNGIBLE_POSITION_MANAGER[chain]
+        tx_hash = self._approve(chain, token_address, spender, amount)
+        self.allowances.record_approval(chain, self.address, token_address, spender, amount, tx_hash)
+        return tx_hash
 
+    def ensure_allowances(self, chain: str, requests) -> list:
+        """
+        Makes sure each (token, amount, spender) is covered for a spend about to
+        be sent (swap_exact_input_single, add_liquidity), reading every
+        allowance in one batch and approving only where it is short. Returns
+        the approval tx hash, or None where no approval was needed.
+        """
+        requests = list(requests)
         w3 = self.w3[chain]
-    
+        self.allowances.load(chain, w3, self.address, [(token, spender) for token, _, spender in requests])
+        return [
+            self.allowances.ensure(
+                chain, w3, self.address, token, spender, amount,
+                lambda total, token=token, spender=spender: self._approve(chain, token, spender, total)
+            )
+            for token, amount, spender in requests
+        ]
+
+    def ensure_allowance(self, chain: str, token_address: str, amount: int, spender: str):
+        return self.ensure_allowances(chain, [(token_address, amount, spender)])[0]
+
+    def _spend(self, chain: str, tx: dict, spends) -> str:
+        # Sends a transaction that uses allowances and settles what ensure_allowances() reserved
+        try:
+            tx_hash = self._build_and_send_tx(chain, tx)
+        except Exception:
+            for token, spender, amount in spends:
+                self.allowances.settle(chain, self.address, token, spender, amount, sent=False)
+            raise
+        for token, spender, amount in spends:
+            self.allowances.settle(chain, self.address, token, spender, amount)
+        return tx_hash
+
+    def add_liquidity(self, chain: str, token0: str, token1: str, fee: int, tick_lower: int, tick_upper: int, amount0: int, amount1: int, gas: int = None):
         params = (
             Web3.to_checksum_address(token0),
             Web3.to_checksum_address(token1),
@@ -314,24 +471,103 @@ class UniswapV3Helper:
             self.address,     # recipient
             int(time.time()) + 600  # deadline (10 min)
         )
+        tx = call_tx(self.position_manager[chain], "mint", params)
+        if gas:
+            tx["gas"] = gas
+        manager = NONFUNGIBLE_POSITION_MANAGER[chain]
+        return self._spend(chain, tx, [(token0, manager, int(amount0)), (token1, manager, int(amount1))])
 
-        contract = self.position_manager[chain].functions.mint(params)
+    def read(self, chain: str, calls, allow_failure: bool = True) -> list:
+        """
+        Results of many contract reads (ContractFunctions with bound arguments,
+        or multicall.read_call() tuples) from a few Multicall3 calls sent in
+        one round trip. None for reads that failed, with `allow_failure`.
+        """
+        return multicall(self.w3[chain], calls, allow_failure=allow_failure)
 
+    def token_info(self, chain: str, tokens, spenders=None) -> list:
+        """
+        Balance, decimals and allowances (for the router and position manager
+        unless `spenders` is given) of the helper's account for each token, in
+        one read() round trip: [{"token", "balance", "decimals", "allowances"}].
+        Values the token would not return are None. The allowances also
+        refresh the shared allowance cache.
+        """
+        tokens = [Web3.to_checksum_address(token) for token in tokens]
+        spenders = list(spenders or (UNISWAP_ROUTER[chain], NONFUNGIBLE_POSITION_MANAGER[chain]))
+        balance_of, decimals = ERC20_FUNCTIONS["balanceOf"], ERC20_FUNCTIONS["decimals"]
+        allowance = ERC20_ALLOWANCE_FUNCTIONS["allowance"]
+        calls = []
+        for token in tokens:
+            calls += [read_call(token, balance_of, self.address), read_call(token, decimals)]
+            calls += [read_call(token, allowance, self.address, Web3.to_checksum_address(spender)) for spender in spenders]
+        results = self.read(chain, calls)
+        info, width = [], 2 + len(spenders)
+        for i, token in enumerate(tokens):
+            row = results[i * width:(i + 1) * width]
+            allowances = dict(zip(spenders, row[2:]))
+            for spender, amount in allowances.items():
+                if amount is not None:
+                    self.allowances.seed(chain, self.address, token, spender, amount)
+            info.append({"token": token, "balance": row[0], "decimals": row[1], "allowances": allowances})
+        return info
 
-        # ⛽ estimate gas safely
-        estimated_gas = contract.estimate_gas({"from": self.address})
-        max_fee = self.w3[chain].eth.max_priority_fee + self.w3[chain].eth.gas_price
-        priority_fee = self.w3[chain].eth.max_priority_fee
+    def pool_states(self, chain: str, pools) -> list:
+        """Current PoolStates for (token_a, token_b, fee) pools, loaded at most once per block."""
+        addresses = [pool_address(chain, token_a, token_b, fee) for token_a, token_b, fee in pools]
+        return self.pools.get(chain, self.w3[chain], addresses)
 
-        tx = self.position_manager[chain].functions.mint(params).build_transaction({
-            "from": self.address,
-            "nonce": w3.eth.get_transaction_count(self.address),
-            "gas": estimated_gas,
-            "maxFeePerGas": max_fee,
-            "maxPriorityFeePerGas": priority_fee
-        })
+    def _pool_state(self, chain: str, token_in: str, token_out: str, fee: int):
+        (state,) = self.pool_states(chain, [(token_in, token_out, fee)])
+        if state is None:
+            raise Exception(f"No Uniswap V3 pool for {token_in}/{token_out} at fee {fee} on {chain}")
+        return state
 
-        return self._build_and_send_tx(chain, tx)
+    def quote_exact_input_single(self, chain: str, token_in: str, token_out: str, fee: int, amounts) -> list:
+        """
+        Output of swapping each of `amounts` of `token_in` through one pool,
+        simulated locally from the cached pool state (no QuoterV2 call per
+        amount). None where the loaded ticks cannot fill the swap.
+        """
+        state = self._pool_state(chain, token_in, token_out, fee)
+        quotes = quote_exact_input([state], token_in, [int(amount) for amount in amounts])[0]
+        return [None if quote != quote else int(quote) for quote in quotes]
+
+    def route_fees(self, chain: str, tokens, pools) -> list:
+        """
+        The fee tier of each pool on a route (graph_tool.find_swap_route()).
+        Standard tiers are recognized from the pool address; any other pool's
+        fee() is read on chain, all in one multicall.
+        """
+        fees = [pool_fee(chain, token_a, token_b, pool) for token_a, token_b, pool in zip(tokens, tokens[1:], pools)]
+        unknown = [i for i, fee in enumerate(fees) if fee is None]
+        if unknown:
+            fee_abi = next(entry for entry in POOL_ABI if entry["name"] == "fee")
+            for i, fee in zip(unknown, self.read(chain, [read_call(pools[i], fee_abi) for i in unknown])):
+                if fee is None:
+                    raise Exception(f"{pools[i]} on {chain} is not a Uniswap V3 pool")
+                fees[i] = fee
+        return fees
+
+    def quote_exact_input_path(self, chain: str, tokens, fees, amounts) -> list:
+        """
+        Output at the end of a multi-hop path for each of `amounts` in, hop by
+        hop through locally simulated pools (all loaded together). None where
+        a pool cannot fill its hop.
+        """
+        states = self.pool_states(chain, list(zip(tokens, tokens[1:], fees)))
+        quotes = [float(amount) for amount in amounts]
+        for state, token_in, fee in zip(states, tokens, fees):
+            if state is None:
+                raise Exception(f"No Uniswap V3 pool for {token_in} at fee {fee} on {chain}")
+            quotes = quote_exact_input([state], token_in, quotes)[0]
+        return [None if quote != quote else int(quote) for quote in quotes]
+
+    def quote_exact_output_single(self, chain: str, token_in: str, token_out: str, fee: int, amounts) -> list:
+        """Input (fees included) needed to receive each of `amounts` of `token_out`; see quote_exact_input_single()."""
+        state = self._pool_state(chain, token_in, token_out, fee)
+        quotes = quote_exact_output([state], token_in, [int(amount) for amount in amounts])[0]
+        return [None if quote != quote else int(quote) + 1 for quote in quotes]
 
     def remove_liquidity(self, chain: str, token_id: int, liquidity: int):
         deadline = int(time.time()) + 300
@@ -342,11 +578,7 @@ class UniswapV3Helper:
             "amount1Min": 0,
             "deadline": deadline
         }
-        tx = self.position_manager[chain].functions.decreaseLiquidity(params).build_transaction({
-            "from": self.address,
-            "nonce": self.w3[chain].eth.get_transaction_count(self.address)
-        })
-        return self._build_and_send_tx(chain, tx)
+        return self._build_and_send_tx(chain, call_tx(self.position_manager[chain], "decreaseLiquidity", params))
 
     def collect_fees(self, chain: str, token_id: int):
         params = {
@@ -355,20 +587,62 @@ class UniswapV3Helper:
             "amount0Max": 2**128 - 1,
             "amount1Max": 2**128 - 1
         }
-        tx = self.position_manager[chain].functions.collect(params).build_transaction({
-            "from": self.address,
-            "nonce": self.w3[chain].eth.get_transaction_count(self.address)
-        })
-        return self._build_and_send_tx(chain, tx)
+        return self._build_and_send_tx(chain, call_tx(self.position_manager[chain], "collect", params))
 
-    def swap_exact_input_single(self, chain: str, token_in: str, token_out: str, fee: int, amount_in: int, amount_out_min: int, recipient: str):
-        w3 = self.w3[chain]
+    def swap_exact_input(self, chain: str, tokens, fees, amount_in: int, amount_out_min: int,
+                         recipient: str = None, gas: int = None):
+        """
+        Swaps exactly `amount_in` of tokens[0] for tokens[-1] through every pool
+        on the path (fees[i] between tokens[i] and tokens[i + 1]) in one
+        exactInput transaction: one approval of the first token and one send,
+        however many hops.
+        """
         router = self.router[chain]
-        deadline = int(time.time()) + 300
-        tx = router.functions.exactInputSingle(
-            token_in, token_out, fee, recipient, deadline, amount_in, amount_out_min, 0
-        ).build_transaction({
-            "from": self.address,
-            "nonce": w3.eth.get_transaction_count(self.address)
-        })
-        return self._build_and_send_tx(chain, tx)
+        params = (encode_path(tokens, fees), recipient or self.address, amount_in, amount_out_min)
+        tx = call_tx(router, "exactInput", params)
+        if gas:
+            tx["gas"] = gas
+        return self._spend(chain, tx, [(tokens[0], router.address, amount_in)])
+
+    def bundle(self, chain: str, deadline: int = None) -> RouterBundle:
+        """A RouterBundle: chain swaps and payments, then send() them as one router multicall."""
+        return RouterBundle(self, chain, deadline)
+
+    def swap_exact_input_single(self, chain: str, token_in: str, token_out: str, fee: int, amount_in: int, amount_out_min: int,
+                                recipient: str = None, gas: int = None, permit: bool = False):
+        """
+        Swaps exactly `amount_in` of `token_in` through one pool. With `permit`, a
+        missing router allowance is granted by a signed EIP-2612 permit sent in
+        the same transaction (router multicall) instead of a separate approval;
+        the token must support permits, and only one permit per token can be
+        pending at a time since each signs the token's next permit nonce.
+        """
+        router = self.router[chain]
+        params = (
+            Web3.to_checksum_address(token_in), Web3.to_checksum_address(token_out), fee,
+            recipient or self.address, amount_in, amount_out_min, 0
+        )
+        tx = call_tx(router, "exactInputSingle", params)
+        signature = None
+        if permit:
+            deadline = int(time.time()) + 300
+            w3 = self.w3[chain]
+            signature = self.allowances.ensure(
+                chain, w3, self.address, token_in, router.address, amount_in,
+                lambda total: sign_permit(w3, self.account, token_in, router.address, total, deadline, chain_id(w3))
+            )
+            if signature is not None:
+                tx = call_tx(router, "multicall", deadline, [
+                    router.encode_abi("selfPermitIfNecessary", args=[Web3.to_checksum_address(token_in), *signature]),
+                    tx["data"],
+                ])
+        if gas:
+            # Sent right behind its approval: skip estimation, which would revert until that is mined
+            tx["gas"] = gas
+        try:
+            return self._spend(chain, tx, [(token_in, router.address, amount_in)])
+        except Exception:
+            if signature is not None:
+                # ensure() counted the permit's allowance, but a permit only takes effect with the swap it rides in
+                self.allowances.forget(chain, self.address, token_in, router.address)
+            raise
@@ -1,10 +1,15 @@
 import asyncio
 import os
 import requests
+from collections import deque
 from cdp import CdpClient
 from openai import OpenAI
 from time import sleep
 
+from price_client import DexScreenerClient, GeckoTerminalClient, HedgedPriceClient
+from price_cache import PriceCache, SQLitePriceStore
+from token_registry import TokenRegistry
+
 # Set your API keys
 os.environ["CDP_API_KEY_ID"] = "bd69e334-6557-4eeb-938f-66fa9048b413"
 os.environ["CDP_API_KEY_SECRET"] = "60+8NEZplaBKdzaOMDQ8GoEXzc+zd5m8Gd3IVAnJ+2ODqLK+GMSqxsEROiSmSbxSWK3ihIvC0bEdI/7RgLpY7g=="
@@ -14,51 +19,103 @@ client = OpenAI(
     api_key=os.environ["OPENAI_API_KEY"] 
 )
 
+# Chains fetched for every wallet
+CHAINS = ["base", "ethereum"]
+
+# Token balances requested per CDP page
+BALANCE_PAGE_SIZE = 100
+
+# Tokens whose DexScreener price is known to be bogus
+IGNORED_PRICE_TOKENS = {"0x8e5C04F82d6464b420E2018362E7e7aB813cF190"}
+
+# Shared, pooled price client: DexScreener first, hedged to GeckoTerminal when it is
+# slower than usual, fails, or leaves tokens unpriced
+price_client = HedgedPriceClient([DexScreenerClient(), GeckoTerminalClient()])
+
+# Prices are cached per (chain, address); set PRICE_CACHE_PATH to share them across processes
+PRICE_CACHE_TTL = float(os.getenv("PRICE_CACHE_TTL", "60"))
+PRICE_CACHE_STALE_TTL = float(os.getenv("PRICE_CACHE_STALE_TTL", "300"))
+PRICE_CACHE_PATH = os.getenv("PRICE_CACHE_PATH")
+# Price misses from every wallet loading at once are collected this long and fetched in full batches
+PRICE_BATCH_WINDOW = float(os.getenv("PRICE_BATCH_WINDOW", "0.05"))
+price_cache = PriceCache(
+    price_client,
+    ttl=PRICE_CACHE_TTL,
+    stale_ttl=PRICE_CACHE_STALE_TTL,
+    backend=SQLitePriceStore(PRICE_CACHE_PATH) if PRICE_CACHE_PATH else None,
+    batch_window=PRICE_BATCH_WINDOW or None,
+)
 
-def get_token_price(token_address, chain):
-    token_address_string = ",".join(token_address) if isinstance(token_address, list) else token_address
-    url = f"https://api.dexscreener.com/latest/dex/tokens/{token_address_string}"
-    headers = {"Accept": "application/json"}
-
-    response = requests.get(url, headers=headers)
-    response.raise_for_status()
-    pairs = response.json().get("pairs", [])
+# Symbol, decimals and category of every token seen so far, persisted across restarts.
+# The file is created on first use, not on import; set TOKEN_REGISTRY_PATH to keep it with
+# the other state files (or to "" for an in-memory registry)
+TOKEN_REGISTRY_PATH = os.getenv("TOKEN_REGISTRY_PATH", "token_registry.sqlite")
+token_registry = TokenRegistry(TOKEN_REGISTRY_PATH or None)
 
 
-    return {
-        pair["baseToken"]["address"]: float(pair.get("priceUsd", 0.0))
-        for pair in pairs
-        if "priceUsd" in pair
-    }
+def get_token_price(token_address, chain):
+    """Synchronous price lookup for callers outside an event loop."""
+    return price_cache.get_prices_sync(token_address, chain)
+
+
+async def iter_balance_pages(cdp, address, chain, page_size=BALANCE_PAGE_SIZE):
+    """Yields each page of token balances, following next_page_token to the end."""
+    page_token = None
+    while True:
+        page = await cdp.evm.list_token_balances(address, chain, page_size=page_size, page_token=page_token)
+        yield page.balances
+        page_token = page.next_page_token
+        if not page_token:
+            return
+
+
+def _apply_prices(page_balances, prices):
+    for addr, data in page_balances.items():
+        price = 0.0 if addr in IGNORED_PRICE_TOKENS else prices.get(addr, 0.0)
+        data["price"] = price
+        data["value_usd"] = data["balance"] * price
+    return page_balances
+
+
+async def stream_balances(cdp, address, chain, max_pending_pages=2):
+    """
+    Yields priced balances one page at a time ({contract_address: {...}}).
+    Price lookups for a page run while the next page is loading; at most
+    `max_pending_pages` pages are held in memory awaiting prices.
+    """
+    pending = deque()
+    try:
+        async for balances in iter_balance_pages(cdp, address, chain):
+            # Collect basic balance info
+            page_balances = {
+                balance.token.contract_address: {
+                    "address": balance.token.contract_address,
+                    "symbol": balance.token.symbol,
+                    "decimals": balance.amount.decimals,
+                    "balance": float(balance.amount.amount) / 10**balance.amount.decimals,
+                    "chain": chain,
+                }
+                for balance in balances
+            }
+            # Batched, concurrent price lookups that never block the event loop
+            prices = asyncio.create_task(price_cache.get_prices(list(page_balances), chain))
+            pending.append((page_balances, prices))
+            if len(pending) >= max_pending_pages:
+                page_balances, prices = pending.popleft()
+                yield _apply_prices(page_balances, await prices)
+
+        while pending:
+            page_balances, prices = pending.popleft()
+            yield _apply_prices(page_balances, await prices)
+    finally:
+        for _, prices in pending:
+            prices.cancel()
 
 
 async def fetch_balances(cdp, address, chain):
-    balances = await cdp.evm.list_token_balances(address, chain, page_size=100)
     balances_price = {}
-
-    # Collect basic balance info
-    for balance in balances.balances:
-        balances_price[balance.token.contract_address] = {
-            "symbol": balance.token.symbol,
-            "balance": float(balance.amount.amount),
-            "chain": chain,
-        }
-
-    # Batch fetch prices (10 at a time)
-    all_balances_price = {}
-    for i in range(0, len(balances.balances), 10):
-        batch = balances.balances[i : i + 10]
-        addresses = [balance.token.contract_address for balance in batch]
-        batch_prices = get_token_price(addresses, chain)
-        all_balances_price.update(batch_prices)
-
-    # Merge prices into balances
-    for balance in balances.balances:
-        addr = balance.token.contract_address
-        price = all_balances_price.get(addr, 0.0)
-        balances_price[addr]["price"] = price
-        balances_price[addr]["value_usd"] = balances_price[addr]["balance"] * price
-
+    async for page_balances in stream_balances(cdp, address, chain):
+        balances_price.update(page_balances)
     return balances_price
 
 
@@ -68,27 +125,14 @@ def categorize_tokens(tokens):
     defi_tokens = []
     miscellaneous_tokens = []
 
-    for t, data in tokens.items():
-        name = data["symbol"].lower()
-        symbol = data["symbol"].lower()
-
-        # Heuristic rules for DeFi/farm/airdrop tokens
-        if (
-            "moo" in name
-            or "farm" in name
-            or "stake" in name
-            or "lp" in symbol
-            or "stk" in symbol
-            or "moo" in symbol
-            or "cake" in symbol 
-            or "mw" in symbol
-        ):
+    # Only tokens the registry has never seen (or whose symbol changed) are classified
+    entries = token_registry.lookup_balances(tokens)
+    for data, entry in zip(tokens.values(), entries):
+        data["spam"] = entry["spam"]
+        if entry["category"] == "defi":
             data['protocol'] = "DeFi"
             defi_tokens.append(data)
-        elif (
-             "airdrop" in name
-            or "reward" in name
-        ):
+        elif entry["category"] == "misc" or entry["spam"]:
             miscellaneous_tokens.append(data)
         else:
             wallet_tokens.append(data)
@@ -98,28 +142,90 @@ def categorize_tokens(tokens):
 
 
 
-async def get_wallet_balances(wallet_address):
+async def get_wallet_balances(wallet_address, chains=CHAINS, cdp=None):
 
-    async with CdpClient() as cdp:
-        # Base balances
-        base_balances_price = await fetch_balances(cdp, wallet_address, "base")
+    if cdp is None:
+        async with CdpClient() as cdp:
+            return await get_wallet_balances(wallet_address, chains, cdp)
 
-        # Ethereum balances
-        eth_balances_price = await fetch_balances(cdp, wallet_address, "ethereum")
+    # Fan out across chains: a wallet load takes as long as the slowest chain
+    chain_balances = await asyncio.gather(*(
+        fetch_balances(cdp, wallet_address, chain) for chain in chains
+    ))
 
-        # Merge all balances
-        all_balances = {**base_balances_price, **eth_balances_price}
+    # Merge all balances; the same contract address can exist on several chains
+    all_balances = {}
+    for chain, balances_price in zip(chains, chain_balances):
+        for address, data in balances_price.items():
+            all_balances[(chain, address)] = data
 
 
-        wallet_tokens, defi_tokens, miscellaneous_tokens = categorize_tokens(all_balances)
+    wallet_tokens, defi_tokens, miscellaneous_tokens = categorize_tokens(all_balances)
 
-        classified_tokens = {
-            "wallet_tokens": wallet_tokens,
-            "defi_tokens": defi_tokens,
-            "miscellaneous_tokens": miscellaneous_tokens
-        }
+    classified_tokens = {
+        "wallet_tokens": wallet_tokens,
+        "defi_tokens": defi_tokens,
+        "miscellaneous_tokens": miscellaneous_tokens
+    }
 
-        return classified_tokens
+    return classified_tokens
+
+
+class _BoundedCdp:
+    """Wraps a CdpClient so that at most `limit` balance requests are in flight."""
+    def __init__(self, cdp, limit):
+        self._cdp = cdp
+        self._semaphore = asyncio.Semaphore(limit)
+        self.evm = self
+
+    async def list_token_balances(self, *args, **kwargs):
+        async with self._semaphore:
+            return await self._cdp.evm.list_token_balances(*args, **kwargs)
+
+
+async def stream_wallets_balances(wallet_addresses, chains=CHAINS, cdp=None,
+                                  max_concurrent_wallets=16, cdp_concurrency=8):
+    """
+    Loads many wallets through one CdpClient and yields (wallet_address, result)
+    as each wallet completes. `result` is the get_wallet_balances dict, or
+    {"error": ...} if that wallet failed.
+
+    CDP requests are bounded by `cdp_concurrency` and DexScreener requests by the
+    price client's own limit. Price lookups from all wallets are grouped by
+    chain within price_cache's batch window, and tokens shared between wallets
+    are coalesced and cached, so each token is fetched once, in full batches.
+    """
+    if cdp is None:
+        async with CdpClient() as cdp:
+            async for item in stream_wallets_balances(wallet_addresses, chains, cdp, max_concurrent_wallets, cdp_concurrency):
+                yield item
+        return
+
+    bounded_cdp = _BoundedCdp(cdp, cdp_concurrency)
+    wallet_semaphore = asyncio.Semaphore(max_concurrent_wallets)
+
+    async def load(wallet_address):
+        async with wallet_semaphore:
+            try:
+                return wallet_address, await get_wallet_balances(wallet_address, chains, bounded_cdp)
+            except Exception as e:
+                return wallet_address, {"error": f"Failed to load wallet {wallet_address}: {e}"}
+
+    tasks = [asyncio.create_task(load(address)) for address in dict.fromkeys(wallet_addresses)]
+    try:
+        for finished in asyncio.as_completed(tasks):
+            yield await finished
+    finally:
+        for task in tasks:
+            task.cancel()
+
+
+async def get_wallets_balances(wallet_addresses, chains=CHAINS, cdp=None, **kwargs):
+    """Non-streaming variant of stream_wallets_balances: {wallet_address: result}."""
+    return {
+        address: result
+        async for address, result in stream_wallets_balances(wallet_addresses, chains, cdp, **kwargs)
+    }
 
 
 
@@ -129,5 +235,6 @@ if __name__ == "__main__":
         # Example usage:
         example_wallet = "0xf71657318e9b5a5b5173d16327e34e4675ec5d56"
         await get_wallet_balances(example_wallet)
+        await price_client.aclose()
 
     asyncio.run(main())
\ No newline at end of file